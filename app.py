@@ -1,16 +1,18 @@
 import base64
+import os
 import streamlit as st
-import pandas as pd
-from shift_scheduling_sat_revCREF_v20 import solve_shift_scheduling
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.utils.cell import get_column_letter
-from openpyxl.styles import PatternFill
-from openpyxl.formatting.rule import ColorScaleRule
+import streamlit.components.v1 as components
+from shift_scheduling_sat_revCREF_v20 import solve_shift_scheduling, solve_heuristic_scheduling
 from datetime import datetime, timedelta
 import warnings
 import myInputCRs
+import myInputConfigCRs
+from myIncrementalCRs import resolver_incremental
+from myEstimadorCRs import estimar_atcos_turno
+from myBarridoCRs import barrido_parametros
+from myVistaDemandaCRs import firma_ficheros
+from myVisorCRs import renderizar_estadillo
+from myExportacionCRs import tabla_estadillo, tabla_tramos, libro_estadillo
 
 #Debido a que hay conflictos de compatibilidad entre versiones de protobuf, ortools y streamlit, aparecen warnings avisando que
 #se instale la ultima versión de las mismas. Se evita con esta librería
@@ -18,6 +20,8 @@ warnings.filterwarnings("ignore")
 
 st.set_page_config(layout="wide")
 
+config = myInputConfigCRs.MyConfig()
+
 ######
 #Entradilla
 ######
@@ -39,21 +43,56 @@ st.markdown("""
 #   - Dataframe con el estadillo
 ######
 @st.cache
-def load_data(datos, traf = []):
-    lista = solve_shift_scheduling(datos, traf)
+def load_data(datos, traf = [], parada = None, max_time_in_seconds = None):
+    lista = solve_shift_scheduling(datos, traf, escenario = escenario(datos[0]),
+                                   parada = parada,
+                                   max_time_in_seconds = max_time_in_seconds)
     return lista
 
-@st.cache
-def load_turnos(datos, ad, t_id):
-    h=pd.read_csv(datos,sep=";")
+######
+# Escenario (datosDependencias y tráfico) de cada AD, compartido por todas las
+# sesiones. firma (tamaño y fecha de los ficheros) forma parte de la clave,
+# así que si cambian los ficheros se vuelve a cargar.
+# El escenario sólo se lee (MyEscenario no se modifica al resolver).
+######
+@st.cache_resource
+def load_escenario(icao, fileTWR, fileTrafico, firma):
+    return myInputCRs.MyEscenario(icao=icao, fileTWR=fileTWR, fileTrafico=fileTrafico)
 
-    h_2 =  h.loc[h['ICAO']==ad,['turnoshini']]
+def escenario(icao):
+    return load_escenario(icao, config.fileTWR, config.fileTrafico,
+                          firma_ficheros(config.fileTWR, config.fileTrafico))
 
-    h_3 = [i.split(',') for i in h_2['turnoshini']]
+######
+# Configuración de cada AD (inputconfigCRs.json y su perfil de perfilesCRs.json),
+# compartida por todas las sesiones. La fecha de los ficheros forma parte de la
+# clave. Al resolver no se modifica (los cambios se hacen sobre copias).
+######
+@st.cache_resource
+def load_config(icao, firma):
+    return myInputConfigCRs.MyConfig(icao=icao)
 
-    inicio = float(h_3[0][t_id])
+def config_ad(icao):
+    firma = tuple(os.stat(f).st_mtime_ns if os.path.exists(f) else 0
+                  for f in ('inputconfigCRs.json', 'perfilesCRs.json'))
+    return load_config(icao, firma)
 
-    return inicio
+######
+# Demanda (listademanda, listaposiciones) de un turno, compartida por todas las
+# sesiones. traf (demanda por hora modificada a mano) forma parte de la clave,
+# así la estimación de ATCOS no vuelve a filtrar el tráfico en cada recarga.
+######
+@st.cache_data
+def load_demanda(icao, diames, idturno, ventana, traf, firma):
+    return escenario(icao).getdfTrafico(diames=diames, idturno=idturno,
+                                        ventanaflotante=ventana, TRAF=list(traf))
+
+def demanda_turno(icao, diames, idturno, ventana, traf=()):
+    return load_demanda(icao, diames, idturno, ventana, tuple(traf),
+                        firma_ficheros(config.fileTWR, config.fileTrafico))
+
+def load_turnos(datos, ad, t_id):
+    return float(escenario(ad).getlimitesturno(t_id)[0])
 
 def decimal_to_time(decimal_hour):
     hours = int(decimal_hour)
@@ -72,88 +111,13 @@ def generar_lista_hora(hora_inicial, num_columnas):
 
     return lista_hora
 
-#####
-# Transformar dataframe en excel descargable. 
-# Entrada:
-#   - tabla: dataframe con el estadillo
-# salida:
-#   - hoja de excel con el estadillo con el formato seleccionado
-#####
-@st.cache
-def transf(tabla, tabla2, aeropuerto):
-    wb = Workbook()
-    ws1 = wb.active
-    for r in dataframe_to_rows(tabla, index=False, header=False):
-        ws1.append(r)
-        
-
-    # gradiente de colores en primera fila de estadillo
-    for col_num, column_title in enumerate(tabla.columns[3:], 1):
-        cell = ws1.cell(row=1, column=col_num)
-        min_color = '25D82B' # Lightest color
-        mid_color = 'F0A22A'
-        max_color = 'E03C18' # Darkest color
-        rule = ColorScaleRule(start_type='min', start_color=min_color,
-                            mid_type='num', mid_value=70, mid_color=mid_color,
-                            end_type='max', end_color=max_color)
-        ws1.conditional_formatting.add('D2:CO2', rule)
-        
-    # Agrupa las celdas de número en la primera fila
-    grupo = int(time/t_bloque)
-    column_index = 4
-    num_groups = (tabla.shape[1] - 3) // grupo
-    last_group_size = (tabla.shape[1] - 3) % grupo
-
-    for i in range(num_groups+1):
-        if i == num_groups and last_group_size != 0:
-            group_size = last_group_size
-        else:
-            group_size = grupo
-            
-        column_letter_start = get_column_letter(column_index)
-        column_letter_end = get_column_letter(column_index + group_size - 1)
-        cell_start_1 = f'{column_letter_start}1'
-        cell_end_1 = f'{column_letter_end}1'  
-        
-        
-        ws1.merge_cells(f'{cell_start_1}:{cell_end_1}')
-        cell_start_2 = f'{column_letter_start}2'
-        cell_end_2 = f'{column_letter_end}2'  
-        ws1.merge_cells(f'{cell_start_2}:{cell_end_2}')    
-        
-
-        
-        column_index += group_size
-        
-    # rellenar de verde las celdas en las que se trabaja
-    for i in range(4, ws1.max_column + 1):
-        for j in range(1, ws1.max_row + 1):
-            cell = ws1.cell(row=j, column=i)         
-            
-            if cell.value == 'T':
-                fill_color = PatternFill(start_color='91E183', end_color='91E183', fill_type='solid')
-                cell.fill = fill_color
-
-    # cambiar tamaño de columnas
-    ws1.column_dimensions['A'].width = 20
-    for i in range(4, 94):
-        col_letter = get_column_letter(i)
-        ws1.column_dimensions[col_letter].width = 2.8
-    
-    ws2 = wb.create_sheet()
-    for t in dataframe_to_rows(tabla2, index=False, header=False):
-        ws2.append(t)
-        
-
-    #generar excel descargable     
-    wb.save(aeropuerto + ".xlsx") 
-    
 ######
 # Input
 ######
 
 aerop = st.text_input("código OACI")
 atcos = st.number_input('Número de ATCOS disponibles para el turno', min_value=1, step=1)
+hueco_estimacion = st.empty() # cotas de ATCOS necesarios (se rellena más abajo)
 turno = st.selectbox('0 -> Mañana, 1 -> tarde, 2 -> noche', [0,1,2])
 # bloque = st.number_input('Bloque de tiempo para dividir la hora', min_value=5, max_value= 60, step=5)
 bloque = 5
@@ -170,8 +134,8 @@ list_input = [aerop, atcos, turno, bloque, demanda, dia] #lista que sirve para a
 check1 = st.checkbox("Selecciona el recuadro si quieres modificar la demanda a mano")
 if check1:
 
-    a = myInputCRs.MyEscenario(icao=aerop)
-    list_demanda = a.getdfTrafico(diames=dia.day, idturno=turno, ventanaflotante=60) #demanda por hora
+    a = escenario(aerop)
+    list_demanda = demanda_turno(aerop, dia.day, turno, 60) #demanda por hora
     new_list_demanda = []
 
     for i, num_demand in enumerate(list_demanda[0]):
@@ -183,12 +147,65 @@ if check1:
     
     # st.write(new_list_demanda)
 
+######
+# Estimación del número de ATCOS necesarios (sin solver, con la configuración y
+# la demanda en caché)
+######
+if aerop:
+    try:
+        traf_estimacion = new_list_demanda if check1 else []
+        cotas = estimar_atcos_turno(escenario(aerop), dia.day, turno, demanda, bloque,
+                                    mC = config_ad(aerop),
+                                    demanda = demanda_turno(aerop, dia.day, turno, demanda,
+                                                            traf_estimacion))
+    except (IndexError, KeyError, ValueError):
+        cotas = None # AD sin datos en datosDependencias1.csv o en el tráfico
+    if cotas is not None:
+        texto = (f"ATCOS necesarios como mínimo: {cotas[0]}. "
+                 f"Estimación para una rotación escalonada (no garantizada): {cotas[1]}")
+        if atcos < cotas[0]:
+            hueco_estimacion.warning(texto)
+        else:
+            hueco_estimacion.caption(texto)
+
 
 
 #######
 # Ejecución del código
 #######
 
+check_previa = st.checkbox("Vista previa rápida (estadillo heurístico, sin optimizar)")
+
+######
+# Criterio de parada del cálculo (por defecto el de inputconfigCRs.json)
+######
+with st.expander("Criterio de parada del cálculo"):
+    tiempo_max = st.number_input("Tiempo máximo (s)", min_value=1.0, value=float(config.max_time_in_seconds), step=10.0)
+    gap_relativo = st.number_input("Parar si la solución está a menos de este % del óptimo", min_value=0.0, max_value=100.0, value=float(config.relative_gap_limit * 100), step=0.5)
+    sin_mejora = st.number_input("Parar tras estos segundos sin mejorar (0 = no)", min_value=0.0, value=float(config.tiempo_sin_mejora), step=5.0)
+parada = {'relative_gap_limit': gap_relativo / 100, 'tiempo_sin_mejora': sin_mejora}
+
+######
+# Comparación de configuraciones (barrido de parámetros en paralelo)
+######
+with st.expander("Comparar configuraciones"):
+    barrido_ventanas = st.multiselect("Bloque de tiempo para captar la demanda", [5, 10, 15, 20, 30, 60], default=[demanda])
+    barrido_tolerancias = st.multiselect("Tolerancia del reparto equilibrado (even_shift_tolerance)", [0, 1, 2, 3], default=[config.even_shift_tolerance])
+    barrido_cobertura = st.multiselect("Cubrir exactamente la demanda (match_full_demand)", [1, 0], default=[int(config.match_full_demand)])
+    barrido_descanso = st.multiselect("Descanso mínimo del turno (min_daily_sum_off)", [0.2, 0.25, 0.3], default=[config.min_daily_sum_off])
+    boton_barrido = st.button("Comparar")
+    if boton_barrido and aerop:
+        rejilla = {'demand_interval_length': barrido_ventanas,
+                   'even_shift_tolerance': barrido_tolerancias,
+                   'match_full_demand': barrido_cobertura,
+                   'min_daily_sum_off': barrido_descanso}
+        tabla_barrido, _ = barrido_parametros(aerop, atcos, turno, dia, rejilla, bloque,
+                                              max_time_in_seconds = tiempo_max)
+        st.dataframe(tabla_barrido)
+
+# control oculto: perfilado de la resolución con ?perfilado=1 en la url
+perfilado = st.experimental_get_query_params().get("perfilado", ["0"])[0] == "1"
+
 boton1 = st.button("Click para calcular")
 
 # st.write("boton:", boton1)
@@ -196,10 +213,30 @@ boton1 = st.button("Click para calcular")
 #cada vez que se hace click se ejecuta, sino no, si se cambia algún campo se reinicia y el código vuelve a esta línea
 if boton1:
     # try:
-    if check1:
-        sol = load_data(list_input, traf = new_list_demanda)
+    if check_previa:
+        # estadillo en milisegundos, sin CP-SAT
+        if check1:
+            sol = solve_heuristic_scheduling(list_input, traf = new_list_demanda, escenario = a)
+        else:
+            sol = solve_heuristic_scheduling(list_input, escenario = escenario(aerop))
+    elif check1:
+        # recálculo incremental a partir de la resolución anterior de la sesión
+        # (mismo modelo, sólo se reoptimizan las horas cuya demanda ha cambiado)
+        sol = resolver_incremental(list_input, new_list_demanda,
+                                   st.session_state.setdefault('incremental', {}),
+                                   config = config_ad(aerop), escenario = a,
+                                   parada = parada, max_time_in_seconds = tiempo_max)
+    elif perfilado:
+        # resolución perfilada (sin caché), artefacto en perfiladoCRs/
+        informe_perfilado = {}
+        sol = solve_shift_scheduling(list_input, parada = parada, max_time_in_seconds = tiempo_max,
+                                     escenario = escenario(aerop), informe = informe_perfilado,
+                                     perfilado = True)
+        if 'perfilado' in informe_perfilado:
+            with st.expander("Perfilado: " + informe_perfilado['perfilado']['directorio']):
+                st.code(informe_perfilado['perfilado']['resumen'])
     else:
-        sol = load_data(list_input)
+        sol = load_data(list_input, parada = parada, max_time_in_seconds = tiempo_max)
 
 
     if type(sol) == list:
@@ -216,175 +253,23 @@ if boton1:
         t_bloque  = bloque #minutos
 
         # Formato de la salida de la función que calcula el estadillo
-        dfs = [pd.DataFrame(line.split(',')).transpose() for line in resultado]
-        df = pd.concat(dfs).reset_index(drop=True).iloc[:, 0:-1]
-
-        # st.dataframe(df)
-
-        grupo = int(time/t_bloque)
-
-        lista1 = [i for i in list(filter(lambda x: x != ' ', df.iloc[0,1:])) for j in range(grupo)]
-        lista2 = [i for i in list(filter(lambda x: x != ' ', df.iloc[1,1:])) for j in range(grupo)]
-
-        # st.write(lista1)
-        # st.write(lista2)
-
-        if len(lista1) > (df.shape[1] - 1):
-            a = len(lista1) - (df.shape[1] - 1)
-            lista1 = lista1[:-a]
-            lista2 = lista2[:-a]
-
-        df.loc[0, 1:] = lista1
-        df.loc[1, 1:] = lista2 
-
-        df.loc[:1, 1:]=df.loc[:1, 1:].astype('int')
-
-        durations = []
-        for index, row in df.iterrows():
-            duration = 0
-            for value in row.values:
-                if value == 'T':
-                    duration += 1
-            durations.append(duration)
-
-        porcentaje = [(i/(len(df.columns)-1))*100 for i in durations]
-        duration = [(i*t_bloque)/60 for i in durations]
-
-        df.insert(1, 'tiempo', duration)
-        df.insert(2, 'porcentaje', porcentaje)
-
-        # print(df)
-
-        df2 = df.iloc[2:,3:]
-        count_dicc = {}
-
-        for index, row in df2.iterrows():
-            count_list = []
-            current_item = row.values[0]
-            current_count = t_bloque
-            
-            for item in row.values[1:]:
-                if item == current_item:
-                    current_count += t_bloque
-                else:
-                    last_item = current_item
-                    count_list.append((last_item+':', current_count))
-                    current_item = item
-                    current_count = t_bloque
-            
-            count_list.append(((item+':', current_count)))
-            
-            count_dicc['worker'+str(index-2)] = count_list
-            
-        longitud_maxima = max(map(len, count_dicc.values()))
-
-        for key in count_dicc:
-            lista = count_dicc[key]
-            while len(lista) < longitud_maxima:
-                lista.append(None)
-
-        df3 = pd.DataFrame(count_dicc).transpose().reset_index().replace({None: ''}).astype('str')
-
-        # st.write(df3)
+        df = tabla_estadillo(resultado, time, t_bloque)
 
-        df_copy = df.copy()
+        # tramos (D/T y minutos) de cada ATCO
+        df3 = tabla_tramos(df, t_bloque)
 
-        titulos = list(df_copy.columns)
+        # st.write(df3)
 
         h_ini = load_turnos("datosDependencias1.csv", aerop, turno)
-        lista_horas = generar_lista_hora(h_ini, len(titulos))
-
-        # print(lista_horas, len(lista_horas))
-        # print(titulos, len(titulos))
-
-        new_columns = ["ATCOS", "Tiempo", "Porcentaje"] + lista_horas
+        lista_horas = generar_lista_hora(h_ini, len(df.columns))
 
-
-        # new_columns = []
-        # for col in df_copy.columns:
-        #     if isinstance(col, int) and col != 0:
-        #         new_columns.append("Bloque nº " + str(col))
-        #     elif col == 0:
-        #         new_columns.append("ATCO")
-        #     else:
-        #         new_columns.append(col)
-        
-        df_copy.columns = new_columns
-
-        for col in df_copy.columns:
-            if "H Inicio " in col:
-                df_copy[col] = df_copy[col].astype(str)
-
-        
-        # # Definir una función para aplicar estilos personalizados a las celdas
-        # def highlight_cells(value):
-        #     style = 'background-color: green; color: white' if value == 'T' else ''
-        #     return style
-
-        # # Aplicar estilos personalizados al DataFrame
-        # styled_df = df.style.apply(lambda row: highlight_cells(row), axis=1)
-
-        # # Mostrar el DataFrame en Streamlit
-        # st.dataframe(styled_df)
-
-        # Definir una función para aplicar estilos personalizados a las celdas
-        def highlight_cells(value):
-            style = ['background-color: green; color: white' if v == 'T' else '' for v in value]
-            return style
-
-        # Aplicar estilos personalizados al DataFrame
-        styled_df = df_copy.style.apply(highlight_cells, axis=0)
-
-        # Mostrar el DataFrame en Streamlit
-        st.dataframe(styled_df)
-
-        # import plotly.graph_objects as go
-
-        # def highlight_cells(value):
-        #         if value == 'T':
-        #             return {'fill': {'color': 'green'}, 'font': {'color': 'white'}}
-        #         else:
-        #             return {'fill': {'color': 'white'}, 'font': {'color': 'chocolate'}}
-
-        # # Crear una lista de diccionarios con los estilos para cada celda
-        # styles = []
-        # for column in df_copy.columns:
-        #     column_styles = []
-        #     for value in df_copy[column]:
-        #         cell_style = highlight_cells(value)
-        #         column_styles.append(cell_style)
-        #     styles.append(column_styles)
-
-        # # Crear la figura de Plotly con la tabla
-        # table_data = []
-        # for i, column in enumerate(df_copy.columns):
-        #     column_data = []
-        #     for j, value in enumerate(df_copy[column]):
-        #         cell_data = {'content': value}
-        #         cell_style = styles[i][j]
-        #         cell_data.update(cell_style)
-        #         column_data.append(cell_data)
-        #     table_data.append(column_data)
-
-        # fig = go.Figure(data=[go.Table(
-        #     header=dict(values=list(df_copy.columns)),
-        #     cells=dict(values=table_data)
-        # )])
-
-        # # Ajustar el tamaño de las celdas
-        # fig.update_layout(
-        #     autosize=False,
-        #     width=10000,
-        #     height=10000
-        # )
-
-        # # Mostrar la figura en Streamlit
-        # st.plotly_chart(fig)
+        # Mostrar el estadillo (codificado por tramos y dibujado en el navegador)
+        html_estadillo, alto_estadillo, _ = renderizar_estadillo(df, lista_horas, t_bloque)
+        components.html(html_estadillo, height=alto_estadillo, scrolling=True)
 
         #generar excel
-        transf(df, df3, aerop)
-
         nombre = aerop+'.xlsx'
+        libro_estadillo(df, df3, nombre, time, t_bloque)
 
         # Abrir excel, codificar y generar enlace de descarga
         with open(nombre, 'rb') as f:
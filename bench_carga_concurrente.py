@@ -0,0 +1,351 @@
+#BENCHMARK: sesiones simultáneas de app.py (cálculo + excel)
+#    python bench_carga_concurrente.py [sesiones] [repeticiones] [segundos] [ICAO,...] [--sin-cache]
+# por defecto 4 sesiones x 2 repeticiones, 5 s por cálculo, LEMD_DCL
+import base64
+import contextlib
+import datetime
+import io
+import os
+import runpy
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from openpyxl import load_workbook
+
+import myExportacionCRs # excel del estadillo (libro_estadillo)
+
+"""
+Ejecuta app.py completo desde N sesiones simuladas a la vez, cada una en
+su hilo (como Streamlit, que ejecuta el script de cada sesión en un hilo),
+con un módulo streamlit sustituto:
+    - los widgets devuelven los valores de la sesión (por etiqueta) o su
+      valor por defecto, y "Click para calcular" está pulsado
+    - st.cache, st.cache_resource y st.cache_data son cachés compartidas
+      por todas las sesiones (con --sin-cache, st.cache no guarda y cada
+      sesión resuelve)
+    - lo que se mostraría (markdown, components.html...) se guarda en la
+      sesión
+Las sesiones se ejecutan en un directorio temporal con enlaces a los
+ficheros de datos, así que <aerop>.xlsx se escribe ahí. Al final de cada
+ejecución se lee el excel del enlace de descarga y se compara con el
+estadillo de la sesión: si no coincide otra sesión lo ha sobrescrito
+(colisión). Informe:
+    - rendimiento (ejecuciones por minuto) y latencia p50/p95/máx
+    - sobresuscripción de CPU: hilos de CP-SAT pedidos (num_search_workers
+      = ATCOS) frente a núcleos, y uso real de CPU del proceso
+    - colisiones de <aerop>.xlsx: descargas con el estadillo de otra
+      sesión y escrituras solapadas del mismo fichero
+"""
+
+ETIQUETA_OACI = "código OACI"
+ETIQUETA_ATCOS = 'Número de ATCOS disponibles para el turno'
+ETIQUETA_TURNO = '0 -> Mañana, 1 -> tarde, 2 -> noche'
+ETIQUETA_VENTANA = 'Bloque de tiempo para captar la demanda'
+ETIQUETA_FECHA = "fecha (por defecto, hoy)"
+ETIQUETA_TIEMPO = "Tiempo máximo (s)"
+BOTON_CALCULAR = "Click para calcular"
+
+# ficheros de datos que app.py lee del directorio de trabajo
+FICHEROS_DATOS = ('inputconfigCRs.json', 'perfilesCRs.json',
+                  'vistaDemandaCRs.npz')
+
+sesion_actual = threading.local()
+
+
+class Elemento:
+    """Sustituto de st.empty(), st.expander()... (acepta cualquier
+    llamada y se puede usar con with)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __getattr__(self, nombre):
+        return lambda *args, **kwargs: registrar(nombre, args)
+
+
+def registrar(nombre, args):
+    sesion = getattr(sesion_actual, 'sesion', None)
+    if sesion is not None:
+        sesion['salida'].append((nombre, args))
+
+
+def valor_widget(etiqueta, defecto):
+    return sesion_actual.sesion['entradas'].get(etiqueta, defecto)
+
+
+def cache_compartida(usar=True):
+    '''
+    Decorador como st.cache: una caché por función para todas las sesiones
+    '''
+    def decorador(funcion):
+        cache = {}
+        cerrojo = threading.Lock()
+
+        def envoltura(*args, **kwargs):
+            if not usar:
+                return funcion(*args, **kwargs)
+            clave = repr((args, sorted(kwargs.items())))
+            with cerrojo:
+                if clave in cache:
+                    return cache[clave]
+            valor = funcion(*args, **kwargs)
+            with cerrojo:
+                cache[clave] = valor
+            return valor
+        return envoltura
+    return decorador
+
+
+def streamlit_simulado(usar_cache=True):
+    '''
+    Módulos streamlit y streamlit.components.v1 sustitutos
+    '''
+    st = types.ModuleType('streamlit')
+    st.cache = cache_compartida(usar_cache)
+    st.cache_resource = cache_compartida(True)
+    st.cache_data = cache_compartida(True)
+    st.set_page_config = lambda **kwargs: None
+    st.text_input = lambda etiqueta, value='', **kw: valor_widget(etiqueta, value)
+    st.number_input = lambda etiqueta=None, min_value=None, max_value=None, value=None, label=None, **kw: \
+        valor_widget(etiqueta or label, value if value is not None else min_value)
+    st.selectbox = lambda etiqueta, opciones, **kw: valor_widget(etiqueta, opciones[0])
+    st.multiselect = lambda etiqueta, opciones, default=None, **kw: valor_widget(etiqueta, default or [])
+    st.date_input = lambda etiqueta, value=None, **kw: valor_widget(etiqueta, datetime.date.today())
+    st.checkbox = lambda etiqueta, value=False, **kw: valor_widget(etiqueta, value)
+    st.button = lambda etiqueta, **kw: valor_widget(etiqueta, False)
+    st.experimental_get_query_params = lambda: {}
+    st.empty = lambda: Elemento()
+    st.expander = lambda *args, **kw: Elemento()
+    st.session_state = {}
+    for nombre in ('write', 'markdown', 'error', 'warning', 'caption',
+                   'dataframe', 'code'):
+        setattr(st, nombre, (lambda n: lambda *args, **kw: registrar(n, args))(nombre))
+    componentes = types.ModuleType('streamlit.components')
+    v1 = types.ModuleType('streamlit.components.v1')
+    v1.html = lambda html, **kw: registrar('html', (len(html),))
+    componentes.v1 = v1
+    st.components = componentes
+    return {'streamlit': st, 'streamlit.components': componentes,
+            'streamlit.components.v1': v1}
+
+
+def directorio_trabajo(origen):
+    '''
+    Directorio temporal con enlaces a los ficheros de datos de origen
+    '''
+    directorio = tempfile.mkdtemp(prefix='carga_')
+    for nombre in os.listdir(origen):
+        if nombre.endswith('.csv') or nombre in FICHEROS_DATOS:
+            os.symlink(os.path.join(origen, nombre),
+                       os.path.join(directorio, nombre))
+    return directorio
+
+
+class Monitor:
+    """Hilos de CP-SAT pedidos por las sesiones activas y CPU del proceso,
+    muestreados cada intervalo segundos."""
+
+    def __init__(self, intervalo=0.1):
+        self.intervalo = intervalo
+        self.hilos = 0
+        self.cerrojo = threading.Lock()
+        self.muestras = []
+        self.fin = threading.Event()
+        self.hilo = threading.Thread(target=self.muestrear, daemon=True)
+
+    def sumar(self, n):
+        with self.cerrojo:
+            self.hilos += n
+
+    def muestrear(self):
+        while not self.fin.wait(self.intervalo):
+            self.muestras.append(self.hilos)
+
+    def __enter__(self):
+        self.t0 = time.time()
+        self.cpu0 = sum(os.times()[:2])
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *args):
+        self.fin.set()
+        self.hilo.join()
+        self.pared = time.time() - self.t0
+        self.cpu = sum(os.times()[:2]) - self.cpu0
+
+
+def estadillo_descargado(href):
+    '''
+    Filas del estadillo (hoja 1) del excel del enlace de descarga
+    '''
+    b64 = href.split('base64,')[1].split('"')[0]
+    wb = load_workbook(io.BytesIO(base64.b64decode(b64)), read_only=True)
+    return [list(fila) for fila in wb.worksheets[0].iter_rows(values_only=True)]
+
+
+def ejecutar_sesion(app, entradas, monitor):
+    '''
+    Una ejecución de app.py con las entradas; devuelve sus métricas
+    '''
+    sesion = {'entradas': entradas, 'salida': []}
+    sesion_actual.sesion = sesion
+    hilos = entradas[ETIQUETA_ATCOS]
+    monitor.sumar(hilos)
+    t = time.time()
+    try:
+        variables = runpy.run_path(app, run_name='__main__')
+        error = None
+    except Exception as e:
+        variables = {}
+        error = repr(e)
+    finally:
+        monitor.sumar(-hilos)
+    latencia = time.time() - t
+
+    colision = False
+    corrupto = False
+    if 'href' in variables and 'df' in variables:
+        propio = variables['df'].iloc[2:, 3:].values.tolist()
+        try:
+            descargado = [fila[3:3 + len(propio[0])]
+                          for fila in estadillo_descargado(variables['href'])[2:]]
+            colision = descargado != propio
+        except Exception:
+            # leído a medio escribir por otra sesión (zip o xml incompleto)
+            corrupto = True
+    elif error is None:
+        error = 'sin estadillo'
+    return {'latencia': latencia, 'colision': colision, 'corrupto': corrupto,
+            'error': error, 'aerop': entradas[ETIQUETA_OACI]}
+
+
+def escrituras_solapadas(escrituras):
+    '''
+    Pares de escrituras del mismo fichero que se solapan en el tiempo
+    '''
+    solapes = 0
+    por_fichero = {}
+    for nombre, inicio, fin in escrituras:
+        por_fichero.setdefault(nombre, []).append((inicio, fin))
+    for intervalos in por_fichero.values():
+        intervalos.sort()
+        for i, (inicio, fin) in enumerate(intervalos):
+            for otro_inicio, otro_fin in intervalos[i + 1:]:
+                if otro_inicio >= fin:
+                    break
+                solapes += 1
+    return solapes
+
+
+def prueba_carga(sesiones=4, repeticiones=2, segundos=5.0,
+                 aeropuertos=('LEMD_DCL',), usar_cache=True, fecha=None):
+    '''
+    sesiones simuladas a la vez, cada una con repeticiones ejecuciones de
+    app.py (ATCOS y turno distintos por sesión para que los estadillos
+    difieran). Devuelve un diccionario con las métricas
+    '''
+    origen = os.path.dirname(os.path.abspath(__file__))
+    app = os.path.join(origen, 'app.py')
+    directorio = directorio_trabajo(origen)
+    if fecha is None:
+        fecha = datetime.date(2023, 7, 3)
+
+    escrituras = []
+    cerrojo = threading.Lock()
+    libro_original = myExportacionCRs.libro_estadillo
+
+    def libro_registrado(tabla, tabla2, nombre, *args):
+        inicio = time.time()
+        libro_original(tabla, tabla2, nombre, *args)
+        with cerrojo:
+            escrituras.append((nombre, inicio, time.time()))
+
+    def sesion(k):
+        resultados = []
+        for r in range(repeticiones):
+            entradas = {
+                ETIQUETA_OACI: aeropuertos[k % len(aeropuertos)],
+                ETIQUETA_ATCOS: 9 + (k + r) % 4,
+                ETIQUETA_TURNO: (k + r) % 3,
+                ETIQUETA_VENTANA: 15,
+                ETIQUETA_FECHA: fecha,
+                ETIQUETA_TIEMPO: float(segundos),
+                BOTON_CALCULAR: True,
+            }
+            resultados.append(ejecutar_sesion(app, entradas, monitor))
+        return resultados
+
+    anteriores = {m: sys.modules.get(m) for m in
+                  ('streamlit', 'streamlit.components', 'streamlit.components.v1')}
+    sys.modules.update(streamlit_simulado(usar_cache))
+    myExportacionCRs.libro_estadillo = libro_registrado
+    cwd = os.getcwd()
+    os.chdir(directorio)
+    try:
+        with Monitor() as monitor, contextlib.redirect_stdout(io.StringIO()):
+            with ThreadPoolExecutor(max_workers=sesiones) as executor:
+                ejecuciones = [e for resultados in executor.map(sesion, range(sesiones))
+                               for e in resultados]
+    finally:
+        os.chdir(cwd)
+        myExportacionCRs.libro_estadillo = libro_original
+        for m, modulo in anteriores.items():
+            if modulo is None:
+                sys.modules.pop(m, None)
+            else:
+                sys.modules[m] = modulo
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    latencias = np.array([e['latencia'] for e in ejecuciones])
+    nucleos = os.cpu_count() or 1
+    hilos = np.array(monitor.muestras or [0])
+    return {
+        'sesiones': sesiones,
+        'ejecuciones': len(ejecuciones),
+        'errores': [e['error'] for e in ejecuciones if e['error']],
+        'tiempo_total': monitor.pared,
+        'por_minuto': 60.0 * len(ejecuciones) / monitor.pared,
+        'p50': float(np.percentile(latencias, 50)),
+        'p95': float(np.percentile(latencias, 95)),
+        'maximo': float(latencias.max()),
+        'nucleos': nucleos,
+        'hilos_medios': float(hilos.mean()),
+        'hilos_maximos': int(hilos.max()),
+        'sobresuscripcion': float(hilos.max()) / nucleos,
+        'uso_cpu': monitor.cpu / (monitor.pared * nucleos),
+        'colisiones': sum(e['colision'] for e in ejecuciones),
+        'corruptos': sum(e['corrupto'] for e in ejecuciones),
+        'escrituras_solapadas': escrituras_solapadas(escrituras),
+    }
+
+
+if __name__ == '__main__':
+    argumentos = [a for a in sys.argv[1:] if not a.startswith('--')]
+    sesiones = int(argumentos[0]) if len(argumentos) > 0 else 4
+    repeticiones = int(argumentos[1]) if len(argumentos) > 1 else 2
+    segundos = float(argumentos[2]) if len(argumentos) > 2 else 5.0
+    aeropuertos = argumentos[3].split(',') if len(argumentos) > 3 else ['LEMD_DCL']
+    m = prueba_carga(sesiones, repeticiones, segundos, aeropuertos,
+                     usar_cache='--sin-cache' not in sys.argv)
+    print("%i sesiones, %i ejecuciones en %0.1f s: %0.2f ejecuciones/min" % (
+        m['sesiones'], m['ejecuciones'], m['tiempo_total'], m['por_minuto']))
+    print("latencia p50 %0.1f s  p95 %0.1f s  máx %0.1f s" % (
+        m['p50'], m['p95'], m['maximo']))
+    print("CPU: %i núcleos, hilos de CP-SAT pedidos %0.1f de media y %i como "
+          "máximo (x%0.1f), uso real %0.0f%%" % (
+              m['nucleos'], m['hilos_medios'], m['hilos_maximos'],
+              m['sobresuscripcion'], 100 * m['uso_cpu']))
+    print("excel: %i descargas con el estadillo de otra sesión, %i ilegibles, "
+          "%i escrituras solapadas del mismo fichero" % (
+              m['colisiones'], m['corruptos'], m['escrituras_solapadas']))
+    for error in m['errores']:
+        print("error:", error)
@@ -0,0 +1,80 @@
+#BENCHMARK: tiempo y memoria de construcción del modelo CP-SAT
+#    python bench_construccion_modelo.py [num_employees] [num_turnos] [num_blocks]
+# por defecto 30 ATCOS x 96 bloques (8 horas de 5'), 3 problemas de un turno
+# independientes (semillas 0, 1, 2; no es un modelo de 3 turnos)
+import contextlib
+import io
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInstanciasCRs # problemas sintéticos
+from shift_scheduling_sat_revCREF_v20 import construir_modelo
+
+
+def construir(problemas, ligero):
+    modelos = []
+    for problema in problemas:
+        problema['modelo_ligero'] = ligero
+        with contextlib.redirect_stdout(io.StringIO()):
+            modelos.append(construir_modelo(problema))
+    return modelos
+
+
+def medir(problemas, ligero):
+    '''
+    (segundos, pico de memoria Python en MB, modelos) de construir el 
+    modelo de todos los problemas en modo normal o ligero. El tiempo se 
+    mide sin tracemalloc (que ralentiza la construcción) y la memoria aparte.
+    '''
+    t = time.perf_counter()
+    modelos = construir(problemas, ligero)
+    segundos = time.perf_counter() - t
+    del modelos
+    tracemalloc.start()
+    modelos = construir(problemas, ligero)
+    pico = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return segundos, pico, modelos
+
+
+def medir_proceso(problemas, ligero, cola):
+    '''
+    Mide en un proceso aparte para que el pico de memoria del proceso
+    (incluye el protobuf del modelo, que tracemalloc no ve) sea de un
+    solo modo
+    '''
+    segundos, pico, modelos = medir(problemas, ligero)
+    proto = modelos[0]['model'].Proto()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    cola.put((segundos, pico, rss, len(proto.variables),
+              len(proto.constraints)))
+
+
+if __name__ == '__main__':
+    num_employees = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    num_turnos = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    num_blocks = int(sys.argv[3]) if len(sys.argv) > 3 else 96
+
+    mC = myInputConfigCRs.MyConfig()
+    with contextlib.redirect_stdout(io.StringIO()):
+        problemas = [myInstanciasCRs.generar_problema(
+            num_employees, num_hours=num_blocks * 5 / 60, semilla=i, mC=mC)
+            for i in range(num_turnos)]
+
+    print("%i ATCOS x %i bloques, %i problemas de un turno" % (
+        num_employees, num_blocks, num_turnos))
+    for ligero in (False, True):
+        cola = multiprocessing.Queue()
+        proceso = multiprocessing.Process(target=medir_proceso,
+                                          args=(problemas, ligero, cola))
+        proceso.start()
+        segundos, pico, rss, variables, restricciones = cola.get()
+        proceso.join()
+        print("%-8s construcción %6.2f s  pico memoria Python %6.1f MB  "
+              "pico proceso %6.1f MB  (%i variables, %i restricciones "
+              "por turno)" % ("ligero" if ligero else "normal", segundos,
+                              pico, rss, variables, restricciones))
@@ -0,0 +1,96 @@
+#BENCHMARK: LNS (myLNSCRs) frente a CP-SAT sobre el modelo completo
+#    python bench_lns.py [segundos,...] [ATCOS,...] [instancias] [hilos]
+# por defecto 10,30,120 s x 30,40,50,60 ATCOS x 1 instancia x 8 hilos
+import contextlib
+import io
+import sys
+import time
+
+from ortools.sat.python import cp_model
+
+import myHeuristicaCRs # estadillo heurístico (hint)
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInstanciasCRs # problemas sintéticos
+import myLNSCRs # búsqueda en vecindarios grandes
+from shift_scheduling_sat_revCREF_v20 import construir_modelo
+
+
+def modelo_instancia(problema):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return construir_modelo(problema,
+                                myHeuristicaCRs.construir_estadillo(problema))
+
+
+def resolver_cpsat(problema, hilos):
+    '''
+    (objetivo, cota, segundos) de CP-SAT con el modelo completo
+    '''
+    modelo = modelo_instancia(problema)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = problema['max_time_in_seconds']
+    solver.parameters.num_search_workers = hilos
+    t = time.time()
+    status = solver.Solve(modelo['model'])
+    objetivo = (solver.ObjectiveValue() if status in
+                (cp_model.OPTIMAL, cp_model.FEASIBLE) else None)
+    return objetivo, solver.BestObjectiveBound(), time.time() - t
+
+
+def resolver_lns(problema, hilos):
+    '''
+    (objetivo, cota, segundos) de myLNSCRs.resolver_lns
+    '''
+    modelo = modelo_instancia(problema)
+    t = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        solver, status, progreso = myLNSCRs.resolver_lns(problema, modelo,
+                                                         hilos)
+    objetivo = (solver.ObjectiveValue() if status in
+                (cp_model.OPTIMAL, cp_model.FEASIBLE) else None)
+    return objetivo, progreso.cota, time.time() - t
+
+
+def texto(valor):
+    return '-' if valor is None else '%.0f' % valor
+
+
+if __name__ == '__main__':
+    tiempos = [float(x) for x in (sys.argv[1] if len(sys.argv) > 1
+                                  else '10,30,120').split(',')]
+    tamaños = [int(x) for x in (sys.argv[2] if len(sys.argv) > 2
+                                else '30,40,50,60').split(',')]
+    instancias = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    hilos = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+
+    mC = myInputConfigCRs.MyConfig()
+    print("%6s %8s %9s %10s %10s %10s %8s" % (
+        'ATCOS', 'semilla', 'segundos', 'CP-SAT', 'LNS', 'cota', 'LNS-CP'))
+    filas = []
+    for num_employees in tamaños:
+        for semilla in range(instancias):
+            with contextlib.redirect_stdout(io.StringIO()):
+                problema = myInstanciasCRs.generar_problema(
+                    num_employees, semilla=semilla, mC=mC)
+            if type(problema) == str:
+                print("%6i %8i  %s" % (num_employees, semilla, problema))
+                continue
+            for segundos in tiempos:
+                problema['max_time_in_seconds'] = segundos
+                cpsat, cota, _ = resolver_cpsat(problema, hilos)
+                lns, _, _ = resolver_lns(problema, hilos)
+                diferencia = (None if cpsat is None or lns is None
+                              else lns - cpsat)
+                print("%6i %8i %9.0f %10s %10s %10s %8s" % (
+                    num_employees, semilla, segundos, texto(cpsat),
+                    texto(lns), texto(cota), texto(diferencia)), flush=True)
+                filas.append((segundos, cpsat, lns))
+
+    print()
+    for segundos in tiempos:
+        pares = [(c, l) for s, c, l in filas if s == segundos]
+        mejor = sum(1 for c, l in pares if l is not None and
+                    (c is None or l < c))
+        peor = sum(1 for c, l in pares if c is not None and
+                   (l is None or l > c))
+        print("%4.0f s: LNS mejor en %i, peor en %i, igual en %i de %i" % (
+            segundos, mejor, peor, len(pares) - mejor - peor, len(pares)))
@@ -0,0 +1,206 @@
+#ARCHIVO DE ESTADILLOS (bits empaquetados, memoria mapeada)
+#    python myArchivoCRs.py ICAO hh:mm AAAA-MM    (cobertura y descansos)
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+"""
+Cada estadillo resuelto se guarda como un registro de tamaño fijo en
+FICHERO_ARCHIVO (se añade al final, nunca se reescribe):
+    - ICAO, fecha, turno, bloque (min), minuto de inicio del turno, ATCOS
+      y número de bloques (índice para filtrar)
+    - matriz ATCO x turno (D, T) x bloque en bits (np.packbits)
+    - demanda de posiciones y de tráfico por bloque (int16)
+El fichero se abre con np.memmap, así que las consultas son operaciones
+vectorizadas de numpy sobre todos los registros a la vez, sin leer ni
+interpretar Excel o csv:
+    - cobertura: ATCOS trabajando frente a demanda a una hora en un
+      rango de fechas
+    - minutos_descanso: minutos en D de cada ATCO por mes
+Los registros tienen hueco para MAX_ATCOS ATCOS y MAX_BLOQUES bloques
+(24 h en bloques de 5 min).
+"""
+
+FICHERO_ARCHIVO = 'archivoCRs.bin'
+
+MAX_ATCOS = 64
+MAX_BLOQUES = 288
+TURNOS = ('D', 'T') # planos de bits: 0 descanso, 1 trabajo
+
+REGISTRO = np.dtype([
+    ('icao', 'S8'),
+    ('fecha', 'datetime64[D]'),
+    ('turno', 'i1'),
+    ('block_length', 'i1'),
+    ('minuto_inicio', 'i2'),
+    ('num_employees', 'i2'),
+    ('num_blocks', 'i2'),
+    ('posiciones', 'i2', (MAX_BLOQUES,)),
+    ('demanda', 'i2', (MAX_BLOQUES,)),
+    ('bits', 'u1', (MAX_ATCOS, len(TURNOS), MAX_BLOQUES // 8)),
+])
+
+cerrojo_archivo = threading.Lock()
+
+
+def por_bloque(valores, num_blocks):
+    '''
+    Valores por intervalo de demanda (POS_DEMAND, TRAFFIC_DEMAND) repetidos
+    por bloque, -1 sin dato
+    '''
+    valores = [x for x in valores if str(x).strip() != '']
+    repeticion = -(-num_blocks // max(1, len(valores)))
+    serie = np.full(MAX_BLOQUES, -1, dtype=np.int16)
+    por = np.repeat([-1 if pd.isna(float(x)) else int(float(x))
+                     for x in valores], repeticion)[:num_blocks]
+    serie[:len(por)] = por
+    return serie
+
+
+def crear_registro(icao, fecha, idturno, estadillo, listaposiciones,
+                   listademanda, block_length=5, minuto_inicio=0):
+    '''
+    Registro del archivo para estadillo [empleado][bloque] = turno (índice
+    en TURNOS); listaposiciones y listademanda por intervalo de demanda
+    '''
+    matriz = np.asarray(estadillo, dtype=np.int8)
+    num_employees, num_blocks = matriz.shape
+    if num_employees > MAX_ATCOS or num_blocks > MAX_BLOQUES:
+        raise ValueError("estadillo de %i x %i mayor que %i x %i" % (
+            num_employees, num_blocks, MAX_ATCOS, MAX_BLOQUES))
+    registro = np.zeros(1, dtype=REGISTRO)[0]
+    registro['icao'] = icao.encode()
+    registro['fecha'] = np.datetime64(fecha, 'D')
+    registro['turno'] = idturno
+    registro['block_length'] = block_length
+    registro['minuto_inicio'] = minuto_inicio
+    registro['num_employees'] = num_employees
+    registro['num_blocks'] = num_blocks
+    registro['posiciones'] = por_bloque(listaposiciones, num_blocks)
+    registro['demanda'] = por_bloque(listademanda, num_blocks)
+    planos = np.zeros((MAX_ATCOS, len(TURNOS), MAX_BLOQUES), dtype=bool)
+    for s in range(len(TURNOS)):
+        planos[:num_employees, s, :num_blocks] = matriz == s
+    registro['bits'] = np.packbits(planos, axis=-1)
+    return registro
+
+
+class Archivo:
+    """Registros de FICHERO_ARCHIVO en memoria mapeada."""
+
+    def __init__(self, fichero=FICHERO_ARCHIVO):
+        self.fichero = fichero
+        self.abrir()
+
+    def abrir(self):
+        if os.path.exists(self.fichero) and os.path.getsize(self.fichero) > 0:
+            self.registros = np.memmap(self.fichero, dtype=REGISTRO, mode='r')
+        else:
+            self.registros = np.zeros(0, dtype=REGISTRO)
+
+    def __len__(self):
+        return len(self.registros)
+
+    def añadir(self, registros):
+        '''
+        Añade registros (crear_registro) al final del fichero
+        '''
+        registros = np.asarray(registros, dtype=REGISTRO)
+        with cerrojo_archivo:
+            with open(self.fichero, 'ab') as f:
+                f.write(registros.tobytes())
+        self.abrir()
+
+    def seleccionar(self, icao=None, desde=None, hasta=None, idturno=None):
+        '''
+        Índices de los registros del AD, entre las fechas desde y hasta
+        (incluidas) y del turno, los que no sean None
+        '''
+        r = self.registros
+        filtro = np.ones(len(r), dtype=bool)
+        if icao is not None:
+            filtro &= r['icao'] == icao.encode()
+        if desde is not None:
+            filtro &= r['fecha'] >= np.datetime64(desde, 'D')
+        if hasta is not None:
+            filtro &= r['fecha'] <= np.datetime64(hasta, 'D')
+        if idturno is not None:
+            filtro &= r['turno'] == idturno
+        return np.flatnonzero(filtro)
+
+    def cobertura(self, minuto, icao=None, desde=None, hasta=None):
+        '''
+        ATCOS trabajando frente a la demanda en el minuto del día (ej.
+        14*60+35) en los registros seleccionados cuyo turno lo incluye.
+        DataFrame con fecha, turno, atcos, posiciones y demanda
+        '''
+        indices = self.seleccionar(icao, desde, hasta)
+        r = self.registros
+        # los turnos que pasan de las 24 h cuentan en la fecha en que empiezan
+        desplazamiento = (minuto - r['minuto_inicio'][indices].astype(np.int32)) % 1440
+        bloque = desplazamiento // r['block_length'][indices].astype(np.int32)
+        dentro = (bloque >= 0) & (bloque < r['num_blocks'][indices])
+        indices, bloque = indices[dentro], bloque[dentro]
+        # bit del bloque en el plano T de todos los ATCOS
+        octetos = r['bits'][indices, :, 1, bloque // 8]
+        bits = (octetos >> (7 - bloque % 8)[:, None].astype(np.uint8)) & 1
+        return pd.DataFrame({
+            'icao': r['icao'][indices].astype(str),
+            'fecha': r['fecha'][indices],
+            'turno': r['turno'][indices],
+            'atcos': bits.sum(axis=1),
+            'posiciones': r['posiciones'][indices, bloque],
+            'demanda': r['demanda'][indices, bloque],
+        })
+
+    def minutos_descanso(self, icao=None, desde=None, hasta=None):
+        '''
+        Minutos en descanso (D) de cada ATCO (worker%i) por AD y mes.
+        DataFrame con índice (icao, mes) y una columna por ATCO
+        '''
+        indices = self.seleccionar(icao, desde, hasta)
+        r = self.registros
+        cuenta = np.zeros((len(indices), MAX_ATCOS), dtype=np.int32)
+        # por trozos para no descomprimir todos los bits a la vez
+        for i in range(0, len(indices), 4096):
+            trozo = indices[i:i + 4096]
+            planos = np.unpackbits(r['bits'][trozo, :, 0, :], axis=-1)
+            cuenta[i:i + len(trozo)] = planos.sum(axis=-1, dtype=np.int32)
+        minutos = cuenta * r['block_length'][indices, None].astype(np.int32)
+        ocupados = int(r['num_employees'][indices].max()) if len(indices) else 0
+        df = pd.DataFrame(minutos[:, :ocupados],
+                          columns=['worker%i' % e for e in range(ocupados)])
+        df['icao'] = r['icao'][indices].astype(str)
+        df['mes'] = pd.to_datetime(r['fecha'][indices]).to_period('M')
+        return df.groupby(['icao', 'mes']).sum()
+
+
+def archivar_resultado(lista, problema, ouput, fichero=FICHERO_ARCHIVO):
+    '''
+    Añade al archivo el estadillo ouput (formatear_estadillo) de la
+    instancia lista = [aeropuerto, ATCOS, turno, bloque, ventana, fecha]
+    '''
+    estadillo = [[TURNOS.index(x) for x in fila.split(',')[1:] if x != '']
+                 for fila in ouput if fila.startswith('worker')]
+    registro = crear_registro(
+        lista[0], lista[5], lista[2], estadillo,
+        problema['listaposiciones'], problema['listademanda'],
+        problema['block_length'],
+        int(round(problema.get('hora_inicio', 0) * 60)))
+    Archivo(fichero).añadir([registro])
+
+
+if __name__ == '__main__':
+    icao = sys.argv[1]
+    horas, minutos = sys.argv[2].split(':')
+    mes = pd.Period(sys.argv[3], 'M')
+    archivo = Archivo()
+    desde, hasta = mes.start_time.date(), mes.end_time.date()
+    with pd.option_context('display.width', 200, 'display.max_rows', 100):
+        print(archivo.cobertura(int(horas) * 60 + int(minutos), icao,
+                                desde, hasta))
+        print()
+        print(archivo.minutos_descanso(icao, desde, hasta))
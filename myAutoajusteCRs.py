@@ -0,0 +1,183 @@
+#AJUSTE AUTOMÁTICO DE PARÁMETROS POR AD (offline)
+#    python myAutoajusteCRs.py [carreraCRs.jsonl] [segundos por prueba]
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+import time
+
+from google.protobuf import text_format
+from ortools.sat.python import cp_model
+
+import myCarreraCRs # conjuntos de parámetros y registro de carreras
+import myHeuristicaCRs # estadillo heurístico (hint)
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+import myParadaCRs # callback con tiempos de las soluciones
+from shift_scheduling_sat_revCREF_v20 import cargar_problema, construir_modelo
+
+"""
+Repite las instancias (AD, turno, fecha, ATCOS) ya resueltas y registradas
+en carreraCRs.jsonl (myCarreraCRs) con cada conjunto de parámetros de
+CP-SAT (CONJUNTOS_CARRERA) y mide el tiempo hasta alcanzar el objetivo de
+referencia (el mejor del registro, con una tolerancia). El modelo es el
+de inputconfigCRs.json: sólo se ajustan parámetros del solver, no
+parametroControl, que cambia los dominios de las daily_sum_constraints y
+con ello las soluciones posibles. Las pruebas que no lo alcanzan cuentan el
+doble del tiempo máximo (PAR2). El ganador de cada AD (menor tiempo medio)
+se escribe en perfilesCRs.json, que MyConfig(icao=...) carga en lugar de
+los valores de inputconfigCRs.json.
+"""
+
+FICHERO_PERFILES = 'perfilesCRs.json'
+
+
+class ParadaObjetivo(myParadaCRs.ParadaSinMejora):
+    """Para la búsqueda al alcanzar el objetivo de referencia y guarda
+    cuándo se ha alcanzado."""
+
+    def __init__(self, objetivo):
+        myParadaCRs.ParadaSinMejora.__init__(self)
+        self.objetivo = objetivo
+        self.tiempo_objetivo = None
+
+    def on_solution_callback(self):
+        myParadaCRs.ParadaSinMejora.on_solution_callback(self)
+        if self.tiempo_objetivo is None and self.ObjectiveValue() <= self.objetivo:
+            self.tiempo_objetivo = time.time() - self.inicio
+            self.StopSearch()
+
+
+def leer_corpus(fichero=myCarreraCRs.FICHERO_CARRERA):
+    '''
+    Instancias distintas del registro de carreras con su objetivo de
+    referencia (el mejor objetivo registrado). Devuelve una lista de
+    diccionarios con las claves del registro y 'referencia'
+    '''
+    instancias = {}
+    with open(fichero, encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip() == '':
+                continue
+            registro = json.loads(linea)
+            objetivos = [r['objective'] for r in registro['resultados']
+                         if r['objective'] is not None]
+            if len(objetivos) == 0:
+                continue
+            clave = (registro['icao'], registro['turno'], registro['fecha'],
+                     registro['num_employees'], registro['block_length'],
+                     registro['demand_interval_length'],
+                     tuple(registro['traf']))
+            if clave not in instancias:
+                instancias[clave] = dict(registro, referencia=min(objetivos))
+            else:
+                instancias[clave]['referencia'] = min(
+                    instancias[clave]['referencia'], min(objetivos))
+    return list(instancias.values())
+
+
+def tiempo_hasta_objetivo(model, parametros, objetivo, max_time_in_seconds,
+                          num_search_workers):
+    '''
+    Segundos hasta una solución con objetivo <= objetivo, o None si no se
+    alcanza en max_time_in_seconds
+    '''
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    solver.parameters.num_search_workers = num_search_workers
+    text_format.Merge(parametros, solver.parameters)
+    callback = ParadaObjetivo(objetivo)
+    with contextlib.redirect_stdout(io.StringIO()):
+        solver.SolveWithSolutionCallback(model, callback)
+    return callback.tiempo_objetivo
+
+
+def ajustar_instancia(instancia, conjuntos, max_time_in_seconds, tolerancia,
+                      num_search_workers):
+    '''
+    Tiempo hasta el objetivo de referencia (PAR2) de cada conjunto de
+    parámetros en la instancia {nombre del conjunto: segundos}
+    '''
+    fecha = datetime.date.fromisoformat(instancia['fecha'])
+    lista = [instancia['icao'], instancia['num_employees'],
+             instancia['turno'], instancia['block_length'],
+             instancia['demand_interval_length'], fecha]
+    objetivo = instancia['referencia'] + tolerancia * abs(instancia['referencia'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        mC = myInputConfigCRs.MyConfig()
+        mE = myInputCRs.MyEscenario(icao=instancia['icao'],
+                                    fileTWR=mC.fileTWR,
+                                    fileTrafico=mC.fileTrafico)
+    tiempos = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        problema = cargar_problema(lista, instancia['traf'], mE, config=mC)
+        if type(problema) == str:
+            return tiempos
+        modelo = construir_modelo(
+            problema, myHeuristicaCRs.construir_estadillo(problema))
+    for nombre, parametros in conjuntos.items():
+        t = tiempo_hasta_objetivo(modelo['model'], parametros, objetivo,
+                                  max_time_in_seconds, num_search_workers)
+        tiempos[nombre] = 2 * max_time_in_seconds if t is None else t
+    return tiempos
+
+
+def ajustar_perfiles(fichero=myCarreraCRs.FICHERO_CARRERA,
+                     max_time_in_seconds=30.0, conjuntos=None, tolerancia=0.0,
+                     num_search_workers=8,
+                     fichero_perfiles=FICHERO_PERFILES):
+    '''
+    Ajusta y escribe en fichero_perfiles el perfil de cada AD del corpus:
+    {icao: {'parametros_solver', 'conjunto', 'tiempo_medio', 'instancias',
+            'fecha'}}
+    Los perfiles de otros AD que ya hubiera en el fichero se mantienen.
+    Devuelve los perfiles ajustados
+    '''
+    if conjuntos is None:
+        conjuntos = myCarreraCRs.CONJUNTOS_CARRERA
+    por_icao = {}
+    for instancia in leer_corpus(fichero):
+        por_icao.setdefault(instancia['icao'], []).append(instancia)
+
+    perfiles = {}
+    for icao, instancias in por_icao.items():
+        suma = {}
+        for instancia in instancias:
+            print("%s turno %i %s %i ATCOS (referencia %i)" % (
+                icao, instancia['turno'], instancia['fecha'],
+                instancia['num_employees'], instancia['referencia']))
+            tiempos = ajustar_instancia(instancia, conjuntos,
+                                        max_time_in_seconds, tolerancia,
+                                        num_search_workers)
+            for nombre, t in tiempos.items():
+                suma.setdefault(nombre, []).append(t)
+        completas = {n: sum(t) / len(t) for n, t in suma.items()
+                     if len(t) == len(instancias)}
+        if len(completas) == 0:
+            continue
+        nombre, tiempo = min(completas.items(), key=lambda x: x[1])
+        perfiles[icao] = {
+            'parametros_solver': conjuntos[nombre],
+            'conjunto': nombre,
+            'tiempo_medio': tiempo,
+            'instancias': len(instancias),
+            'fecha': datetime.date.today().isoformat(),
+        }
+        print("%s: %s, %0.2f s de media" % (icao, nombre, tiempo))
+
+    existentes = {}
+    if os.path.exists(fichero_perfiles):
+        with open(fichero_perfiles) as f:
+            existentes = json.load(f)
+    existentes.update(perfiles)
+    with open(fichero_perfiles, 'w') as f:
+        json.dump(existentes, f, indent=4)
+    return perfiles
+
+
+if __name__ == '__main__':
+    fichero = sys.argv[1] if len(sys.argv) > 1 else myCarreraCRs.FICHERO_CARRERA
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+    ajustar_perfiles(fichero, segundos)
@@ -0,0 +1,125 @@
+#BARRIDO DE PARÁMETROS (comparación de configuraciones)
+import copy
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+from shift_scheduling_sat_revCREF_v20 import solve_shift_scheduling
+
+"""
+Resuelve un mismo escenario (AD, ATCOS, turno, fecha) con varias
+configuraciones, p.ej.
+    {'demand_interval_length': [5, 15, 60],
+     'even_shift_tolerance': [1, 2],
+     'match_full_demand': [1, 0],
+     'min_daily_sum_off': [0.25]}
+y devuelve una tabla con objetivo, penalizaciones y tiempo de cada
+variante (producto cartesiano de los valores).
+    - escenario (datosDependencias y tráfico) se carga una sola vez
+    - la demanda se calcula una vez por demand_interval_length
+    - las variantes se resuelven en paralelo (CP-SAT libera el GIL)
+    - la parte del modelo CP-SAT que no depende de los parámetros barridos
+      (variables, turnos fijos, shift_constraints, transiciones) se
+      construye una vez y cada variante añade a una copia sólo sus sumas
+      diarias, la cobertura y la función objetivo (construir_modelo)
+"""
+
+# parámetros de inputconfigCRs.json que se pueden barrer
+# (demand_interval_length es el de app.py, no del json)
+PARAMETROS_BARRIDO = ('demand_interval_length', 'even_shift_tolerance',
+                      'match_full_demand', 'min_daily_sum_off')
+
+
+def variantes_barrido(rejilla):
+    '''
+    Lista de diccionarios {parámetro: valor} del producto cartesiano de
+    rejilla = {parámetro: [valores]}
+    '''
+    for parametro in rejilla:
+        if parametro not in PARAMETROS_BARRIDO:
+            raise KeyError(parametro)
+    parametros = list(rejilla)
+    return [dict(zip(parametros, valores)) for valores in
+            itertools.product(*[rejilla[p] for p in parametros])]
+
+
+def configuracion_variante(mC, variante):
+    '''
+    Copia de MyConfig con los valores de la variante
+    '''
+    config = copy.copy(mC)
+    for parametro, valor in variante.items():
+        if parametro == 'demand_interval_length':
+            continue
+        if parametro == 'match_full_demand':
+            valor = bool(valor)
+        setattr(config, parametro, valor)
+    return config
+
+
+def barrido_parametros(icao, num_employees, idturno, fecha, rejilla,
+                       block_length=5, demand_interval_length=5, traf=[],
+                       max_time_in_seconds=None):
+    '''
+    icao, num_employees, idturno, fecha: escenario (como en app.py)
+    rejilla: {parámetro de PARAMETROS_BARRIDO: [valores]}
+    demand_interval_length: el de las variantes que no lo barren
+    traf: demanda por hora modificada a mano (app.py)
+    Devuelve (tabla, resultados): tabla es un DataFrame con una fila por
+    variante (valores, status, objective, best_bound, penalizaciones por
+    tipo, tiempo) y resultados la salida de solve_shift_scheduling de cada
+    variante, en el mismo orden
+    '''
+    mC = myInputConfigCRs.MyConfig(icao=icao)
+    mE = myInputCRs.MyEscenario(icao=icao, fileTWR=mC.fileTWR,
+                                fileTrafico=mC.fileTrafico)
+    variantes = variantes_barrido(rejilla)
+
+    # demanda una vez por ventana (compartida por las variantes)
+    demandas = {}
+    if len(mC.hourly_cover_demands) == 0 and len(traf) == 0:
+        dfdia = mE.getdfTraficoDia(fecha.day)
+        for variante in variantes:
+            ventana = variante.get('demand_interval_length',
+                                   demand_interval_length)
+            if ventana not in demandas:
+                demandas[ventana] = mE.getdfTrafico(
+                    diames=fecha.day, idturno=idturno,
+                    ventanaflotante=ventana, dfdia=dfdia)
+
+    hilos = max(1, (os.cpu_count() or 1) // len(variantes))
+    bases = {}
+
+    def resolver(variante):
+        ventana = variante.get('demand_interval_length',
+                               demand_interval_length)
+        lista = [icao, num_employees, idturno, block_length, ventana, fecha]
+        informe = {}
+        t = time.time()
+        resultado = solve_shift_scheduling(
+            lista, traf, escenario=mE, demanda=demandas.get(ventana),
+            max_time_in_seconds=max_time_in_seconds,
+            num_search_workers=min(num_employees, hilos), respaldo=False,
+            informe=informe, config=configuracion_variante(mC, variante),
+            bases=bases)
+        fila = dict(variante)
+        fila['status'] = informe.get('status', 'ERROR')
+        fila['objective'] = informe.get('objective')
+        fila['best_bound'] = informe.get('best_bound')
+        for tipo, coste in informe.get('penalizaciones', {}).items():
+            fila['penalizacion ' + tipo] = coste
+        fila['tiempo'] = time.time() - t
+        if type(resultado) == str:
+            fila['mensaje'] = resultado
+        return fila, resultado
+
+    with ThreadPoolExecutor(max_workers=len(variantes)) as executor:
+        salidas = list(executor.map(resolver, variantes))
+
+    tabla = pd.DataFrame([fila for fila, resultado in salidas])
+    return tabla, [resultado for fila, resultado in salidas]
@@ -0,0 +1,160 @@
+#CARRERA DE PARÁMETROS DE CP-SAT (portfolio)
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.protobuf import text_format
+from ortools.sat.python import cp_model
+
+import myParadaCRs # criterio de parada (gap, sin mejora, tiempo determinista)
+
+"""
+Resuelve el mismo modelo con varios conjuntos de parámetros a la vez
+(linearization_level, search_branching, LNS, symmetry_level) y se queda:
+    - con el primero que prueba el óptimo (o la infactibilidad), que para
+      a los demás
+    - o, al agotar el tiempo, con la mejor solución encontrada
+Cada carrera se añade a FICHERO_CARRERA (una línea json) con los datos de
+la instancia y el resultado de cada conjunto, para aprender los parámetros
+por defecto de cada AD (myAutoajusteCRs).
+"""
+
+# nombre: parámetros en formato texto de SatParameters
+CONJUNTOS_CARRERA = {
+    'por_defecto': '',
+    'sin_lp': 'linearization_level: 0',
+    'lp_completa': 'linearization_level: 2',
+    'lp_search': 'search_branching: LP_SEARCH linearization_level: 2',
+    'pseudo_cost': 'search_branching: PSEUDO_COST_SEARCH',
+    'fixed_search': 'search_branching: FIXED_SEARCH',
+    'solo_lns': 'use_lns_only: true',
+    'simetria': 'symmetry_level: 4',
+}
+
+# hilos mínimos de cada conjunto: con menos hilos se corren sólo los
+# primeros conjuntos de CONJUNTOS_CARRERA (con un hilo CP-SAT no usa su
+# portfolio interno y cada conjunto sería una única estrategia)
+HILOS_POR_CONJUNTO = 2
+
+FICHERO_CARRERA = 'carreraCRs.jsonl'
+
+cerrojo_fichero = threading.Lock()
+
+
+class EventoCompuesto:
+    """Activo si lo está cualquiera de los threading.Event (sólo is_set,
+    que es lo que usa myParadaCRs.resolver_con_parada)."""
+
+    def __init__(self, *eventos):
+        self.eventos = [e for e in eventos if e is not None]
+
+    def is_set(self):
+        return any(e.is_set() for e in self.eventos)
+
+
+def repartir_hilos(conjuntos, num_search_workers,
+                   hilos_por_conjunto=HILOS_POR_CONJUNTO):
+    '''
+    {nombre: hilos} para los primeros conjuntos que caben con al menos
+    hilos_por_conjunto hilos cada uno (siempre al menos uno); los hilos
+    que sobran se dan a los primeros
+    '''
+    nombres = list(conjuntos)[:max(1, min(
+        len(conjuntos), num_search_workers // hilos_por_conjunto))]
+    hilos, resto = divmod(max(num_search_workers, len(nombres)), len(nombres))
+    return {nombre: hilos + (1 if i < resto else 0)
+            for i, nombre in enumerate(nombres)}
+
+
+def carrera_parametros(model, problema, num_search_workers,
+                       conjuntos=None, cancelar=None,
+                       al_primera_solucion=None):
+    '''
+    Resuelve model (construir_modelo) con cada conjunto de parámetros en
+    un hilo, repartiendo num_search_workers entre ellos (sólo los
+    conjuntos que caben, ver repartir_hilos).
+    conjuntos: {nombre: parámetros en texto} (por defecto CONJUNTOS_CARRERA)
+    cancelar, al_primera_solucion: ver solve_shift_scheduling
+    Devuelve (ganador, resultados): resultados es una lista de
+    diccionarios {'nombre', 'parametros', 'solver', 'status', 'callback',
+    'tiempo', 'orden'} y ganador el elemento elegido
+    '''
+    if conjuntos is None:
+        conjuntos = CONJUNTOS_CARRERA
+    fin = threading.Event()
+    parar = EventoCompuesto(fin, cancelar)
+    cerrojo = threading.Lock()
+    terminados = []
+    hilos = repartir_hilos(conjuntos, num_search_workers)
+    t0 = time.time()
+
+    def correr(nombre):
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = problema['max_time_in_seconds']
+        solver.parameters.num_search_workers = hilos[nombre]
+        text_format.Merge(conjuntos[nombre], solver.parameters)
+        status, callback = myParadaCRs.resolver_con_parada(
+            solver, model, problema['parada'], parar, al_primera_solucion)
+        with cerrojo:
+            orden = len(terminados)
+            terminados.append(nombre)
+            if status in (cp_model.OPTIMAL, cp_model.INFEASIBLE):
+                fin.set()
+        return {'nombre': nombre, 'parametros': conjuntos[nombre],
+                'solver': solver, 'status': status, 'callback': callback,
+                'tiempo': time.time() - t0, 'orden': orden}
+
+    with ThreadPoolExecutor(max_workers=len(hilos)) as executor:
+        resultados = list(executor.map(correr, list(hilos)))
+
+    # primero en probar óptimo o infactibilidad
+    concluyentes = [r for r in resultados
+                    if r['status'] in (cp_model.OPTIMAL, cp_model.INFEASIBLE)]
+    if len(concluyentes) > 0:
+        return min(concluyentes, key=lambda r: r['orden']), resultados
+    # mejor solución al agotar el tiempo (a igualdad, la que antes la tuvo)
+    con_solucion = [r for r in resultados if r['status'] == cp_model.FEASIBLE]
+    if len(con_solucion) > 0:
+        return min(con_solucion, key=lambda r: (
+            r['solver'].ObjectiveValue(), r['callback'].ultima_mejora)), resultados
+    return resultados[0], resultados
+
+
+def registrar_carrera(lista, traf, problema, ganador, resultados,
+                      fichero=FICHERO_CARRERA):
+    '''
+    Añade a fichero una línea json con la instancia (lista y traf de
+    solve_shift_scheduling), los parámetros del problema y el resultado de
+    cada conjunto de la carrera
+    '''
+    registro = {
+        'registro': datetime.datetime.now().isoformat(timespec='seconds'),
+        'icao': lista[0],
+        'num_employees': lista[1],
+        'turno': lista[2],
+        'block_length': lista[3],
+        'demand_interval_length': lista[4],
+        'fecha': lista[5].isoformat(),
+        'traf': [int(x) for x in traf],
+        'parametroControl': problema['myParametroControl'],
+        'max_time_in_seconds': problema['max_time_in_seconds'],
+        'ganador': ganador['nombre'],
+        'resultados': [{
+            'nombre': r['nombre'],
+            'parametros': r['parametros'],
+            'status': r['solver'].StatusName(r['status']),
+            'objective': (r['solver'].ObjectiveValue() if r['status'] in
+                          (cp_model.OPTIMAL, cp_model.FEASIBLE) else None),
+            'best_bound': r['solver'].BestObjectiveBound(),
+            'tiempo': r['tiempo'],
+            'primera_solucion': r['callback'].primera_solucion,
+        } for r in resultados],
+    }
+    with cerrojo_fichero:
+        with open(fichero, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + '\n')
+    print('carrera: gana %s (%s)' % (
+        ganador['nombre'], ganador['solver'].StatusName(ganador['status'])))
+    return registro
@@ -0,0 +1,316 @@
+#DIAGNÓSTICO DE INFACTIBILIDAD (literales de suposición)
+import time
+
+from ortools.sat.python import cp_model
+
+# negated_bounded_span y segmentos_rejilla del modelo completo (import del
+# módulo, no de los nombres: el modelo completo importa este módulo)
+import shift_scheduling_sat_revCREF_v20
+
+"""
+Cuando el modelo no tiene solución, CP-SAT suele agotar max_time_in_seconds
+y devolver UNKNOWN. El diagnóstico construye sólo la parte dura del modelo
+(sin función objetivo) y protege cada familia de restricciones con un
+literal de suposición (AddAssumptions):
+    - cobertura de la demanda de cada tramo de intervalos con la misma
+      demanda
+    - mínimos y máximos de secuencias (shift_constraints)
+    - descanso mínimo del turno (min_daily_sum_off)
+    - reparto equilibrado (daily_sum_constraints)
+    - transiciones prohibidas, asignaciones fijas y estado inicial
+Si no hay solución, SufficientAssumptionsForInfeasibility da un conjunto de
+familias incompatibles que se reduce quitando una a una las que no hacen
+falta (conjunto mínimo; si se agota el tiempo puede no serlo).
+Como en construir_modelo, con rejilla comprimida cada segmento es una sola
+variable y los empleados de baja descansan desde su bloque de baja sin sus
+restricciones de secuencia y suma.
+blandos=True trata también los límites blandos como duros (ej. descanso
+de 35'), para saber qué reglas penalizadas impiden cubrir la demanda
+("diagnostico_blandos" del inputconfigCRs.json).
+"""
+
+NOMBRES_TURNO = {0: 'descanso', 1: 'trabajo'}
+
+
+def nombre_turno(shift):
+    return NOMBRES_TURNO.get(shift, 'turno %i' % shift)
+
+
+def hora_texto(minutos):
+    '''
+    'HH:MM' de los minutos desde las 00:00
+    '''
+    minutos = int(round(minutos)) % (24 * 60)
+    return '%02i:%02i' % (minutos // 60, minutos % 60)
+
+
+def construir_modelo_diagnostico(problema, blandos=False):
+    '''
+    Parte dura del modelo de construir_modelo con un literal de suposición
+    por familia de restricciones.
+    Devuelve (model, familias) con familias = [(literal, descripción)]
+    '''
+    num_employees = problema['num_employees']
+    num_shifts = problema['num_shifts']
+    num_blocks = problema['num_blocks']
+    block_length = problema['block_length']
+    demand_interval_length = problema['demand_interval_length']
+    blocks_per_interval = problema['blocks_per_interval']
+    hourly_cover_demands = problema['hourly_cover_demands']
+    hora_inicio = problema.get('hora_inicio', 0)
+
+    model = cp_model.CpModel()
+    familias = []
+
+    def familia(descripcion):
+        lit = model.NewBoolVar('')
+        familias.append((lit, descripcion))
+        return lit
+
+    # una variable por segmento de la rejilla (por bloque si no está
+    # comprimida)
+    segmentos = shift_scheduling_sat_revCREF_v20.segmentos_rejilla(problema)
+    work = {}
+    for e in range(num_employees):
+        for s in range(num_shifts):
+            for inicio, longitud in segmentos:
+                var = model.NewBoolVar('')
+                for b in range(inicio, inicio + longitud):
+                    work[e, s, b] = var
+    for e in range(num_employees):
+        for b, longitud in segmentos:
+            model.AddExactlyOne([work[e, s, b] for s in range(num_shifts)])
+
+    if len(problema['fixed_assignments']) > 0:
+        lit = familia('asignaciones fijas')
+        for e, s, b in problema['fixed_assignments']:
+            model.Add(work[e, s, b] == 1).OnlyEnforceIf(lit)
+
+    # bajas: descanso desde el bloque de baja
+    bajas = problema.get('bajas') or {}
+    if len(bajas) > 0:
+        lit = familia('bajas de %i ATCOS' % len(bajas))
+        for e, corte in bajas.items():
+            for b in range(corte, num_blocks):
+                model.Add(work[e, 0, b] == 1).OnlyEnforceIf(lit)
+
+    # estado inicial: secuencias con las que se termina la ventana anterior
+    estado_inicial = problema.get('estado_inicial')
+    prefijo = {}
+    if estado_inicial is not None:
+        lit = familia('secuencias arrastradas del turno anterior')
+        for e, (shift_previo, racha) in enumerate(estado_inicial[:num_employees]):
+            for s in range(num_shifts):
+                v = model.NewBoolVar('')
+                model.Add(v == int(s == shift_previo)).OnlyEnforceIf(lit)
+                prefijo[e, s] = [v] * racha
+
+    # secuencias (shift_constraints)
+    for ct in problema['shift_constraints']:
+        shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
+        minimo = soft_min if blandos else hard_min
+        maximo = soft_max if blandos else hard_max
+        lit_min = None
+        if minimo > 1:
+            lit_min = familia("secuencias de %s de al menos %i'" % (
+                nombre_turno(shift), minimo * block_length))
+        lit_max = None
+        if maximo < num_blocks:
+            lit_max = familia("secuencias de %s de como mucho %i'" % (
+                nombre_turno(shift), maximo * block_length))
+        for e in range(num_employees):
+            if e in bajas:
+                continue
+            works = prefijo.get((e, shift), []) + [
+                work[e, shift, b] for b in range(num_blocks)]
+            if lit_min is not None:
+                for length in range(1, minimo):
+                    for start in range(len(works) - length + 1):
+                        model.AddBoolOr(
+                            shift_scheduling_sat_revCREF_v20.negated_bounded_span(
+                                works, start, length)).OnlyEnforceIf(lit_min)
+            if lit_max is not None:
+                for start in range(len(works) - maximo):
+                    model.AddBoolOr([w.Not() for w in
+                                     works[start:start + maximo + 1]]
+                                    ).OnlyEnforceIf(lit_max)
+
+    # sumas (daily_sum_constraints); la primera de descanso es min_daily_sum_off
+    min_offblocks = problema['min_daily_sum_offblocks']
+    for i, ct in enumerate(problema['daily_sum_constraints']):
+        shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
+        minimo = max(hard_min, soft_min) if blandos else hard_min
+        maximo = min(hard_max, soft_max) if blandos else hard_max
+        descanso_minimo = (i == 0 and shift == 0 and min_offblocks > 0 and
+                           hard_min == min_offblocks)
+        lit_min = lit_max = None
+        for e in range(num_employees):
+            if e in bajas:
+                continue
+            total = cp_model.LinearExpr.Sum(
+                [work[e, shift, b] for b in range(num_blocks)])
+            if minimo > 0:
+                if lit_min is None:
+                    if descanso_minimo:
+                        lit = familia("descanso mínimo del %i%% del turno "
+                                      "(%i')" % (
+                                          round(problema['min_daily_sum_off'] * 100),
+                                          minimo * block_length))
+                    else:
+                        lit = familia("reparto equilibrado: al menos %i' de %s"
+                                      % (minimo * block_length,
+                                         nombre_turno(shift)))
+                    lit_min = lit
+                model.Add(total >= minimo).OnlyEnforceIf(lit_min)
+            if maximo < num_blocks:
+                if lit_max is None:
+                    lit_max = familia("reparto equilibrado: como mucho %i' de %s"
+                                      % (maximo * block_length,
+                                         nombre_turno(shift)))
+                model.Add(total <= maximo).OnlyEnforceIf(lit_max)
+
+    # transiciones prohibidas
+    for previous_shift, next_shift, cost in problema['penalized_transitions']:
+        if cost != 0:
+            continue
+        lit = familia('transición prohibida %s-%s' % (
+            nombre_turno(previous_shift), nombre_turno(next_shift)))
+        for e in range(num_employees):
+            for b in range(num_blocks - 1):
+                model.AddBoolOr([work[e, previous_shift, b].Not(),
+                                 work[e, next_shift, b + 1].Not()]
+                                ).OnlyEnforceIf(lit)
+
+    # cobertura de la demanda: un literal por tramo de intervalos
+    # consecutivos con la misma demanda
+    for s in range(1, num_shifts):
+        h = 0
+        while h < problema['num_demandintervals']:
+            pos_demand = hourly_cover_demands[h][s - 1]
+            fin = h + 1
+            while (fin < problema['num_demandintervals'] and
+                   hourly_cover_demands[fin][s - 1] == pos_demand):
+                fin += 1
+            if pos_demand > 0 or problema['match_full_demand']:
+                inicio = hora_inicio * 60 + h * demand_interval_length
+                if fin - h == 1:
+                    cuando = 'a las %s' % hora_texto(inicio)
+                else:
+                    cuando = 'de %s a %s' % (hora_texto(inicio), hora_texto(
+                        hora_inicio * 60 + fin * demand_interval_length))
+                lit = familia('demanda de %i posiciones %s con %i ATCOS' % (
+                    pos_demand, cuando, num_employees))
+                for timeblock in range(h * blocks_per_interval,
+                                       fin * blocks_per_interval):
+                    worked = cp_model.LinearExpr.Sum(
+                        [work[e, s, timeblock] for e in range(num_employees)])
+                    if problema['match_full_demand']:
+                        model.Add(worked == pos_demand).OnlyEnforceIf(lit)
+                    else:
+                        model.Add(worked <= pos_demand).OnlyEnforceIf(lit)
+            h = fin
+
+    return model, familias
+
+
+def resolver_suposiciones(model, literales, max_time_in_seconds,
+                          num_search_workers=8):
+    '''
+    Resuelve model suponiendo ciertos los literales con num_search_workers
+    hilos.
+    Devuelve (status, índices en literales del conjunto incompatible)
+    '''
+    model.ClearAssumptions()
+    model.AddAssumptions(literales)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max(0.1, max_time_in_seconds)
+    solver.parameters.num_search_workers = num_search_workers
+    status = solver.Solve(model)
+    nucleo = []
+    if status == cp_model.INFEASIBLE:
+        indices = {lit.Index(): i for i, lit in enumerate(literales)}
+        nucleo = [indices[x] for x in
+                  solver.SufficientAssumptionsForInfeasibility()
+                  if x in indices]
+    return status, nucleo
+
+
+def diagnosticar_infactibilidad(problema, blandos=False,
+                                max_time_in_seconds=5.0,
+                                num_search_workers=8, informe=None):
+    '''
+    Conjunto mínimo de familias de restricciones incompatibles.
+    Devuelve la lista de descripciones, [] si el problema tiene solución o
+    None si no se ha podido decidir en max_time_in_seconds.
+    informe: diccionario en el que se guarda 'minimo' (False si se agotó
+    el tiempo antes de terminar la reducción)
+    '''
+    if informe is None:
+        informe = {}
+    t0 = time.time()
+    model, familias = construir_modelo_diagnostico(problema, blandos)
+    literales = [lit for lit, descripcion in familias]
+    status, nucleo = resolver_suposiciones(model, literales,
+                                           max_time_in_seconds,
+                                           num_search_workers)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return []
+    if status != cp_model.INFEASIBLE:
+        return None
+    if len(nucleo) == 0:
+        # incompatible sin suposiciones (ej. más demanda que ATCOS)
+        nucleo = list(range(len(familias)))
+
+    # reducción: se quita cada familia si sin ella sigue sin haber
+    # solución. Una familia necesaria lo sigue siendo en cualquier
+    # subconjunto, así que sólo se prueban las que aún no se han probado
+    # (también las que quedan delante al reducir con subnucleo)
+    informe['minimo'] = True
+    nucleo = sorted(nucleo)
+    probadas = set()
+    while True:
+        pendientes = [j for j in nucleo if j not in probadas]
+        if len(pendientes) == 0:
+            break
+        restante = max_time_in_seconds - (time.time() - t0)
+        if restante <= 0:
+            informe['minimo'] = False
+            break
+        familia_prueba = pendientes[0]
+        prueba = [j for j in nucleo if j != familia_prueba]
+        status, subnucleo = resolver_suposiciones(
+            model, [literales[j] for j in prueba], restante,
+            num_search_workers)
+        if status == cp_model.INFEASIBLE:
+            if len(subnucleo) > 0:
+                nucleo = sorted(prueba[j] for j in subnucleo)
+            else:
+                nucleo = prueba
+        else:
+            # necesaria o, si UNKNOWN, sin decidir: la familia se mantiene
+            if status == cp_model.UNKNOWN:
+                informe['minimo'] = False
+            probadas.add(familia_prueba)
+    return [familias[j][1] for j in nucleo]
+
+
+def mensaje_diagnostico(conflicto, minimo=True):
+    '''
+    Texto del conjunto incompatible: las demandas frente a las reglas.
+    minimo=False avisa de que puede sobrar alguna (ver informe['minimo']
+    de diagnosticar_infactibilidad)
+    '''
+    demandas = [x for x in conflicto if x.startswith('demanda')]
+    reglas = [x for x in conflicto if not x.startswith('demanda')]
+    if len(demandas) == 0:
+        msg = "Reglas incompatibles entre sí: " + "; ".join(reglas)
+    else:
+        msg = "La " + "; ".join(demandas)
+        if len(reglas) > 0:
+            msg = msg + " choca con: " + "; ".join(reglas)
+        else:
+            msg = msg + " no se puede cubrir"
+    if not minimo:
+        msg = msg + (" (conjunto posiblemente no mínimo: se agotó el tiempo"
+                     " del diagnóstico)")
+    return msg
@@ -0,0 +1,130 @@
+#ESTIMACIÓN DEL NÚMERO DE ATCOS (sin solver)
+import math
+
+import myInputConfigCRs # datos json configuración cálculos OR
+
+"""
+Cotas del número de ATCOS necesario para cubrir la demanda de posiciones
+de un turno con las reglas de descanso, sin construir ningún modelo:
+
+cota inferior (necesaria, con menos no hay estadillo posible):
+    - pico de demanda de posiciones
+    - trabajo total: cada ATCO trabaja como mucho el (1-min_off) del turno
+    - ventanas de trabajo_max+descanso_min: en cualquier ventana de esa
+      longitud cada ATCO trabaja como mucho trabajo_max
+
+estimación superior (no es una cota demostrada: es el tamaño de una
+rotación escalonada en la que cada ATCO trabaja trabajo_max y descansa al
+menos descanso_min y min_off, que suele bastar):
+    - pico / (1 - fracción de descanso), más un ATCO por redondeo de bloques
+"""
+
+
+def estimar_atcos(posiciones, block_length=5, descanso_min=35,
+                  trabajo_max=120, min_off=0.25):
+    '''
+    posiciones: demanda de posiciones por bloque
+    block_length: minutos por bloque
+    descanso_min, trabajo_max: minutos
+    min_off: fracción mínima de descanso del turno (ej. 0.25=25%)
+    Devuelve (cota_inferior, estimación superior)
+    '''
+    num_blocks = len(posiciones)
+    if num_blocks == 0:
+        return 0, 0
+    pico = max(posiciones)
+    if pico == 0:
+        return 0, 0
+
+    trabajo = max(1, trabajo_max // block_length)
+    descanso = math.ceil(descanso_min / block_length)
+    offblocks = math.ceil(min_off * num_blocks)
+
+    # pico y trabajo total
+    cota_inferior = pico
+    if num_blocks > offblocks:
+        cota_inferior = max(cota_inferior,
+                            math.ceil(sum(posiciones) / (num_blocks - offblocks)))
+
+    # ventanas deslizantes de trabajo+descanso bloques (sumas acumuladas)
+    ventana = trabajo + descanso
+    if ventana <= num_blocks:
+        acumulado = [0]
+        for x in posiciones:
+            acumulado.append(acumulado[-1] + x)
+        maximo = max(acumulado[b + ventana] - acumulado[b]
+                     for b in range(num_blocks - ventana + 1))
+        cota_inferior = max(cota_inferior, math.ceil(maximo / trabajo))
+
+    # rotación escalonada
+    fraccion_descanso = max(min_off, descanso / (trabajo + descanso))
+    estimacion_superior = math.ceil(pico / (1 - fraccion_descanso)) + 1
+    return cota_inferior, max(cota_inferior, estimacion_superior)
+
+
+def reglas_configuracion(mC):
+    '''
+    (descanso_min, trabajo_max, min_off) de inputconfigCRs.json: soft_min
+    de las secuencias de descanso (turno 0) y hard_max de las de trabajo
+    (turno 1), en minutos
+    '''
+    descanso_min = 35
+    trabajo_max = 120
+    for ct in mC.shift_constraints:
+        if ct[0] == 0:
+            descanso_min = ct[2]
+        elif ct[0] == 1:
+            trabajo_max = ct[5]
+    return descanso_min, trabajo_max, mC.min_daily_sum_off
+
+
+def estimar_atcos_problema(problema):
+    '''
+    Cota inferior estricta para un problema de preparar_problema: usa los
+    límites duros del modelo (hard_min de descanso, hard_max de trabajo),
+    así que con menos ATCOS CP-SAT no puede encontrar solución
+    '''
+    block_length = problema['block_length']
+    blocks_per_interval = problema['blocks_per_interval']
+    descanso_min = block_length
+    trabajo_max = problema['num_blocks'] * block_length
+    for ct in problema['shift_constraints']:
+        if ct[0] == 0:
+            descanso_min = ct[1] * block_length
+        elif ct[0] == 1:
+            trabajo_max = ct[5] * block_length
+    posiciones = []
+    for x in problema['hourly_cover_demands']:
+        posiciones.extend([x[0]] * blocks_per_interval)
+    posiciones = posiciones[:problema['num_blocks']]
+    return estimar_atcos(posiciones, block_length, descanso_min,
+                         trabajo_max, problema['min_daily_sum_off'])[0]
+
+
+def estimar_atcos_turno(escenario, diames, idturno, demand_interval_length,
+                        block_length=5, traf=[], mC=None, demanda=None):
+    '''
+    Cota inferior y estimación superior para el turno idturno del diames
+    del escenario (MyEscenario).
+    traf: demanda por hora modificada a mano (app.py)
+    mC: MyConfig ya cargado (si None se lee inputconfigCRs.json)
+    demanda: (listademanda, listaposiciones) ya calculada; si None se
+    calcula con getdfTrafico
+    Devuelve (cota_inferior, estimación superior) o None si no hay demanda
+    '''
+    if mC is None:
+        mC = myInputConfigCRs.MyConfig()
+    if demanda is None:
+        demanda = escenario.getdfTrafico(
+            diames=diames, idturno=idturno,
+            ventanaflotante=demand_interval_length, TRAF=traf)
+    (listademanda, listaposiciones) = demanda
+    if len(listaposiciones) == 0:
+        return None
+    blocks_per_interval = int(demand_interval_length / block_length)
+    posiciones = []
+    for x in listaposiciones:
+        posiciones.extend([int(x)] * blocks_per_interval)
+    descanso_min, trabajo_max, min_off = reglas_configuracion(mC)
+    return estimar_atcos(posiciones, block_length, descanso_min,
+                         trabajo_max, min_off)
@@ -0,0 +1,313 @@
+#EXPORTACIÓN DE ESTADILLOS A EXCEL (estadillo de app.py y lotes)
+import multiprocessing
+import os
+import queue
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import ColorScaleRule
+from openpyxl.styles import PatternFill
+from openpyxl.utils.cell import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+"""
+    - tabla_estadillo, tabla_tramos: DataFrames del estadillo y de los
+      tramos (D/T y minutos) de cada ATCO a partir de la salida de
+      solve_shift_scheduling (antes en app.py)
+    - libro_estadillo: libro de un estadillo (antes transf de app.py)
+    - exportar_lote: muchos estadillos (p.ej. un mes de
+      myMultidiaCRs) en un libro con una hoja por día y turno, o en varios
+      si pasan de max_hojas. Usa el modo write_only de openpyxl (las filas
+      se escriben a disco según se añaden, la memoria no crece con el
+      número de hojas) y los mismos objetos de estilo en todas las celdas
+    - ExportadorLote: exportar_lote en un proceso aparte, al que se envían
+      los estadillos según se resuelven
+"""
+
+# celdas en las que se trabaja
+RELLENO_TRABAJO = PatternFill(start_color='91E183', end_color='91E183',
+                              fill_type='solid')
+
+# hojas por libro en exportar_lote (un mes con tres turnos cabe en uno)
+MAX_HOJAS = 93
+
+# segundos que ExportadorLote.cerrar espera a que termine el proceso una
+# vez devueltos los ficheros
+ESPERA_CIERRE = 60
+
+
+def regla_demanda():
+    '''
+    Gradiente de colores de la fila de demanda de tráfico
+    '''
+    return ColorScaleRule(start_type='min', start_color='25D82B',
+                          mid_type='num', mid_value=70, mid_color='F0A22A',
+                          end_type='max', end_color='E03C18')
+
+
+def tabla_estadillo(resultado, demand_interval_length, block_length):
+    '''
+    DataFrame del estadillo resultado (primer elemento de la salida de
+    solve_shift_scheduling): filas POS_DEMAND, TRAFFIC_DEMAND y una por
+    ATCO; columnas nombre, tiempo (h), porcentaje y una por bloque
+    '''
+    # Formato de la salida de la función que calcula el estadillo
+    dfs = [pd.DataFrame(line.split(',')).transpose() for line in resultado]
+    df = pd.concat(dfs).reset_index(drop=True).iloc[:, 0:-1]
+
+    grupo = int(demand_interval_length/block_length)
+
+    lista1 = [i for i in list(filter(lambda x: x != ' ', df.iloc[0,1:])) for j in range(grupo)]
+    lista2 = [i for i in list(filter(lambda x: x != ' ', df.iloc[1,1:])) for j in range(grupo)]
+
+    if len(lista1) > (df.shape[1] - 1):
+        a = len(lista1) - (df.shape[1] - 1)
+        lista1 = lista1[:-a]
+        lista2 = lista2[:-a]
+
+    df.loc[0, 1:] = lista1
+    df.loc[1, 1:] = lista2
+
+    df.loc[:1, 1:]=df.loc[:1, 1:].astype('int')
+
+    durations = [int((row.values == 'T').sum()) for index, row in df.iterrows()]
+
+    porcentaje = [(i/(len(df.columns)-1))*100 for i in durations]
+    duration = [(i*block_length)/60 for i in durations]
+
+    df.insert(1, 'tiempo', duration)
+    df.insert(2, 'porcentaje', porcentaje)
+    return df
+
+
+def tabla_tramos(df, block_length):
+    '''
+    DataFrame con los tramos de cada ATCO de tabla_estadillo:
+    [nombre, ('D:', minutos), ('T:', minutos), ...]
+    '''
+    df2 = df.iloc[2:,3:]
+    count_dicc = {}
+
+    for index, row in df2.iterrows():
+        count_list = []
+        current_item = row.values[0]
+        current_count = block_length
+
+        for item in row.values[1:]:
+            if item == current_item:
+                current_count += block_length
+            else:
+                last_item = current_item
+                count_list.append((last_item+':', current_count))
+                current_item = item
+                current_count = block_length
+
+        count_list.append(((current_item+':', current_count)))
+
+        count_dicc['worker'+str(index-2)] = count_list
+
+    longitud_maxima = max(map(len, count_dicc.values()))
+
+    for key in count_dicc:
+        lista = count_dicc[key]
+        while len(lista) < longitud_maxima:
+            lista.append(None)
+
+    return pd.DataFrame(count_dicc).transpose().reset_index().replace({None: ''}).astype('str')
+
+
+def libro_estadillo(tabla, tabla2, nombre, demand_interval_length,
+                    block_length):
+    '''
+    Guarda en nombre (.xlsx) el estadillo tabla (tabla_estadillo) en la
+    primera hoja y los tramos tabla2 (tabla_tramos) en la segunda
+    '''
+    wb = Workbook()
+    ws1 = wb.active
+    for r in dataframe_to_rows(tabla, index=False, header=False):
+        ws1.append(r)
+
+    # gradiente de colores en primera fila de estadillo
+    ws1.conditional_formatting.add('D2:CO2', regla_demanda())
+
+    # Agrupa las celdas de número en la primera fila
+    grupo = int(demand_interval_length/block_length)
+    column_index = 4
+    num_groups = (tabla.shape[1] - 3) // grupo
+    last_group_size = (tabla.shape[1] - 3) % grupo
+
+    for i in range(num_groups+1):
+        if i == num_groups and last_group_size != 0:
+            group_size = last_group_size
+        else:
+            group_size = grupo
+
+        column_letter_start = get_column_letter(column_index)
+        column_letter_end = get_column_letter(column_index + group_size - 1)
+        cell_start_1 = f'{column_letter_start}1'
+        cell_end_1 = f'{column_letter_end}1'
+
+        ws1.merge_cells(f'{cell_start_1}:{cell_end_1}')
+        cell_start_2 = f'{column_letter_start}2'
+        cell_end_2 = f'{column_letter_end}2'
+        ws1.merge_cells(f'{cell_start_2}:{cell_end_2}')
+
+        column_index += group_size
+
+    # rellenar de verde las celdas en las que se trabaja
+    for fila in ws1.iter_rows(min_col=4):
+        for cell in fila:
+            if cell.value == 'T':
+                cell.fill = RELLENO_TRABAJO
+
+    # cambiar tamaño de columnas
+    ws1.column_dimensions['A'].width = 20
+    for i in range(4, 94):
+        col_letter = get_column_letter(i)
+        ws1.column_dimensions[col_letter].width = 2.8
+
+    ws2 = wb.create_sheet()
+    for t in dataframe_to_rows(tabla2, index=False, header=False):
+        ws2.append(t)
+
+    #generar excel descargable
+    wb.save(nombre)
+
+
+def horas_bloques(hora_inicio, num_blocks, block_length):
+    '''
+    'hh:mm' de inicio de cada bloque (hora_inicio en hora decimal)
+    '''
+    inicio = int(round(hora_inicio * 60))
+    return ['%02i:%02i' % divmod((inicio + b * block_length) % 1440, 60)
+            for b in range(num_blocks)]
+
+
+def escribir_hoja(ws, tabla, tabla2, hora_inicio, block_length):
+    '''
+    Escribe en la hoja write_only ws la cabecera de horas, el estadillo
+    tabla y, tras una fila vacía, los tramos tabla2
+    '''
+    num_blocks = tabla.shape[1] - 3
+    ws.column_dimensions['A'].width = 20
+    for i in range(4, num_blocks + 4):
+        ws.column_dimensions[get_column_letter(i)].width = 2.8
+    ws.append(['ATCOS', 'Tiempo', 'Porcentaje'] +
+              horas_bloques(hora_inicio, num_blocks, block_length))
+    for fila in tabla.itertuples(index=False):
+        celdas = list(fila)
+        for i in range(3, len(celdas)):
+            if celdas[i] == 'T':
+                celda = WriteOnlyCell(ws, value='T')
+                celda.fill = RELLENO_TRABAJO
+                celdas[i] = celda
+        ws.append(celdas)
+    # fila 3: demanda de tráfico
+    ws.conditional_formatting.add(
+        'D3:%s3' % get_column_letter(num_blocks + 3), regla_demanda())
+    ws.append([])
+    for fila in tabla2.itertuples(index=False):
+        ws.append(list(fila))
+
+
+def nombre_hoja(estadillo):
+    nombre = '%s %s T%i' % (estadillo['icao'], estadillo['fecha'].isoformat(),
+                            estadillo['turno'])
+    if estadillo.get('heuristico'):
+        nombre = nombre + ' heur'
+    return nombre
+
+
+def exportar_lote(estadillos, fichero, max_hojas=MAX_HOJAS):
+    '''
+    estadillos: iterable de diccionarios {'icao', 'fecha', 'turno',
+        'resultado' (salida de solve_shift_scheduling), 'hora_inicio',
+        'demand_interval_length', 'block_length'}
+    Escribe una hoja por estadillo en fichero (.xlsx) y, a partir de
+    max_hojas, en fichero_2.xlsx, fichero_3.xlsx... Los resultados que no
+    son estadillo (mensajes) se omiten. Si 'heuristico' es True el
+    estadillo es el de respaldo (el solver no ha encontrado solución): la
+    hoja lleva ' heur' en el nombre y al final el aviso de lo que no
+    cumple.
+    Devuelve la lista de ficheros escritos
+    '''
+    base, extension = os.path.splitext(fichero)
+    ficheros = []
+    wb = None
+    hojas = 0
+    for estadillo in estadillos:
+        if type(estadillo['resultado']) != list:
+            print("%s: sin estadillo, no se exporta" % nombre_hoja(estadillo))
+            continue
+        if wb is None or hojas == max_hojas:
+            if wb is not None:
+                wb.save(ficheros[-1])
+            wb = Workbook(write_only=True)
+            hojas = 0
+            ficheros.append(fichero if len(ficheros) == 0 else
+                            '%s_%i%s' % (base, len(ficheros) + 1, extension))
+        tabla = tabla_estadillo(estadillo['resultado'][0],
+                                estadillo['demand_interval_length'],
+                                estadillo['block_length'])
+        tabla2 = tabla_tramos(tabla, estadillo['block_length'])
+        ws = wb.create_sheet(nombre_hoja(estadillo))
+        escribir_hoja(ws, tabla, tabla2, estadillo['hora_inicio'],
+                      estadillo['block_length'])
+        if estadillo.get('heuristico'):
+            ws.append([])
+            for msg in estadillo['resultado'][1]:
+                ws.append([msg])
+        hojas += 1
+    if wb is not None:
+        wb.save(ficheros[-1])
+    return ficheros
+
+
+def proceso_exportacion(cola, salida, fichero, max_hojas):
+    # estadillos de la cola hasta recibir None
+    salida.put(exportar_lote(iter(cola.get, None), fichero, max_hojas))
+
+
+class ExportadorLote:
+    """exportar_lote en un proceso aparte: añadir envía cada estadillo según
+    se resuelve y cerrar espera a que se guarden los libros."""
+
+    def __init__(self, fichero, max_hojas=MAX_HOJAS):
+        self.cola = multiprocessing.Queue()
+        self.salida = multiprocessing.Queue()
+        self.proceso = multiprocessing.Process(
+            target=proceso_exportacion,
+            args=(self.cola, self.salida, fichero, max_hojas))
+        self.proceso.start()
+
+    def añadir(self, estadillo):
+        self.cola.put(estadillo)
+
+    def cerrar(self, espera=ESPERA_CIERRE):
+        '''
+        Devuelve la lista de ficheros escritos. RuntimeError si el proceso
+        termina sin devolverla (p.ej. por un error al escribir) o si no
+        termina espera segundos después
+        '''
+        self.cola.put(None)
+        while True:
+            try:
+                ficheros = self.salida.get(timeout=1)
+                break
+            except queue.Empty:
+                if self.proceso.is_alive():
+                    continue
+            # el proceso ha terminado: lo que haya enviado ya está en la cola
+            try:
+                ficheros = self.salida.get(timeout=1)
+                break
+            except queue.Empty:
+                raise RuntimeError(
+                    "el proceso de exportación ha terminado (exitcode %s) "
+                    "sin escribir los libros" % self.proceso.exitcode)
+        self.proceso.join(espera)
+        if self.proceso.is_alive():
+            self.proceso.terminate()
+            raise RuntimeError("el proceso de exportación no termina")
+        return ficheros
@@ -0,0 +1,217 @@
+#ESTADILLO HEURÍSTICO (constructivo, sin CP-SAT)
+
+"""
+Construye un estadillo bloque a bloque en milisegundos:
+    - en cada bloque trabajan exactamente las posiciones demandadas
+      (hourly_cover_demands)
+    - respeta los mínimos/máximos de secuencias (shift_constraints) y de
+      sumas (daily_sum_constraints, incluye min_daily_sum_off)
+    - rotación: entra primero quien ya ha descansado el mínimo y sale
+      quien lleva más tiempo trabajando
+
+Se usa como vista previa, como hint para CP-SAT y como respuesta cuando
+CP-SAT no encuentra solución. No garantiza cumplir todas las
+restricciones: validar_estadillo devuelve los incumplimientos.
+
+Turno 0 = descanso, turno 1 = trabajo (shifts de inputconfigCRs.json)
+"""
+
+DESCANSO = 0
+TRABAJO = 1
+
+
+def limites_secuencia(problema, shift):
+    '''
+    (hard_min, soft_min, soft_max, hard_max) en bloques de las secuencias
+    del turno shift (shift_constraints)
+    '''
+    num_blocks = problema['num_blocks']
+    for ct in problema['shift_constraints']:
+        if ct[0] == shift:
+            return ct[1], ct[2], ct[4], ct[5]
+    return 1, 1, num_blocks, num_blocks
+
+
+def limites_suma(problema, shift):
+    '''
+    (hard_min, hard_max) del número de bloques del turno shift por empleado
+    (daily_sum_constraints)
+    '''
+    hard_min = 0
+    hard_max = problema['num_blocks']
+    for ct in problema['daily_sum_constraints']:
+        if ct[0] == shift:
+            hard_min = max(hard_min, ct[1])
+            hard_max = min(hard_max, ct[5])
+    return hard_min, hard_max
+
+
+def demanda_bloques(problema, acotada=True):
+    '''
+    Posiciones demandadas en cada bloque (si acotada, como mucho el número
+    de ATCOS)
+    '''
+    hourly_cover_demands = problema['hourly_cover_demands']
+    blocks_per_interval = problema['blocks_per_interval']
+    num_employees = problema['num_employees']
+    demanda = []
+    for b in range(problema['num_blocks']):
+        h = min(b // blocks_per_interval, len(hourly_cover_demands) - 1)
+        posiciones = int(hourly_cover_demands[h][0])
+        demanda.append(min(num_employees, posiciones) if acotada
+                       else posiciones)
+    return demanda
+
+
+def construir_estadillo(problema):
+    '''
+    Devuelve el estadillo [empleado][bloque] = turno (0 descanso, 1 trabajo)
+    '''
+    num_employees = problema['num_employees']
+    num_blocks = problema['num_blocks']
+    demanda = demanda_bloques(problema)
+
+    off_hmin, off_smin, off_smax, off_hmax = limites_secuencia(problema, DESCANSO)
+    wrk_hmin, wrk_smin, wrk_smax, wrk_hmax = limites_secuencia(problema, TRABAJO)
+    off_total_min, off_total_max = limites_suma(problema, DESCANSO)
+    wrk_total_min, wrk_total_max = limites_suma(problema, TRABAJO)
+
+    # estado de cada empleado: turno actual, longitud de la secuencia,
+    # bloques de descanso y de trabajo acumulados. Al inicio del turno
+    # todos están descansados, salvo que haya estado_inicial (secuencia
+    # con la que terminan la ventana anterior)
+    estado_inicial = problema.get('estado_inicial')
+    actual = [DESCANSO] * num_employees
+    racha = [off_smin] * num_employees
+    if estado_inicial is not None:
+        for e, (shift, n) in enumerate(estado_inicial[:num_employees]):
+            actual[e] = TRABAJO if shift == TRABAJO else DESCANSO
+            racha[e] = n
+    total_off = [0] * num_employees
+    total_wrk = [0] * num_employees
+    estadillo = [[] for e in range(num_employees)]
+
+    for b in range(num_blocks):
+        restantes = num_blocks - b
+        obligado_trabajar = []
+        obligado_descansar = []
+        candidatos = []
+        for e in range(num_employees):
+            if actual[e] == TRABAJO:
+                obliga_trabajo = (racha[e] < wrk_hmin or
+                                  total_off[e] >= off_total_max)
+                obliga_descanso = (racha[e] >= wrk_hmax or
+                                   total_wrk[e] >= wrk_total_max)
+            else:
+                obliga_trabajo = (racha[e] >= off_hmax or
+                                  total_off[e] >= off_total_max)
+                obliga_descanso = ((b > 0 or estado_inicial is not None) and
+                                   racha[e] < off_hmin or
+                                   total_wrk[e] >= wrk_total_max)
+            if off_total_min - total_off[e] >= restantes:
+                obliga_descanso = True
+            if wrk_total_min - total_wrk[e] >= restantes:
+                obliga_trabajo = True
+
+            if obliga_trabajo and not obliga_descanso:
+                obligado_trabajar.append(e)
+            elif obliga_descanso and not obliga_trabajo:
+                obligado_descansar.append(e)
+            else:
+                candidatos.append(e)
+
+        def prioridad(e):
+            # menor = antes entra a trabajar
+            if actual[e] == TRABAJO and racha[e] < wrk_smin:
+                grupo = 0 # evita secuencias de trabajo cortas
+            elif actual[e] == DESCANSO and racha[e] >= off_smin:
+                grupo = 1 # descansado: releva a quien lleva más tiempo
+            elif actual[e] == TRABAJO and racha[e] < wrk_smax:
+                grupo = 2
+            elif actual[e] == DESCANSO:
+                grupo = 3 # descanso corto (penalizado)
+            else:
+                grupo = 4 # secuencia de trabajo larga (penalizada)
+            if actual[e] == TRABAJO:
+                return (grupo, racha[e], total_wrk[e], e)
+            return (grupo, -racha[e], total_wrk[e], e)
+
+        elegidos = sorted(obligado_trabajar, key=prioridad)[:demanda[b]]
+        for grupo in (candidatos, obligado_descansar):
+            for e in sorted(grupo, key=prioridad):
+                if len(elegidos) >= demanda[b]:
+                    break
+                elegidos.append(e)
+        elegidos = set(elegidos)
+
+        for e in range(num_employees):
+            turno = TRABAJO if e in elegidos else DESCANSO
+            if turno == actual[e] and (b > 0 or estado_inicial is not None):
+                racha[e] += 1
+            else:
+                racha[e] = 1
+            actual[e] = turno
+            if turno == TRABAJO:
+                total_wrk[e] += 1
+            else:
+                total_off[e] += 1
+            estadillo[e].append(turno)
+
+    return estadillo
+
+
+def secuencias(fila, shift):
+    '''
+    Longitudes de las secuencias consecutivas del turno shift en la fila
+    '''
+    longitudes = []
+    n = 0
+    for s in fila:
+        if s == shift:
+            n += 1
+        elif n > 0:
+            longitudes.append(n)
+            n = 0
+    if n > 0:
+        longitudes.append(n)
+    return longitudes
+
+
+def validar_estadillo(problema, estadillo):
+    '''
+    Incumplimientos de las restricciones duras del estadillo (lista de str):
+    cobertura de la demanda (sin acotar al número de ATCOS), secuencias y
+    sumas por empleado. Las secuencias incluyen la del estado_inicial con
+    la que cada empleado llega al turno, como en construir_modelo
+    '''
+    block_length = problema['block_length']
+    demanda = demanda_bloques(problema, acotada=False)
+    estado_inicial = problema.get('estado_inicial') or []
+    incumplimientos = []
+
+    for b in range(problema['num_blocks']):
+        trabajando = sum(1 for fila in estadillo if fila[b] == TRABAJO)
+        if trabajando > demanda[b] or (problema['match_full_demand'] and
+                                       trabajando < demanda[b]):
+            incumplimientos.append("bloque %i: %i posiciones de %i" % (
+                b, trabajando, demanda[b]))
+
+    for e, fila in enumerate(estadillo):
+        prefijo = []
+        if e < len(estado_inicial):
+            shift_previo, racha = estado_inicial[e]
+            prefijo = [shift_previo] * racha
+        for ct in problema['shift_constraints']:
+            shift, hard_min, hard_max = ct[0], ct[1], ct[5]
+            for n in secuencias(prefijo + list(fila), shift):
+                if n < hard_min or n > hard_max:
+                    incumplimientos.append(
+                        "worker%i: secuencia de %i' en turno %i" % (
+                            e, n * block_length, shift))
+        for shift in (DESCANSO, TRABAJO):
+            hard_min, hard_max = limites_suma(problema, shift)
+            n = fila.count(shift)
+            if n < hard_min or n > hard_max:
+                incumplimientos.append("worker%i: %i' en turno %i" % (
+                    e, n * block_length, shift))
+    return incumplimientos
@@ -0,0 +1,198 @@
+#HISTORIAL DE RESOLUCIONES (SQLite)
+#    python myHistorialCRs.py [ICAO] [D|W|M]    (latencias y tendencia)
+import datetime
+import hashlib
+import json
+import sqlite3
+import sys
+
+import pandas as pd
+
+"""
+Cada resolución de solve_shift_scheduling se añade a FICHERO_HISTORIAL
+(si "historial" del inputconfigCRs.json es 1) con:
+    - huella (sha1) de la entrada: escenario, demanda y parámetros del
+      modelo, para reconocer repeticiones de la misma instancia
+    - ICAO, turno, fecha, ATCOS, bloque y ventana
+    - tamaño del modelo (variables y restricciones)
+    - status, objetivo, cota, motivo de parada y conjunto ganador (carrera)
+    - tiempo hasta la primera solución, tiempo del solver y tiempo total
+informe_latencias da p50/p95 por AD y tendencia su evolución por día,
+semana o mes, para ver regresiones de rendimiento.
+"""
+
+FICHERO_HISTORIAL = 'historialCRs.sqlite'
+
+# claves del problema (preparar_problema y solve_shift_scheduling) que
+# definen el modelo; las demás (tiempos, parada, diagnóstico, carrera,
+# historial, archivo, perfilado, nombres...) no entran en la huella, así
+# que añadir opciones de resolución no la cambia
+CLAVES_MODELO = ('num_employees', 'num_hours', 'block_length',
+                 'demand_interval_length', 'num_demandintervals',
+                 'blocks_per_interval', 'num_blocks',
+                 'min_daily_sum_offblocks', 'min_daily_sum_off', 'shifts',
+                 'num_shifts', 'listademanda', 'listaposiciones',
+                 'hourly_cover_demands', 'hourly_traffic_demands',
+                 'capacidad_segun_posiciones', 'maxcap', 'fixed_assignments',
+                 'requests', 'shift_constraints', 'daily_sum_constraints',
+                 'penalized_transitions', 'excess_cover_penalties',
+                 'myParametroControl', 'match_full_demand',
+                 'deficit_cover_penalty', 'rejilla_comprimida',
+                 'segmento_maximo', 'estado_inicial', 'bajas')
+
+CREAR_TABLA = """
+CREATE TABLE IF NOT EXISTS resoluciones (
+    registro TEXT,
+    huella TEXT,
+    icao TEXT,
+    turno INTEGER,
+    fecha TEXT,
+    num_employees INTEGER,
+    block_length INTEGER,
+    demand_interval_length INTEGER,
+    num_variables INTEGER,
+    num_restricciones INTEGER,
+    status TEXT,
+    objective REAL,
+    best_bound REAL,
+    motivo TEXT,
+    carrera TEXT,
+    tiempo_primera_solucion REAL,
+    wall_time REAL,
+    tiempo_total REAL
+)"""
+
+COLUMNAS = ('registro', 'huella', 'icao', 'turno', 'fecha', 'num_employees',
+            'block_length', 'demand_interval_length', 'num_variables',
+            'num_restricciones', 'status', 'objective', 'best_bound',
+            'motivo', 'carrera', 'tiempo_primera_solucion', 'wall_time',
+            'tiempo_total')
+
+
+def conectar(fichero=FICHERO_HISTORIAL):
+    conexion = sqlite3.connect(fichero, timeout=10)
+    conexion.execute(CREAR_TABLA)
+    conexion.execute("CREATE INDEX IF NOT EXISTS icao_registro "
+                     "ON resoluciones (icao, registro)")
+    return conexion
+
+
+def valor_plano(valor):
+    '''
+    valor con listas, int y float de Python en lugar de tuplas, arrays y
+    escalares de numpy (los de pandas en listademanda/listaposiciones);
+    los float enteros pasan a int, así la huella no depende de por dónde
+    se ha calculado la demanda
+    '''
+    if hasattr(valor, 'tolist'):
+        valor = valor.tolist()
+    if isinstance(valor, dict):
+        return {str(k): valor_plano(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [valor_plano(v) for v in valor]
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def huella_entrada(lista, problema):
+    '''
+    sha1 de la instancia: lista de solve_shift_scheduling y datos del
+    problema que definen el modelo (demanda, restricciones, parámetros)
+    '''
+    datos = {k: valor_plano(problema.get(k)) for k in CLAVES_MODELO}
+    datos['lista'] = valor_plano(list(lista))
+    texto = json.dumps(datos, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+
+def registrar_resolucion(lista, problema, informe, fichero=FICHERO_HISTORIAL):
+    '''
+    Añade una fila con la instancia (lista = [aeropuerto, ATCOS, turno,
+    bloque, ventana, fecha]) y el informe de solve_shift_scheduling
+    '''
+    fila = {
+        'registro': datetime.datetime.now().isoformat(timespec='seconds'),
+        'huella': huella_entrada(lista, problema),
+        'icao': lista[0],
+        'num_employees': int(lista[1]),
+        'turno': int(lista[2]),
+        'block_length': int(lista[3]),
+        'demand_interval_length': int(lista[4]),
+        'fecha': lista[5].isoformat(),
+    }
+    for columna in COLUMNAS:
+        if columna not in fila:
+            fila[columna] = informe.get(columna)
+    try:
+        with conectar(fichero) as conexion:
+            conexion.execute(
+                "INSERT INTO resoluciones (%s) VALUES (%s)" % (
+                    ','.join(COLUMNAS), ','.join('?' * len(COLUMNAS))),
+                [fila[c] for c in COLUMNAS])
+        conexion.close()
+    except sqlite3.Error as e:
+        print("historial: no se ha podido registrar la resolución (%s)" % e)
+
+
+def leer_historial(fichero=FICHERO_HISTORIAL, icao=None, desde=None):
+    '''
+    DataFrame con las resoluciones (de icao y desde la fecha de registro
+    desde, si no son None)
+    '''
+    consulta = "SELECT * FROM resoluciones WHERE 1=1"
+    argumentos = []
+    if icao is not None:
+        consulta += " AND icao = ?"
+        argumentos.append(icao)
+    if desde is not None:
+        consulta += " AND registro >= ?"
+        argumentos.append(desde.isoformat())
+    conexion = conectar(fichero)
+    df = pd.read_sql_query(consulta, conexion, params=argumentos)
+    conexion.close()
+    df['registro'] = pd.to_datetime(df['registro'])
+    return df
+
+
+def resumen_latencias(grupo):
+    return pd.Series({
+        'resoluciones': len(grupo),
+        'p50': grupo['tiempo_total'].quantile(0.5),
+        'p95': grupo['tiempo_total'].quantile(0.95),
+        'p50 primera solucion': grupo['tiempo_primera_solucion'].quantile(0.5),
+        'p95 primera solucion': grupo['tiempo_primera_solucion'].quantile(0.95),
+        '% optimo': 100.0 * (grupo['status'] == 'OPTIMAL').mean(),
+        '% sin solucion': 100.0 * grupo['objective'].isna().mean(),
+        'variables (media)': grupo['num_variables'].mean(),
+    })
+
+
+def informe_latencias(fichero=FICHERO_HISTORIAL, icao=None, desde=None):
+    '''
+    p50/p95 del tiempo total y de la primera solución por AD
+    '''
+    df = leer_historial(fichero, icao, desde)
+    if len(df) == 0:
+        return df
+    return df.groupby('icao').apply(resumen_latencias)
+
+
+def tendencia(fichero=FICHERO_HISTORIAL, icao=None, periodo='W'):
+    '''
+    p50/p95 por AD y periodo de registro ('D' día, 'W' semana, 'M' mes)
+    '''
+    df = leer_historial(fichero, icao)
+    if len(df) == 0:
+        return df
+    df['periodo'] = df['registro'].dt.to_period(periodo)
+    return df.groupby(['icao', 'periodo']).apply(resumen_latencias)
+
+
+if __name__ == '__main__':
+    icao = sys.argv[1] if len(sys.argv) > 1 else None
+    periodo = sys.argv[2] if len(sys.argv) > 2 else 'W'
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(informe_latencias(icao=icao))
+        print()
+        print(tendencia(icao=icao, periodo=periodo))
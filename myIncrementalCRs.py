@@ -0,0 +1,139 @@
+#RECÁLCULO INCREMENTAL (demanda modificada a mano en app.py)
+import math
+import time
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+from shift_scheduling_sat_revCREF_v20 import (cargar_demanda,
+                                              estadillo_desde_salida,
+                                              solve_shift_scheduling)
+
+"""
+Cuando se modifica a mano la demanda de una hora (check1 en app.py) se
+parte de la resolución anterior de la sesión (previo):
+    - el modelo CP-SAT se reutiliza: solve_shift_scheduling(sesion=...)
+      sólo cambia en el proto la demanda de cobertura y los límites del
+      reparto equilibrado (actualizar_demanda); si cambia algo más (AD,
+      ATCOS, turno, rejilla...) se construye otro
+    - los bloques cuya demanda de posiciones no cambia (y no están cerca
+      de un cambio) se fijan a la asignación anterior como supuestos
+      (assumptions) de CP-SAT, con el estadillo anterior como hint
+    - si con los supuestos no hay solución (INFEASIBLE o UNKNOWN, p.ej. el
+      reparto equilibrado ya no cuadra con los bloques fijos) se resuelve
+      el mismo modelo sin supuestos, sólo con el hint, en el tiempo que
+      queda; cualquier otro error se devuelve sin repetir la resolución
+Sólo se parte de estadillos de CP-SAT (OPTIMAL o FEASIBLE), nunca del
+heurístico de respaldo.
+"""
+
+# minutos alrededor de cada bloque modificado que se dejan libres
+MARGEN_MINUTOS = 60
+# límite de tiempo del intento con supuestos (segundos)
+MAX_TIME_INCREMENTAL = 5.0
+
+
+def bloques_vecindario(demanda_previa, demanda_nueva, blocks_per_interval,
+                       margen):
+    '''
+    Bloques de los intervalos que cambian de demanda de posiciones más
+    margen bloques a cada lado. Devuelve un set con los índices de bloque.
+    '''
+    num_blocks = len(demanda_nueva) * blocks_per_interval
+    vecindario = set()
+    for h in range(len(demanda_nueva)):
+        if h >= len(demanda_previa) or int(demanda_previa[h]) != int(demanda_nueva[h]):
+            inicio = h * blocks_per_interval
+            for x in range(max(0, inicio - margen),
+                           min(num_blocks, inicio + blocks_per_interval + margen)):
+                vecindario.add(x)
+    return vecindario
+
+
+def guardar_previo(previo, lista, resultado, informe):
+    previo['lista'] = list(lista)
+    previo['resultado'] = resultado
+    previo['valido'] = (type(resultado) == list and
+                        informe.get('status') in ('OPTIMAL', 'FEASIBLE'))
+
+
+def resolver_incremental(lista, traf, previo, config=None, escenario=None,
+                         parada=None, max_time_in_seconds=None,
+                         margen_minutos=MARGEN_MINUTOS):
+    '''
+    lista, traf, config, escenario, parada, max_time_in_seconds: igual que
+        solve_shift_scheduling (max_time_in_seconds es el total)
+    previo: diccionario de la sesión ({} la primera vez) que se rellena con
+        la lista, el resultado, si es de CP-SAT ('valido') y el problema y
+        el modelo (sesion de solve_shift_scheduling)
+    Devuelve lo mismo que solve_shift_scheduling
+    '''
+    if config is None:
+        config = myInputConfigCRs.MyConfig(icao=lista[0])
+    if max_time_in_seconds is None:
+        max_time_in_seconds = config.max_time_in_seconds
+    argumentos = dict(escenario=escenario, config=config, parada=parada,
+                      sesion=previo)
+
+    # sólo se reaprovecha si cambia la demanda (mismo AD, ATCOS, turno...)
+    # y el estadillo anterior es de CP-SAT
+    if (not previo.get('valido') or previo['lista'] != list(lista) or
+            len(config.hourly_cover_demands) > 0):
+        informe = {}
+        resultado = solve_shift_scheduling(
+            lista, traf, max_time_in_seconds=max_time_in_seconds,
+            informe=informe, **argumentos)
+        guardar_previo(previo, lista, resultado, informe)
+        return resultado
+
+    problema_previo = previo['problema']
+    if escenario is None:
+        escenario = myInputCRs.MyEscenario(icao=lista[0],
+                                           fileTWR=config.fileTWR,
+                                           fileTrafico=config.fileTrafico)
+        argumentos['escenario'] = escenario
+    demanda = cargar_demanda(config, escenario, lista[2], lista[5].day,
+                             lista[4], lista[3], traf)
+    if type(demanda) == str:
+        return demanda
+    listaposiciones = demanda[1]
+
+    estadillo = estadillo_desde_salida(previo['resultado'][0], config.shifts)
+    if len(listaposiciones) != len(problema_previo['listaposiciones']):
+        vecindario = set(range(problema_previo['num_blocks']))
+    else:
+        vecindario = bloques_vecindario(
+            problema_previo['listaposiciones'], listaposiciones,
+            problema_previo['blocks_per_interval'],
+            math.ceil(margen_minutos / lista[3]))
+    if len(vecindario) == 0:
+        print("demanda sin cambios: se reutiliza el estadillo anterior")
+        return previo['resultado']
+    print("recálculo incremental, bloques libres:", len(vecindario))
+
+    supuestos = [[e, s, b] for e, fila in enumerate(estadillo)
+                 for b, s in enumerate(fila) if b not in vecindario]
+    t0 = time.time()
+    informe = {}
+    resultado = solve_shift_scheduling(
+        lista, traf, pistas=estadillo, demanda=demanda,
+        max_time_in_seconds=min(MAX_TIME_INCREMENTAL, max_time_in_seconds),
+        respaldo=False, diagnostico=False, supuestos=supuestos,
+        informe=informe, **argumentos)
+    if type(resultado) != list and informe.get('status') not in (
+            'INFEASIBLE', 'UNKNOWN'):
+        # error de datos o de entrada (no de infactibilidad): se devuelve
+        # tal cual, sin repetir la resolución
+        return resultado
+    if type(resultado) != list:
+        # sin solución con el resto fijo: el mismo modelo sin supuestos,
+        # con el estadillo anterior como hint
+        print("recálculo incremental sin solución con los bloques fijos, "
+              "se resuelve sin fijarlos")
+        informe = {}
+        resultado = solve_shift_scheduling(
+            lista, traf, pistas=estadillo, demanda=demanda,
+            max_time_in_seconds=max(
+                1.0, max_time_in_seconds - (time.time() - t0)),
+            informe=informe, **argumentos)
+    guardar_previo(previo, lista, resultado, informe)
+    return resultado
@@ -0,0 +1,269 @@
+#INGESTA INCREMENTAL DE TRÁFICO (sólo añadir)
+#    python myIngestaCRs.py nuevos.csv [año]   (valida, añade y actualiza la vista)
+import calendar
+import datetime
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myVistaDemandaCRs # demanda precalculada (ICAO x día x turno x ventana)
+
+"""
+Los días nuevos de tráfico se añaden al final de fileTrafico (datos.csv)
+sin leer ni reescribir el histórico:
+    - validar_filas comprueba el esquema ICAO;DIAMES;MES_LOCAL;HORA_LOCAL;
+      TOTALES, los rangos de cada campo y los duplicados. La demanda se lee
+      por ICAO y día del mes (getdfTraficoDia, myVistaDemandaCRs), así que
+      un día que ya está en fileTrafico se rechaza aunque sea de otro mes
+    - FICHERO_INDICE guarda, por (ICAO, día, mes), el rango de bytes de sus
+      filas en fileTrafico. Sirve para rechazar días ya ingeridos (sólo se añade,
+      nunca se sustituye) y para leer sólo los días pedidos (leer_trafico).
+      Si fileTrafico ha cambiado por otra vía (tamaño o fecha distintos) el
+      índice se reconstruye
+    - las filas se escriben agrupadas por (ICAO, día, mes) y en orden de
+      hora
+    - la vista de demanda (myVistaDemandaCRs) se actualiza sólo en los
+      (ICAO, día) nuevos, si estaba al día antes de añadir
+El coste es proporcional a las filas nuevas, no al histórico. Un único
+proceso debe ingerir a la vez.
+"""
+
+FICHERO_INDICE = 'indiceTraficoCRs.json'
+
+ESQUEMA = ('ICAO', 'DIAMES', 'MES_LOCAL', 'HORA_LOCAL', 'TOTALES')
+
+# máximo de movimientos por hora (cabe en int16)
+MAX_TOTALES = 32767
+
+# febrero con 29 días sólo si el año de los datos es bisiesto (dias_mes)
+DIAS_MES = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+FORMATO_HORA = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+
+def firma_fichero(fichero):
+    st = os.stat(fichero)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def crear_indice(fileTrafico, separadorcolumnas=';'):
+    '''
+    Índice de fileTrafico leyendo el fichero una vez:
+    {'firma': [tamaño, fecha], 'rangos': [[icao, diames, mes, inicio, fin],
+    ...]} con los rangos de bytes de cada grupo de filas consecutivas del
+    mismo (ICAO, día, mes)
+    '''
+    rangos = []
+    with open(fileTrafico, 'rb') as f:
+        posicion = len(f.readline()) # cabecera
+        for linea in f:
+            campos = linea.decode().strip().split(separadorcolumnas)
+            if len(campos) < 3:
+                posicion += len(linea)
+                continue
+            clave = [campos[0], int(campos[1]), int(campos[2])]
+            if rangos and rangos[-1][:3] == clave and rangos[-1][4] == posicion:
+                rangos[-1][4] = posicion + len(linea)
+            else:
+                rangos.append(clave + [posicion, posicion + len(linea)])
+            posicion += len(linea)
+    return {'firma': firma_fichero(fileTrafico), 'rangos': rangos}
+
+
+def cargar_indice(fileTrafico, fichero=FICHERO_INDICE, separadorcolumnas=';'):
+    '''
+    Índice de fichero si corresponde a fileTrafico, si no se reconstruye
+    '''
+    if os.path.exists(fichero):
+        with open(fichero) as f:
+            indice = json.load(f)
+        if indice['firma'] == firma_fichero(fileTrafico):
+            return indice
+        print("índice de tráfico desactualizado, se reconstruye")
+    indice = crear_indice(fileTrafico, separadorcolumnas)
+    guardar_indice(indice, fichero)
+    return indice
+
+
+def guardar_indice(indice, fichero=FICHERO_INDICE):
+    temporal = fichero + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(indice, f)
+    os.replace(temporal, fichero)
+
+
+def dias_mes(mes, anio):
+    '''
+    Días del mes (1-12) en el año anio (MES_LOCAL no lleva año)
+    '''
+    if mes == 2 and calendar.isleap(anio):
+        return 29
+    return DIAS_MES[mes - 1]
+
+
+def validar_filas(df, dias_existentes=(), anio=None):
+    '''
+    df: filas nuevas leídas como texto (dtype=str)
+    dias_existentes: {(icao, diames, mes)} ya ingeridos. Se rechazan los
+        (icao, diames) que ya están en cualquier mes, o que aparecen en df
+        con dos meses (la demanda se lee por día del mes)
+    anio: año de los datos, para el 29 de febrero (por defecto el actual)
+    Devuelve (filas normalizadas [icao, diames, mes, minuto, totales],
+    lista de errores 'fila n: ...' con n la línea del fichero)
+    '''
+    if tuple(df.columns) != ESQUEMA:
+        return [], ["columnas %s, se esperaba %s" % (
+            ';'.join(df.columns), ';'.join(ESQUEMA))]
+    if anio is None:
+        anio = datetime.date.today().year
+    filas = []
+    errores = []
+    vistas = set()
+    # mes de cada (icao, diames), ya ingerido o de las filas nuevas
+    meses = {(icao, diames): mes for icao, diames, mes in dias_existentes}
+    meses_nuevos = {}
+    for n, (icao, diames, mes, hora, totales) in enumerate(
+            df.itertuples(index=False), start=2):
+        valores = [str(x).strip() if not pd.isna(x) else ''
+                   for x in (icao, diames, mes, hora, totales)]
+        icao, diames, mes, hora, totales = valores
+        if '' in valores:
+            errores.append("fila %i: campo vacío" % n)
+            continue
+        if not (diames.isdigit() and mes.isdigit() and totales.isdigit()):
+            errores.append("fila %i: DIAMES, MES_LOCAL y TOTALES deben ser "
+                           "enteros no negativos" % n)
+            continue
+        diames, mes, totales = int(diames), int(mes), int(totales)
+        formato = FORMATO_HORA.match(hora)
+        if not 1 <= mes <= 12:
+            errores.append("fila %i: MES_LOCAL %i fuera de 1-12" % (n, mes))
+        elif not 1 <= diames <= dias_mes(mes, anio):
+            errores.append("fila %i: DIAMES %i fuera del mes %i de %i" % (
+                n, diames, mes, anio))
+        elif formato is None:
+            errores.append("fila %i: HORA_LOCAL '%s' no es H:MM" % (n, hora))
+        elif totales > MAX_TOTALES:
+            errores.append("fila %i: TOTALES %i mayor que %i" % (
+                n, totales, MAX_TOTALES))
+        elif (icao, diames) in meses:
+            errores.append("fila %i: el día %i de %s ya está ingerido "
+                           "(mes %i)" % (n, diames, icao,
+                                         meses[icao, diames]))
+        elif meses_nuevos.setdefault((icao, diames), mes) != mes:
+            errores.append("fila %i: el día %i de %s está en los meses %i "
+                           "y %i" % (n, diames, icao,
+                                     meses_nuevos[icao, diames], mes))
+        elif (icao, diames, mes, hora) in vistas:
+            errores.append("fila %i: %s día %i/%i %s repetido" % (
+                n, icao, diames, mes, hora))
+        else:
+            vistas.add((icao, diames, mes, hora))
+            minuto = int(formato.group(1)) * 60 + int(formato.group(2))
+            filas.append([icao, diames, mes, minuto, totales])
+    return filas, errores
+
+
+def leer_trafico(fileTrafico, claves=None, fichero=FICHERO_INDICE,
+                 separadorcolumnas=';'):
+    '''
+    Filas de fileTrafico de los (icao, diames, mes) de claves (None =
+    todas) leyendo sólo sus rangos de bytes. DataFrame con las columnas de
+    ESQUEMA
+    '''
+    indice = cargar_indice(fileTrafico, fichero, separadorcolumnas)
+    claves = None if claves is None else set(claves)
+    trozos = []
+    with open(fileTrafico, 'rb') as f:
+        cabecera = f.readline()
+        for icao, diames, mes, inicio, fin in indice['rangos']:
+            if claves is None or (icao, diames, mes) in claves:
+                f.seek(inicio)
+                trozos.append(f.read(fin - inicio))
+    texto = (cabecera + b''.join(trozos)).decode()
+    return pd.read_csv(io.StringIO(texto), sep=separadorcolumnas)
+
+
+def ingerir_trafico(nuevo, fileTrafico='datos.csv',
+                    fileTWR='datosDependencias1.csv',
+                    fichero_indice=FICHERO_INDICE,
+                    fichero_vista=myVistaDemandaCRs.FICHERO_VISTA,
+                    separadorcolumnas=';', anio=None):
+    '''
+    Añade a fileTrafico las filas de nuevo (fichero csv o DataFrame) si
+    todas son válidas (si hay algún error no se añade ninguna).
+    anio: año de los datos (ver validar_filas)
+    Devuelve un diccionario con 'errores', 'filas' añadidas, 'dias'
+    [(icao, diames, mes)] nuevos y 'vista' ((ICAO, día) recalculados en la
+    vista, None si no estaba al día)
+    '''
+    if isinstance(nuevo, pd.DataFrame):
+        df = nuevo
+    else:
+        df = pd.read_csv(nuevo, sep=separadorcolumnas, dtype=str)
+    indice = cargar_indice(fileTrafico, fichero_indice, separadorcolumnas)
+    existentes = {tuple(r[:3]) for r in indice['rangos']}
+    filas, errores = validar_filas(df, existentes, anio)
+    resultado = {'errores': errores, 'filas': 0, 'dias': [], 'vista': None}
+    if errores or len(filas) == 0:
+        return resultado
+
+    # agrupadas por (ICAO, día, mes) y en orden de hora
+    filas.sort(key=lambda x: (x[0], x[2], x[1], x[3]))
+    lineas = ['%s;%i;%i;%i:%02i;%i\n' % (icao, diames, mes, minuto // 60,
+                                         minuto % 60, totales)
+              for icao, diames, mes, minuto, totales in filas]
+
+    firma_previa = myVistaDemandaCRs.firma_ficheros(fileTWR, fileTrafico)
+    with open(fileTrafico, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        posicion = f.tell()
+        if posicion > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+                posicion += 1
+        for linea, (icao, diames, mes, minuto, totales) in zip(lineas, filas):
+            datos = linea.encode()
+            f.write(datos)
+            rango = indice['rangos'][-1] if indice['rangos'] else None
+            if rango is not None and rango[:3] == [icao, diames, mes] and \
+                    rango[4] == posicion:
+                rango[4] = posicion + len(datos)
+            else:
+                indice['rangos'].append([icao, diames, mes, posicion,
+                                         posicion + len(datos)])
+            posicion += len(datos)
+    indice['firma'] = firma_fichero(fileTrafico)
+    guardar_indice(indice, fichero_indice)
+
+    dias = sorted({(x[0], x[1], x[2]) for x in filas})
+    resultado['filas'] = len(filas)
+    resultado['dias'] = dias
+    # mismas columnas y tipos que al leer fileTrafico entero
+    dfnuevo = pd.read_csv(io.StringIO(separadorcolumnas.join(ESQUEMA) + '\n' +
+                                      ''.join(lineas)), sep=separadorcolumnas)
+    resultado['vista'] = myVistaDemandaCRs.actualizar_vista(
+        dfnuevo, firma_previa, fileTWR, fileTrafico, fichero_vista,
+        separadorcolumnas=separadorcolumnas)
+    return resultado
+
+
+if __name__ == '__main__':
+    mC = myInputConfigCRs.MyConfig()
+    t = time.time()
+    resultado = ingerir_trafico(
+        sys.argv[1], mC.fileTrafico, mC.fileTWR,
+        anio=int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    for error in resultado['errores']:
+        print(error)
+    print("%i filas, %i días nuevos, vista: %s (%0.2f s)" % (
+        resultado['filas'], len(resultado['dias']),
+        'desactualizada' if resultado['vista'] is None else
+        '%i (ICAO, día) recalculados' % resultado['vista'], time.time() - t))
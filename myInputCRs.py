@@ -3,12 +3,20 @@ import pandas as pd
 import numpy as np
 import json
 
+import myVistaDemandaCRs # demanda precalculada (ICAO x día x turno x ventana)
+
 
 """
 Variables globales
 PARÁMETROS DE LA SIMULACIÓN
 fileTrafico: ICAO,DIAMES,MES,HORA_LOCAL (con formato HH:MM),TOTALES
 
+MyEscenario sólo guarda el tráfico de su ICAO (compactar_trafico):
+DIAMES y MES_LOCAL int8, MINUTO (minuto del día) uint16 y TOTALES int16,
+sin la columna ICAO ni la hora en texto. fileTrafico se lee por trozos de
+FILAS_TROZO filas, así el fichero entero nunca está en memoria. La memoria
+de cada escenario (memoria()) no puede pasar de max_memoria bytes.
+
 
 PENDIENTE: 
     - turnos nocturnos
@@ -16,26 +24,80 @@ PENDIENTE:
     - listas ordenadas de datos TWR ()
 """
 
+# máximo de memoria de tráfico por escenario (bytes)
+MAX_MEMORIA_ESCENARIO = 8*2**20
+# filas de fileTrafico leídas de cada vez
+FILAS_TROZO = 100000
+# tipos al leer fileTrafico (la hora se convierte luego a MINUTO)
+TIPOS_TRAFICO = {'ICAO':'category','DIAMES':np.int8,'MES_LOCAL':np.int8,
+                 'HORA_LOCAL':str,'TOTALES':np.int16}
+
+
+def compactar_trafico(dftraf,icao):
+    '''
+    Filas de icao de dftraf con DIAMES, MES_LOCAL (int8), MINUTO (minuto 
+    del día, uint16) y TOTALES (int16)
+    '''
+    dfad=dftraf.loc[dftraf['ICAO']==icao]
+    minuto=np.zeros(len(dfad),dtype=np.int64)
+    if len(dfad)>0:
+        values=dfad['HORA_LOCAL'].str.split(':', expand=True).astype(int)
+        minuto=(values[0]*60+values[1]).to_numpy()
+    return pd.DataFrame({
+        'DIAMES':dfad['DIAMES'].to_numpy(dtype=np.int8),
+        'MES_LOCAL':dfad['MES_LOCAL'].to_numpy(dtype=np.int8),
+        'MINUTO':minuto.astype(np.uint16),
+        'TOTALES':dfad['TOTALES'].to_numpy(dtype=np.int16)})
+
+
+def leer_trafico_icao(fileTrafico,icao,separadorcolumnas=";"):
+    '''
+    Tráfico compacto (compactar_trafico) de icao leyendo fileTrafico por 
+    trozos de FILAS_TROZO filas
+    '''
+    trozos=[compactar_trafico(trozo,icao) for trozo in pd.read_csv(
+        fileTrafico,sep=separadorcolumnas,dtype=TIPOS_TRAFICO,
+        chunksize=FILAS_TROZO)]
+    return pd.concat(trozos,ignore_index=True)
+
+
 class MyEscenario:
     def __init__(self,icao,
                  fileTWR="datosDependencias1.csv",
                  fileTrafico="datos.csv",
-                 separadorcolumnas=";"):
+                 separadorcolumnas=";",
+                 dfTWR=None,dfTrafico=None,
+                 fileVista="vistaDemandaCRs.npz",
+                 max_memoria=MAX_MEMORIA_ESCENARIO):
+        '''
+        dfTWR, dfTrafico: ficheros ya leídos (no se vuelven a leer)
+        fileVista: demanda precalculada (myVistaDemandaCRs), None = no usar
+        max_memoria: bytes como máximo (None = sin límite), si el tráfico
+        ocupa más se lanza MemoryError
+        '''
         
         print(fileTWR)
-        dftwr= pd.read_csv(fileTWR,sep=separadorcolumnas)
-        dftraf= pd.read_csv(fileTrafico,sep=separadorcolumnas)   
-        
-        #añadimos horalocal en formato horadec
-        values = dftraf['HORA_LOCAL'].str.split(':', expand=True).astype(int)
-        factors = np.array([1, 60])
-
-        dftraf['HORA_LOCAL_DEC'] = (values / factors).sum(1)
+        if dfTWR is None:
+            dftwr= pd.read_csv(fileTWR,sep=separadorcolumnas)
+        else:
+            dftwr= dfTWR
+        if dfTrafico is None:
+            dftraf= leer_trafico_icao(fileTrafico,icao,separadorcolumnas)
+        else:
+            dftraf= compactar_trafico(dfTrafico,icao)
         
         self.ICAO=icao
-        self.dfTWR=dftwr
+        self.dfTWR=dftwr.loc[dftwr['ICAO']==icao].reset_index(drop=True)
         self.dfTrafico = dftraf 
         
+        print("tráfico de %s: %i filas, %0.1f kB" % (
+            icao,len(dftraf),self.memoria()/1024))
+        if max_memoria is not None and self.memoria()>max_memoria:
+            raise MemoryError(
+                "el tráfico de %s ocupa %0.1f MB, más que el máximo de "
+                "%0.1f MB por escenario" % (icao,self.memoria()/2**20,
+                                            max_memoria/2**20))
+        
         data = self.getdataTWR()
         self.turnos=data[0]
         self.duracionturnos=data[1]
@@ -44,7 +106,20 @@ class MyEscenario:
         # lista [1,1,1,..,2,...]  id=movtos. self.pos[12]=numpos con cap>=12
         self.pos=self.dfpos['POS'].values.tolist() 
 
+        # demanda precalculada, si está al día con los ficheros
+        self.vista=None
+        if fileVista is not None:
+            self.vista=myVistaDemandaCRs.vista_actual(fileTWR,fileTrafico,
+                                                      fileVista)
+
         
+    def memoria(self):
+        '''
+        Bytes de dfTrafico y dfTWR del escenario
+        '''
+        return int(self.dfTrafico.memory_usage(deep=True).sum()+
+                   self.dfTWR.memory_usage(deep=True).sum())
+
     def getdataTWR(self,separadordatos=","):
         '''
         Devuelve turnos,cap
@@ -82,10 +157,10 @@ class MyEscenario:
         
         return  turnos,duracionturnos,cap,dfpos      
         
-    def getdfTrafico(self,diames,idturno,ventanaflotante=20,separadordatos=",", TRAF = []):        
+    def getlimitesturno(self,idturno):
         '''
-        devuelve demanda en el turno (0,1,...) del diames 
-        turno corresponde a un intervalo horas ('turnos ini')
+        Devuelve (hini,hfin) del turno idturno (0,1,...) en hora decimal
+        El último turno termina a las 24
         '''
         idturno=min(idturno,len(self.turnos)-1)            
         hini=self.turnos[idturno]
@@ -94,25 +169,59 @@ class MyEscenario:
             hfin=24 
         else:
             hfin=self.turnos[idturno+1]
+        return hini,hfin
+
+    def getduracionturno(self,idturno):
+        '''
+        Duración (horas) del turno idturno. Igual que duracionturnos,
+        y para el último turno hasta las 24
+        '''
+        hini,hfin=self.getlimitesturno(idturno)
+        return hfin-hini
+
+    def getdfTraficoDia(self,diames):
+        '''
+        Tráfico del AD en el diames (un único filtro sobre dfTrafico)
+        con la hora en formato horadec (HORA_LOCAL_DEC)
+        '''
+        dfdia=self.dfTrafico.loc[self.dfTrafico['DIAMES']==diames]
+        minuto=dfdia['MINUTO'].to_numpy(dtype=np.int64)
+        return pd.DataFrame({'HORA_LOCAL_DEC':minuto//60+(minuto%60)/60,
+                             'TOTALES':dfdia['TOTALES'].to_numpy(
+                                 dtype=np.int64)})
+
+    def getdfTrafico(self,diames,idturno,ventanaflotante=20,separadordatos=",", TRAF = [],
+                     dfdia=None):        
+        '''
+        devuelve demanda en el turno (0,1,...) del diames 
+        turno corresponde a un intervalo horas ('turnos ini')
+        dfdia: tráfico del día ya filtrado (getdfTraficoDia) 
+        Sin TRAF la demanda se lee de la vista precalculada si la hay
+        '''
+        if TRAF == [] and self.vista is not None:
+            demanda=self.vista.leer(self.ICAO,diames,idturno,ventanaflotante)
+            if demanda is not None:
+                return demanda
+        hini,hfin=self.getlimitesturno(idturno)
+        if dfdia is None:
+            dfdia=self.getdfTraficoDia(diames)
         
         # filtro por AD, día y hora (entera). 
         # Hay que incluir la anterior y posterior
-        myfiltro=((self.dfTrafico['ICAO']==self.ICAO) &
-                  (self.dfTrafico['DIAMES']==diames) &
-                  (self.dfTrafico['HORA_LOCAL_DEC']>=hini-1) &
-                  (self.dfTrafico['HORA_LOCAL_DEC']<hfin+1) )
+        myfiltro=((dfdia['HORA_LOCAL_DEC']>=hini-1) &
+                  (dfdia['HORA_LOCAL_DEC']<hfin+1) )
         
-        dfflotante0=self.dfTrafico.loc[myfiltro,
-                                  ['HORA_LOCAL','HORA_LOCAL_DEC','TOTALES']].reset_index(drop=True)
-                
+        dfflotante0=dfdia.loc[myfiltro,
+                                  ['HORA_LOCAL_DEC','TOTALES']].reset_index(drop=True)
         # print(dfflotante0, "LINEA 108")
 
         if TRAF != []:
             new_demand = pd.DataFrame(TRAF).astype('float')
             # print(new_demand,  "despues de hacerlo dataframe")
             # print(new_dfflotante['TOTALES_FLOTANTE'], type(new_dfflotante['TOTALES_FLOTANTE']))
-            new_demand.index = list(range(1,9))
-            dfflotante0.loc[1:8, 'TOTALES']  = new_demand.iloc[:,0] 
+            # una fila por hora del turno (la fila 0 es la hora anterior)
+            new_demand.index = list(range(1,len(TRAF)+1))
+            dfflotante0.loc[1:len(TRAF), 'TOTALES']  = new_demand.iloc[:,0] 
 
             # print(dfflotante0, "DENTRO DEL IF, DESPUES DEL CAMBIO")
 
@@ -151,7 +260,7 @@ class MyEscenario:
         # print(dfflotante, 'ANTES DEL FILTRO')
 
         new_dfflotante = dfflotante.loc[myfiltro,
-                                  ['HORA_LOCAL','HORA_LOCAL_DEC','TOTALES', 'TOTALES_FLOTANTE']].reset_index(drop=True)
+                                  ['HORA_LOCAL_DEC','TOTALES', 'TOTALES_FLOTANTE']].reset_index(drop=True)
 
         new_dfflotante_2=pd.merge(new_dfflotante, self.dfpos, 
                             on='TOTALES_FLOTANTE', 
@@ -164,6 +273,29 @@ class MyEscenario:
         listaposiciones=list(new_dfflotante_2['POS'].to_numpy())
         return listademanda,listaposiciones
 
+    def getdemandaDia(self,diames,ventanaflotante=20,turnos=None):
+        '''
+        Demanda de todos los turnos del diames filtrando el tráfico una 
+        sola vez. turnos: lista de idturno (por defecto todos)
+        Devuelve {idturno: (listademanda,listaposiciones)}
+        '''
+        if turnos is None:
+            turnos=range(len(self.turnos))
+        dfdia=None
+        demanda={}
+        for idturno in turnos:
+            if self.vista is not None:
+                demanda[idturno]=self.vista.leer(self.ICAO,diames,idturno,
+                                                 ventanaflotante)
+                if demanda[idturno] is not None:
+                    continue
+            if dfdia is None:
+                dfdia=self.getdfTraficoDia(diames)
+            demanda[idturno]=self.getdfTrafico(diames,idturno,
+                                               ventanaflotante=ventanaflotante,
+                                               dfdia=dfdia)
+        return demanda
+
 #print("")
 #print(dfT[['DIAMES','HORA_LOCAL','TOTALES']].head(5))
 #print(dfT[dfT['TOTALES']<10])
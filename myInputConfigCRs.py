@@ -1,5 +1,6 @@
 #DATOS DE ENTRADA ESCENARIO A1
 import json
+import os
 
 #https://docs.scipy.org/doc/scipy-0.16.1/reference/stats.html#module-scipy.stats
 
@@ -11,7 +12,12 @@ PARÁMETROS DE LA SIMULACIÓN
 """
 
 class MyConfig:
-    def __init__(self,file='inputconfigCRs.json',):
+    def __init__(self,file='inputconfigCRs.json',icao=None,
+                 fileperfiles='perfilesCRs.json'):
+        '''
+        icao: si hay perfil del AD en fileperfiles (myAutoajusteCRs),
+        sus valores sustituyen a los de file
+        '''
         print(file)
         with open(file) as f:
             inputdata = json.load(f)
@@ -132,4 +138,68 @@ class MyConfig:
         
         #True (=1): fuerza que se cubra la demanda, 
         # aunque se incumpla daily_sum_constraints
-        self.match_full_demand=bool(inputdata["match_full_demand"])
\ No newline at end of file
+        self.match_full_demand=bool(inputdata["match_full_demand"])
+        # penalización por posición y bloque sin cubrir si match_full_demand
+        # es 0 (0 = sin penalización, el exceso negativo resta)
+        self.deficit_cover_penalty=inputdata.get("deficit_cover_penalty",0)
+
+        #True (=1): modelo sin nombres de variables. Por defecto 0 (nombres
+        # legibles) hasta comprobar que resuelve igual y compensa
+        self.modelo_ligero=bool(inputdata.get("modelo_ligero",0))
+
+        #True (=1): diagnóstico de infactibilidad (myDiagnosticoCRs) antes
+        # de resolver. Segundos máximos del diagnóstico
+        self.diagnostico=bool(inputdata.get("diagnostico",0))
+        self.max_time_diagnostico=inputdata.get("max_time_diagnostico",5.0)
+        #True (=1): si las reglas duras son compatibles se repite el
+        # diagnóstico con los límites blandos como duros (sólo se avisa)
+        self.diagnostico_blandos=bool(inputdata.get("diagnostico_blandos",0))
+
+        # criterio de parada (myParadaCRs), 0 = sin límite:
+        # gap relativo/absoluto, segundos sin mejorar la solución y
+        # tiempo determinista (benchmarks reproducibles)
+        self.relative_gap_limit=inputdata.get("relative_gap_limit",0.0)
+        self.absolute_gap_limit=inputdata.get("absolute_gap_limit",0.0)
+        self.tiempo_sin_mejora=inputdata.get("tiempo_sin_mejora",0.0)
+        self.max_deterministic_time=inputdata.get("max_deterministic_time",0.0)
+
+        #True (=1): carrera de conjuntos de parámetros de CP-SAT a la vez
+        # (myCarreraCRs), se registra el ganador en carreraCRs.jsonl
+        self.carrera=bool(inputdata.get("carrera",0))
+
+        #True (=1): búsqueda en vecindarios grandes (myLNSCRs) en lugar de
+        # CP-SAT sobre el modelo completo (equipos de 30 o más ATCOS)
+        self.lns=bool(inputdata.get("lns",0))
+
+        # parámetros de CP-SAT en formato texto de SatParameters
+        # (ej. "linearization_level: 0"), vacío = por defecto
+        self.parametros_solver=inputdata.get("parametros_solver","")
+
+        #True (=1): cada resolución se añade a historialCRs.sqlite
+        # (myHistorialCRs, latencias p50/p95 por AD)
+        self.historial=bool(inputdata.get("historial",1))
+
+        #True (=1): cada estadillo resuelto se añade a archivoCRs.bin
+        # (myArchivoCRs, consultas de cobertura y descansos)
+        self.archivo=bool(inputdata.get("archivo",0))
+
+        #True (=1): cada resolución se perfila (myPerfiladorCRs),
+        # también con la variable de entorno PERFILADO_CRS=1
+        self.perfilado=bool(inputdata.get("perfilado",0))
+
+        #True (=1): rejilla comprimida, bloques consecutivos con la misma
+        # demanda se unen en segmentos de hasta segmento_maximo minutos
+        self.rejilla_comprimida=bool(inputdata.get("rejilla_comprimida",0))
+        self.segmento_maximo=inputdata.get("segmento_maximo",35)
+
+        # perfil del AD medido con myAutoajusteCRs (perfilesCRs.json)
+        self.perfil=None
+        if icao is not None and os.path.exists(fileperfiles):
+            with open(fileperfiles) as f:
+                self.perfil=json.load(f).get(icao)
+        if self.perfil is not None:
+            # sólo parámetros de CP-SAT: el modelo es el de file
+            print("perfil de %s en %s: parametros_solver '%s' -> '%s'" % (
+                      icao, fileperfiles, self.parametros_solver,
+                      self.perfil["parametros_solver"]))
+            self.parametros_solver=self.perfil["parametros_solver"]
\ No newline at end of file
@@ -0,0 +1,47 @@
+#INSTANCIAS SINTÉTICAS (benchmarks)
+import math
+import random
+
+import myInputConfigCRs # datos json configuración cálculos OR
+from shift_scheduling_sat_revCREF_v20 import preparar_problema
+
+"""
+Problemas generados sin ficheros de tráfico para medir la construcción y
+la resolución del modelo con equipos grandes (ej. 30-60 ATCOS).
+La demanda de posiciones sigue una curva suave con picos del 70% de los
+ATCOS disponibles, lo que deja margen para el 25% de descanso.
+"""
+
+
+def generar_demanda(num_blocks, pico, semilla=0):
+    '''
+    Demanda de posiciones por bloque entre el 30% y el 100% de pico
+    '''
+    rnd = random.Random(semilla)
+    fase = rnd.uniform(0, 2 * math.pi)
+    periodo = rnd.uniform(0.5, 1.5) * num_blocks
+    posiciones = []
+    for b in range(num_blocks):
+        x = 0.65 + 0.35 * math.sin(2 * math.pi * b / periodo + fase)
+        posiciones.append(max(1, min(pico, round(pico * x))))
+    return posiciones
+
+
+def generar_problema(num_employees, num_hours=8, block_length=5, semilla=0,
+                     mC=None):
+    '''
+    Problema de preparar_problema con demanda sintética para num_employees
+    ATCOS y un turno de num_hours horas (bloques y demanda de block_length)
+    '''
+    if mC is None:
+        mC = myInputConfigCRs.MyConfig()
+    num_blocks = int(num_hours * 60 / block_length)
+    pico = max(1, int(0.7 * num_employees))
+    listaposiciones = generar_demanda(num_blocks, pico, semilla)
+    listademanda = [10 * x for x in listaposiciones]
+    # capacidad sostenible de 10 movimientos por posición
+    capacidad = [10 * (i + 1) for i in range(num_employees)]
+    posiciones = [max(1, math.ceil(x / 10)) for x in range(capacidad[-1] + 1)]
+    return preparar_problema(mC, num_employees, num_hours, block_length,
+                             block_length, listademanda, listaposiciones,
+                             capacidad, posiciones)
@@ -0,0 +1,74 @@
+#ESTADILLOS DE TODOS LOS TURNOS DE UN DÍA
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+from shift_scheduling_sat_revCREF_v20 import solve_shift_scheduling
+
+"""
+Calcula los estadillos de todos los turnos ('turnoshini') de un día:
+    - carga una sola vez datosDependencias y tráfico (MyEscenario)
+    - calcula la demanda de todos los turnos filtrando el tráfico una vez
+    - resuelve los turnos a la vez (un hilo por turno, CP-SAT libera el GIL)
+
+Los turnos de turnoshini son consecutivos (cada uno acaba cuando empieza
+el siguiente), así que no se solapan y cada turno se resuelve de forma
+independiente y exacta.
+"""
+
+
+def solve_day_scheduling(icao, num_employees, fecha, block_length=5,
+                         demand_interval_length=5, turnos=None,
+                         max_time_in_seconds=None):
+    '''
+    icao: aeropuerto (datosDependencias1.csv)
+    num_employees: ATCOS por turno (int o lista con un valor por turno)
+    fecha: datetime.date
+    turnos: lista de idturno (por defecto todos los del AD)
+    Devuelve un diccionario:
+        'turnos': {idturno: {'resultado': salida de solve_shift_scheduling,
+                             'tiempo': segundos}}
+        'tiempo_datos': segundos de carga del escenario y la demanda
+        'tiempo_total': segundos
+    '''
+    t0 = time.time()
+    mC = myInputConfigCRs.MyConfig()
+    mE = myInputCRs.MyEscenario(icao=icao, fileTWR=mC.fileTWR,
+                                fileTrafico=mC.fileTrafico)
+    if turnos is None:
+        turnos = list(range(len(mE.turnos)))
+    if type(num_employees) == int:
+        num_employees = [num_employees for x in turnos]
+
+    # demanda de todos los turnos en una pasada
+    demandas = {}
+    if len(mC.hourly_cover_demands) == 0:
+        demandas = mE.getdemandaDia(fecha.day,
+                                    ventanaflotante=demand_interval_length,
+                                    turnos=turnos)
+    tiempo_datos = time.time() - t0
+
+    # reparto de hilos del solver entre los turnos
+    hilos = max(1, (os.cpu_count() or 1) // len(turnos))
+
+    def resolver_turno(i):
+        idturno = turnos[i]
+        lista = [icao, num_employees[i], idturno, block_length,
+                 demand_interval_length, fecha]
+        t = time.time()
+        resultado = solve_shift_scheduling(
+            lista, escenario=mE, demanda=demandas.get(idturno),
+            max_time_in_seconds=max_time_in_seconds,
+            num_search_workers=min(num_employees[i], hilos))
+        return {'resultado': resultado, 'tiempo': time.time() - t}
+
+    with ThreadPoolExecutor(max_workers=len(turnos)) as executor:
+        resultados = list(executor.map(resolver_turno, range(len(turnos))))
+
+    return {
+        'turnos': dict(zip(turnos, resultados)),
+        'tiempo_datos': tiempo_datos,
+        'tiempo_total': time.time() - t0,
+    }
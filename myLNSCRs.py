@@ -0,0 +1,245 @@
+#BÚSQUEDA EN VECINDARIOS GRANDES (LNS) PARA EQUIPOS GRANDES
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.protobuf import text_format
+from ortools.sat.python import cp_model
+
+import myParadaCRs # criterio de parada (gap, sin mejora, tiempo determinista)
+
+"""
+Con 30 o más ATCOS CP-SAT sobre el modelo completo se queda a menudo con
+una solución mala al agotar max_time_in_seconds. resolver_lns trabaja
+sobre el mismo modelo (construir_modelo):
+    - primera solución con CP-SAT sobre el modelo completo (FRACCION_INICIAL
+      del tiempo, con el hint del estadillo heurístico)
+    - en cada ronda se generan tantos vecindarios como hilos
+      (num_search_workers, o vecindarios_ronda): un grupo de
+      ATCOS o una ventana de bloques de todos los ATCOS. Cada uno es una
+      copia del proto con el dominio de las variables work de fuera del
+      vecindario fijado a la mejor solución, y con toda la mejor solución
+      como hint
+    - los vecindarios se resuelven en paralelo (un hilo de CP-SAT cada uno,
+      TIEMPO_VECINDARIO segundos, con problema['parametros_solver']) y se
+      queda la mejor mejora. cancelar para también los vecindarios que se
+      están resolviendo (myParadaCRs.resolver_con_parada)
+    - el tamaño de cada tipo de vecindario crece si se resuelve al óptimo
+      y decrece si se agota su tiempo sin mejorar
+    - entre rondas se aplica problema['parada']: gap con la cota de la
+      solución inicial y tiempo_sin_mejora (motivo 'gap' o 'sin_mejora')
+Se activa con "lns" en inputconfigCRs.json o el argumento lns de
+solve_shift_scheduling. bench_lns.py lo compara con CP-SAT.
+"""
+
+FRACCION_INICIAL = 0.2
+TIEMPO_VECINDARIO = 2.0
+# fracción inicial, mínima y máxima de ATCOS o de bloques libres
+FRACCION_VECINDARIO = {'empleados': 0.2, 'ventana': 0.25}
+FRACCION_MINIMA = 0.05
+FRACCION_MAXIMA = 0.8
+
+
+class ProgresoLNS:
+    """Lo que solve_shift_scheduling lee del callback de myParadaCRs
+    (primera_solucion, motivo) y el resumen de las rondas."""
+
+    def __init__(self):
+        self.inicio = time.time()
+        self.primera_solucion = None
+        self.ultima_mejora = None
+        self.motivo = None
+        self.mejor = None
+        self.cota = None # cota del modelo completo (solución inicial)
+        self.rondas = 0
+        self.mejoras = {'empleados': 0, 'ventana': 0}
+
+    def resumen(self):
+        '''
+        Texto con los totales de la búsqueda (en lugar de ResponseStats
+        del solver del último vecindario)
+        '''
+        return ('LNS\nrondas: %i\nmejoras: %s\nobjective: %s\n'
+                'best_bound: %s\nmotivo: %s\nwall_time: %0.3f\n' % (
+                    self.rondas, self.mejoras, self.mejor, self.cota,
+                    self.motivo, time.time() - self.inicio))
+
+    def mejora(self, objetivo, tipo=None):
+        ahora = time.time()
+        print('LNS %s, time = %0.2f s, objective = %i' % (
+            tipo or 'inicial', ahora - self.inicio, objetivo))
+        self.mejor = objetivo
+        self.ultima_mejora = ahora
+        if tipo is not None:
+            self.mejoras[tipo] += 1
+
+
+def indices_trabajo(problema, modelo):
+    '''
+    {(empleado, bloque): índices en el proto de sus variables work}
+    (con rejilla comprimida varios bloques comparten variable)
+    '''
+    indices = {}
+    for (e, s, b), var in modelo['work'].items():
+        indices.setdefault((e, b), []).append(var.Index())
+    return indices
+
+
+def vecindario(problema, tipo, fraccion, rnd):
+    '''
+    Pares (empleado, bloque) libres: fraccion de los ATCOS ('empleados') o
+    una ventana con fraccion de los bloques ('ventana')
+    '''
+    num_employees = problema['num_employees']
+    num_blocks = problema['num_blocks']
+    if tipo == 'empleados':
+        k = max(1, min(num_employees, round(fraccion * num_employees)))
+        return [(e, b) for e in rnd.sample(range(num_employees), k)
+                for b in range(num_blocks)]
+    w = max(1, min(num_blocks, round(fraccion * num_blocks)))
+    inicio = rnd.randrange(num_blocks - w + 1)
+    return [(e, b) for e in range(num_employees)
+            for b in range(inicio, inicio + w)]
+
+
+def subproblema(proto, solucion, indices, libres):
+    '''
+    Copia del modelo con las variables work fuera de libres fijadas a
+    solucion (valores de todas las variables) y solucion como hint
+    '''
+    sub = cp_model.CpModel()
+    sub.Proto().CopyFrom(proto)
+    libres_indices = set()
+    for clave in libres:
+        libres_indices.update(indices[clave])
+    fijos = set()
+    for clave, lista in indices.items():
+        fijos.update(i for i in lista if i not in libres_indices)
+    variables = sub.Proto().variables
+    for i in fijos:
+        del variables[i].domain[:]
+        variables[i].domain.extend([solucion[i], solucion[i]])
+    hint = sub.Proto().solution_hint
+    hint.Clear()
+    hint.vars.extend(range(len(solucion)))
+    hint.values.extend(solucion)
+    return sub
+
+
+def resolver_lns(problema, modelo, num_search_workers, cancelar=None,
+                 al_primera_solucion=None, semilla=0,
+                 vecindarios_ronda=None,
+                 tiempo_vecindario=TIEMPO_VECINDARIO):
+    '''
+    LNS sobre modelo (construir_modelo) durante
+    problema['max_time_in_seconds'].
+    Devuelve (solver, status, progreso): solver es el CpSolver de la mejor
+    solución (sus valores sirven para extraer_solucion, el proto de los
+    vecindarios tiene las mismas variables) y progreso un ProgresoLNS
+    '''
+    if vecindarios_ronda is None:
+        vecindarios_ronda = max(2, num_search_workers)
+    t0 = time.time()
+    limite = t0 + problema['max_time_in_seconds']
+    proto = modelo['model'].Proto()
+    indices = indices_trabajo(problema, modelo)
+    rnd = random.Random(semilla)
+    progreso = ProgresoLNS()
+    fracciones = dict(FRACCION_VECINDARIO)
+
+    # solución inicial con el modelo completo; si no la hay en
+    # FRACCION_INICIAL del tiempo se sigue hasta la primera
+    for primera in (False, True):
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(1.0, (
+            limite - time.time() if primera else
+            FRACCION_INICIAL * problema['max_time_in_seconds']))
+        solver.parameters.num_search_workers = num_search_workers
+        solver.parameters.stop_after_first_solution = primera
+        text_format.Merge(problema['parametros_solver'], solver.parameters)
+        status, callback = myParadaCRs.resolver_con_parada(
+            solver, modelo['model'], problema['parada'], cancelar,
+            al_primera_solucion)
+        if status != cp_model.UNKNOWN or callback.motivo == 'cancelado':
+            break
+    progreso.primera_solucion = callback.primera_solucion
+    progreso.motivo = callback.motivo
+    progreso.cota = solver.BestObjectiveBound()
+    if status != cp_model.FEASIBLE:
+        # óptimo, infactible o sin solución: no hay nada que mejorar
+        return solver, status, progreso
+    mejor_solver = solver
+    solucion = list(solver.ResponseProto().solution)
+    progreso.mejora(solver.ObjectiveValue())
+    parada = problema['parada']
+    if callback.motivo is None and myParadaCRs.gap_alcanzado(
+            parada, progreso.mejor, progreso.cota):
+        progreso.motivo = 'gap'
+    if progreso.motivo is not None:
+        # la solución inicial ya cumple el criterio de parada
+        return solver, status, progreso
+
+    # en los vecindarios sólo se atiende a cancelar: los gaps y el tiempo
+    # sin mejora se miden sobre el modelo completo entre rondas
+    parada_vecindario = dict(parada, relative_gap_limit=0,
+                             absolute_gap_limit=0, max_deterministic_time=0,
+                             tiempo_sin_mejora=0)
+
+    def resolver_vecindario(tipo, libres, semilla_vecindario):
+        sub = subproblema(proto, solucion, indices, libres)
+        s = cp_model.CpSolver()
+        text_format.Merge(problema['parametros_solver'], s.parameters)
+        s.parameters.max_time_in_seconds = max(
+            0.1, min(tiempo_vecindario, limite - time.time()))
+        s.parameters.num_search_workers = 1
+        s.parameters.random_seed = semilla_vecindario
+        st, callback = myParadaCRs.resolver_con_parada(
+            s, sub, parada_vecindario, cancelar)
+        return tipo, s, st
+
+    tipos = list(fracciones)
+    with ThreadPoolExecutor(max_workers=vecindarios_ronda) as executor:
+        while time.time() < limite - 0.1:
+            if cancelar is not None and cancelar.is_set():
+                progreso.motivo = 'cancelado'
+                break
+            if (parada['tiempo_sin_mejora'] > 0 and time.time() -
+                    progreso.ultima_mejora > parada['tiempo_sin_mejora']):
+                progreso.motivo = 'sin_mejora'
+                break
+            progreso.rondas += 1
+            tareas = []
+            for i in range(vecindarios_ronda):
+                tipo = tipos[i % len(tipos)]
+                libres = vecindario(problema, tipo, fracciones[tipo], rnd)
+                tareas.append(executor.submit(resolver_vecindario, tipo,
+                                              libres, rnd.randrange(2**30)))
+            mejor = None
+            for tarea in tareas:
+                tipo, s, st = tarea.result()
+                if st == cp_model.OPTIMAL:
+                    fracciones[tipo] = min(FRACCION_MAXIMA,
+                                           fracciones[tipo] * 1.2)
+                elif st in (cp_model.FEASIBLE, cp_model.UNKNOWN):
+                    fracciones[tipo] = max(FRACCION_MINIMA,
+                                           fracciones[tipo] * 0.8)
+                if (st in (cp_model.OPTIMAL, cp_model.FEASIBLE) and
+                        s.ObjectiveValue() < progreso.mejor and
+                        (mejor is None or
+                         s.ObjectiveValue() < mejor[1].ObjectiveValue())):
+                    mejor = (tipo, s)
+            if mejor is not None:
+                tipo, mejor_solver = mejor
+                solucion = list(mejor_solver.ResponseProto().solution)
+                progreso.mejora(mejor_solver.ObjectiveValue(), tipo)
+                if progreso.mejor <= progreso.cota:
+                    status = cp_model.OPTIMAL
+                    break
+                if myParadaCRs.gap_alcanzado(parada, progreso.mejor,
+                                             progreso.cota):
+                    progreso.motivo = 'gap'
+                    break
+    print("LNS: %i rondas, mejoras %s, fracciones %s" % (
+        progreso.rondas, progreso.mejoras,
+        {t: round(f, 2) for t, f in fracciones.items()}))
+    return mejor_solver, status, progreso
@@ -0,0 +1,180 @@
+#ESTADILLOS DE VARIOS DÍAS (horizonte rodante)
+import datetime
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+from shift_scheduling_sat_revCREF_v20 import (estadillo_desde_salida,
+                                              estado_final,
+                                              solve_shift_scheduling)
+
+"""
+Planificación de una semana, un mes... ventana a ventana (una ventana = un
+turno de un día), en orden cronológico:
+    - cada ventana es un modelo del tamaño de un turno: el tiempo crece
+      linealmente con el número de días
+    - el estado sólo se arrastra dentro de un equipo (equipos: el equipo
+      de ATCOS de cada turno, obligatorio): si una ventana empieza justo
+      cuando acaba la anterior del mismo equipo, el empleado e arrastra la
+      secuencia con la que terminó (estado_final), que se fija al inicio
+      de la ventana (estado_inicial de solve_shift_scheduling). El
+      empleado e de otro equipo es otra persona. Un reparto en el que
+      ninguna ventana recibe estado (p.ej. un equipo por turno: el mismo
+      turno del día siguiente no es contiguo) se rechaza, porque serían
+      resoluciones independientes
+    - en paralelo con la resolución de una ventana se calcula la demanda
+      del día siguiente (pipeline)
+"""
+
+
+def ventanas_periodo(escenario, fecha_ini, num_dias, turnos=None):
+    '''
+    Lista de ventanas (fecha, idturno, hini, hfin) en orden cronológico
+    '''
+    if turnos is None:
+        turnos = list(range(len(escenario.turnos)))
+    ventanas = []
+    for d in range(num_dias):
+        fecha = fecha_ini + datetime.timedelta(days=d)
+        for idturno in turnos:
+            hini, hfin = escenario.getlimitesturno(idturno)
+            ventanas.append((fecha, idturno, hini, hfin))
+    return ventanas
+
+
+def fin_ventana(fecha, hfin):
+    '''
+    (fecha, hora) en que acaba una ventana (las 24 son las 0 del día
+    siguiente)
+    '''
+    if hfin >= 24:
+        return (fecha + datetime.timedelta(days=1), hfin - 24)
+    return (fecha, hfin)
+
+
+def arrastres_periodo(ventanas, equipos):
+    '''
+    Índices de las ventanas (ventanas_periodo) que empiezan cuando acaba la
+    anterior de su equipo y por tanto reciben su estado
+    '''
+    fines = {}
+    arrastres = []
+    for i, (fecha, idturno, hini, hfin) in enumerate(ventanas):
+        equipo = equipos[idturno]
+        if fines.get(equipo) == (fecha, hini):
+            arrastres.append(i)
+        fines[equipo] = fin_ventana(fecha, hfin)
+    return arrastres
+
+
+def solve_period_scheduling(icao, num_employees, fecha_ini, num_dias,
+                            turnos=None, block_length=5,
+                            demand_interval_length=5,
+                            max_time_in_seconds=None, exportador=None,
+                            equipos=None):
+    '''
+    icao: aeropuerto (datosDependencias1.csv)
+    num_employees: ATCOS por turno
+    fecha_ini: datetime.date del primer día, num_dias: días a planificar
+    turnos: lista de idturno de cada día (por defecto todos)
+    exportador: myExportacionCRs.ExportadorLote al que se envía cada
+        estadillo según se resuelve (una hoja por día y turno)
+    equipos: {idturno: equipo} equipo que cubre cada turno todos los días
+        (obligatorio). Dos turnos contiguos con el mismo equipo son las
+        mismas personas. ValueError si falta o si con él ninguna ventana
+        arrastra estado (arrastres_periodo)
+    Devuelve un diccionario:
+        'ventanas': [{'fecha', 'turno', 'resultado', 'tiempo', 'equipo',
+                      'estado_inicial', 'status', 'heuristico'}] en orden
+            cronológico; 'heuristico' si resultado es el estadillo de
+            respaldo (el solver no ha encontrado solución)
+        'arrastres': ventanas que han recibido el estado de la anterior
+        'tiempo_total': segundos
+    '''
+    t0 = time.time()
+    mC = myInputConfigCRs.MyConfig(icao=icao)
+    mE = myInputCRs.MyEscenario(icao=icao, fileTWR=mC.fileTWR,
+                                fileTrafico=mC.fileTrafico)
+    ventanas = ventanas_periodo(mE, fecha_ini, num_dias, turnos)
+    if turnos is None:
+        turnos = list(range(len(mE.turnos)))
+    if equipos is None or any(idturno not in equipos for idturno in turnos):
+        raise ValueError("equipos debe dar el equipo de cada turno %s"
+                         % turnos)
+    if len(arrastres_periodo(ventanas, equipos)) == 0:
+        raise ValueError("con equipos %s ningún turno empieza cuando acaba "
+                         "el anterior del mismo equipo: no se arrastra "
+                         "estado" % equipos)
+    # longitud máxima de secuencia que hay que arrastrar (bloques)
+    maximo = max([math.ceil(x[5] / block_length) for x in mC.shift_constraints]
+                 + [1])
+
+    def demanda_dia(fecha):
+        if len(mC.hourly_cover_demands) > 0:
+            return {}
+        return mE.getdemandaDia(fecha.day,
+                                ventanaflotante=demand_interval_length,
+                                turnos=turnos)
+
+    resultados = []
+    # por equipo: estado final y (fecha, hora) en que acaba su última ventana
+    estados = {}
+    fines = {}
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        dias = sorted(set(v[0] for v in ventanas))
+        futuros = {dias[0]: executor.submit(demanda_dia, dias[0])}
+        for fecha, idturno, hini, hfin in ventanas:
+            # pipeline: la demanda del día siguiente se calcula mientras
+            # se resuelve este
+            siguiente = fecha + datetime.timedelta(days=1)
+            if siguiente in dias and siguiente not in futuros:
+                futuros[siguiente] = executor.submit(demanda_dia, siguiente)
+            demandas = futuros[fecha].result()
+
+            # sólo se arrastra el estado si la ventana es contigua a la
+            # anterior del mismo equipo
+            equipo = equipos[idturno]
+            contigua = fines.get(equipo) == (fecha, hini)
+            estado_inicial = estados.get(equipo) if contigua else None
+
+            lista = [icao, num_employees, idturno, block_length,
+                     demand_interval_length, fecha]
+            t = time.time()
+            informe = {}
+            resultado = solve_shift_scheduling(
+                lista, escenario=mE, demanda=demandas.get(idturno),
+                max_time_in_seconds=max_time_in_seconds,
+                estado_inicial=estado_inicial, informe=informe)
+            # estadillo heurístico de respaldo (sin solución del solver)
+            heuristico = (type(resultado) == list and informe.get('status')
+                          not in ('OPTIMAL', 'FEASIBLE'))
+            resultados.append({'fecha': fecha, 'turno': idturno,
+                               'resultado': resultado,
+                               'tiempo': time.time() - t,
+                               'equipo': equipo,
+                               'estado_inicial': estado_inicial,
+                               'status': informe.get('status'),
+                               'heuristico': heuristico})
+
+            if exportador is not None:
+                exportador.añadir({'icao': icao, 'fecha': fecha,
+                                   'turno': idturno, 'resultado': resultado,
+                                   'heuristico': heuristico,
+                                   'hora_inicio': hini,
+                                   'demand_interval_length':
+                                       demand_interval_length,
+                                   'block_length': block_length})
+
+            estados[equipo] = None
+            if type(resultado) == list:
+                estadillo = estadillo_desde_salida(resultado[0], mC.shifts)
+                estados[equipo] = estado_final(estadillo, maximo)
+            fines[equipo] = fin_ventana(fecha, hfin)
+
+    arrastres = sum(1 for x in resultados if x['estado_inicial'] is not None)
+    print("%i de %i ventanas con el estado de la anterior" % (
+        arrastres, len(resultados)))
+    return {'ventanas': resultados, 'arrastres': arrastres,
+            'tiempo_total': time.time() - t0}
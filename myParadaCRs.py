@@ -0,0 +1,148 @@
+#CRITERIO DE PARADA DE CP-SAT
+import threading
+import time
+
+from ortools.sat.python import cp_model
+
+"""
+Además de max_time_in_seconds, la búsqueda se para cuando:
+    - relative_gap_limit / absolute_gap_limit: la diferencia entre la mejor
+      solución y la cota inferior es menor que el límite (0 = sin límite)
+    - tiempo_sin_mejora: pasan esos segundos sin mejorar la mejor solución
+      (0 = sin límite). El callback de soluciones sólo se llama cuando hay
+      una solución nueva, así que un hilo vigilante llama a StopSearch del
+      callback (en ortools 9.6 CpSolver.StopSearch no tiene efecto)
+    - cancelar: un threading.Event activado desde otro hilo
+    - max_deterministic_time: límite en tiempo determinista, para que los
+      benchmarks sean reproducibles (0 = sin límite)
+Los valores por defecto vienen de inputconfigCRs.json (todos 0: sólo
+max_time_in_seconds) y se pueden cambiar en cada llamada
+(solve_shift_scheduling(parada=...), app.py).
+"""
+
+CLAVES_PARADA = ('relative_gap_limit', 'absolute_gap_limit',
+                 'tiempo_sin_mejora', 'max_deterministic_time')
+
+
+def politica_parada(mC, parada=None):
+    '''
+    Criterio de parada del inputconfigCRs.json con los valores de parada
+    sustituidos (ver sustituir_parada)
+    '''
+    politica = {clave: getattr(mC, clave) for clave in CLAVES_PARADA}
+    return sustituir_parada(politica, parada)
+
+
+def sustituir_parada(politica, parada=None):
+    '''
+    Copia de politica con los valores de parada (diccionario con claves de
+    CLAVES_PARADA; None = no cambia) sustituidos
+    '''
+    politica = dict(politica)
+    if parada is not None:
+        for clave, valor in parada.items():
+            if clave not in CLAVES_PARADA:
+                raise KeyError(clave)
+            if valor is not None:
+                politica[clave] = valor
+    return politica
+
+
+def aplicar_parada(solver, politica):
+    '''
+    Pasa los límites de la política a los parámetros del solver
+    '''
+    if politica['relative_gap_limit'] > 0:
+        solver.parameters.relative_gap_limit = politica['relative_gap_limit']
+    if politica['absolute_gap_limit'] > 0:
+        solver.parameters.absolute_gap_limit = politica['absolute_gap_limit']
+    if politica['max_deterministic_time'] > 0:
+        solver.parameters.max_deterministic_time = politica[
+            'max_deterministic_time']
+
+
+def gap_alcanzado(politica, objetivo, cota):
+    '''
+    True si objetivo está dentro de los gaps de la política respecto a
+    cota (como CP-SAT: el relativo sobre max(1, |objetivo|)). Para
+    búsquedas que no pasan los límites al solver (myLNSCRs)
+    '''
+    if objetivo is None or cota is None:
+        return False
+    gap = abs(objetivo - cota)
+    if (politica['absolute_gap_limit'] > 0 and
+            gap <= politica['absolute_gap_limit']):
+        return True
+    return (politica['relative_gap_limit'] > 0 and
+            gap <= politica['relative_gap_limit'] * max(1.0, abs(objetivo)))
+
+
+class ParadaSinMejora(cp_model.CpSolverSolutionCallback):
+    """Imprime cada solución (como ObjectiveSolutionPrinter) y guarda
+    el instante de la última mejora del objetivo."""
+
+    def __init__(self, al_primera_solucion=None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.al_primera_solucion = al_primera_solucion
+        self.inicio = time.time()
+        self.soluciones = 0
+        self.mejor = None
+        self.ultima_mejora = None
+        self.primera_solucion = None # segundos hasta la primera solución
+        self.motivo = None # 'sin_mejora' o 'cancelado' si la para el vigilante
+
+    def on_solution_callback(self):
+        ahora = time.time()
+        objetivo = self.ObjectiveValue()
+        print('Solution %i, time = %0.2f s, objective = %i' %
+              (self.soluciones, ahora - self.inicio, objetivo))
+        self.soluciones += 1
+        if self.primera_solucion is None:
+            self.primera_solucion = ahora - self.inicio
+            if self.al_primera_solucion is not None:
+                self.al_primera_solucion()
+        if self.mejor is None or objetivo < self.mejor:
+            self.mejor = objetivo
+            self.ultima_mejora = ahora
+
+
+def resolver_con_parada(solver, model, politica, cancelar=None,
+                        al_primera_solucion=None):
+    '''
+    Resuelve model con la política de parada (ver politica_parada).
+    cancelar: threading.Event que, si se activa, para la búsqueda desde
+    otro hilo (ej. búsquedas en paralelo que ya no hacen falta)
+    al_primera_solucion: función sin argumentos que se llama al encontrar
+    la primera solución (desde el hilo del solver)
+    Devuelve (status, callback) con callback.motivo == 'sin_mejora' si se
+    ha parado por tiempo_sin_mejora o 'cancelado' si por cancelar
+    '''
+    aplicar_parada(solver, politica)
+    callback = ParadaSinMejora(al_primera_solucion)
+    ventana = politica['tiempo_sin_mejora']
+    fin = threading.Event()
+
+    def vigilar():
+        while not fin.wait(0.1):
+            if cancelar is not None and cancelar.is_set():
+                callback.motivo = 'cancelado'
+                callback.StopSearch()
+                return
+            ultima = callback.ultima_mejora
+            if (ventana > 0 and ultima is not None and
+                    time.time() - ultima > ventana):
+                callback.motivo = 'sin_mejora'
+                callback.StopSearch()
+                return
+
+    vigilante = None
+    if ventana > 0 or cancelar is not None:
+        vigilante = threading.Thread(target=vigilar, daemon=True)
+        vigilante.start()
+    try:
+        status = solver.SolveWithSolutionCallback(model, callback)
+    finally:
+        fin.set()
+        if vigilante is not None:
+            vigilante.join()
+    return status, callback
@@ -0,0 +1,145 @@
+#PERFILADO DE UNA RESOLUCIÓN (bajo demanda)
+#    PERFILADO_CRS=1 streamlit run app.py
+#    python myPerfiladorCRs.py perfiladoCRs/<carpeta>/perfil.prof
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import sys
+import time
+
+"""
+Si está activado (variable de entorno PERFILADO_CRS=1, "perfilado":1 en
+inputconfigCRs.json o el argumento perfilado de solve_shift_scheduling,
+que app.py pasa con ?perfilado=1 en la url) la resolución completa (carga
+de datos, demanda, modelo, solver y extracción) se ejecuta con cProfile y
+se guarda en DIRECTORIO_PERFILADO/<ICAO>_t<turno>_<fecha>_<hora>/:
+    - perfil.prof: pstats (snakeviz, python -m pstats)
+    - cpsat.log: log de búsqueda de CP-SAT
+    - response_stats.txt: solver.ResponseStats()
+    - resumen.txt: árbol de llamadas con el % del tiempo (resumen_llamas)
+    - informe.json: informe de solve_shift_scheduling
+Desactivado, el único coste es leer la variable de entorno.
+"""
+
+VARIABLE_ENTORNO = 'PERFILADO_CRS'
+
+DIRECTORIO_PERFILADO = 'perfiladoCRs'
+
+# ramas del árbol con menos de este % del tiempo no se muestran
+MINIMO_PORCENTAJE = 2.0
+PROFUNDIDAD_MAXIMA = 12
+ANCHO_BARRA = 30
+
+
+def perfilado_activo(config=None):
+    '''
+    True si está activado por variable de entorno o por config (MyConfig)
+    '''
+    if os.environ.get(VARIABLE_ENTORNO, '0') not in ('', '0'):
+        return True
+    return config is not None and config.perfilado
+
+
+def nombre_funcion(funcion):
+    fichero, linea, nombre = funcion
+    if fichero == '~':
+        return nombre # funciones de C
+    return '%s (%s:%i)' % (nombre, os.path.basename(fichero), linea)
+
+
+def resumen_llamas(estadisticas, raiz_nombre='solve_shift_scheduling'):
+    '''
+    Árbol de llamadas desde raiz_nombre, cada rama con su % del tiempo
+    acumulado y una barra (versión en texto de un flame graph). Las ramas
+    se aproximan con el tiempo de cada par llamante-llamada de cProfile
+    '''
+    estadisticas.calc_callees()
+    llamadas = estadisticas.all_callees
+    raices = [f for f in estadisticas.stats if f[2] == raiz_nombre]
+    if len(raices) == 0:
+        return ''
+    raiz = max(raices, key=lambda f: estadisticas.stats[f][3])
+    total = estadisticas.stats[raiz][3] or 1e-9
+    lineas = []
+
+    def rama(funcion, tiempo, profundidad, visitadas):
+        porcentaje = 100.0 * tiempo / total
+        barra = '#' * max(1, int(round(ANCHO_BARRA * tiempo / total)))
+        lineas.append('%-*s %5.1f%% %7.3f s  %s%s' % (
+            ANCHO_BARRA, barra, porcentaje, tiempo, '  ' * profundidad,
+            nombre_funcion(funcion)))
+        if profundidad >= PROFUNDIDAD_MAXIMA:
+            return
+        hijas = sorted(llamadas.get(funcion, {}).items(),
+                       key=lambda x: -x[1][3])
+        for hija, (cc, nc, tt, ct) in hijas:
+            if hija in visitadas or 100.0 * ct / total < MINIMO_PORCENTAJE:
+                continue
+            rama(hija, ct, profundidad + 1, visitadas | {hija})
+
+    rama(raiz, total, 0, {raiz})
+    return '\n'.join(lineas)
+
+
+def directorio_artefacto(lista, directorio=DIRECTORIO_PERFILADO):
+    fecha = lista[5].isoformat() if hasattr(lista[5], 'isoformat') else lista[5]
+    nombre = '%s_t%s_%s_%s' % (lista[0], lista[2], fecha,
+                               datetime.datetime.now().strftime('%Y%m%d%H%M%S'))
+    ruta = os.path.join(directorio, nombre)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def perfilar_resolucion(resolver, lista, argumentos,
+                        directorio=DIRECTORIO_PERFILADO):
+    '''
+    Ejecuta resolver(lista, **argumentos) (solve_shift_scheduling) con
+    cProfile y el log de CP-SAT, y guarda el artefacto. El informe
+    (argumentos['informe']) recibe 'perfilado': {'directorio', 'resumen'}
+    Si argumentos trae registro_solver, también recibe cada línea del log.
+    Devuelve la salida de resolver
+    '''
+    log_cpsat = []
+    informe = argumentos.get('informe')
+    if informe is None:
+        informe = argumentos['informe'] = {}
+    registro_solver = argumentos.get('registro_solver')
+
+    def registrar(linea):
+        log_cpsat.append(linea)
+        if registro_solver is not None:
+            registro_solver(linea)
+
+    argumentos = dict(argumentos, registro_solver=registrar)
+
+    perfil = cProfile.Profile()
+    t = time.time()
+    perfil.enable()
+    try:
+        resultado = resolver(lista, **argumentos)
+    finally:
+        perfil.disable()
+    tiempo = time.time() - t
+
+    ruta = directorio_artefacto(lista, directorio)
+    perfil.dump_stats(os.path.join(ruta, 'perfil.prof'))
+    resumen = resumen_llamas(pstats.Stats(perfil))
+    with open(os.path.join(ruta, 'cpsat.log'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(log_cpsat))
+    with open(os.path.join(ruta, 'response_stats.txt'), 'w',
+              encoding='utf-8') as f:
+        f.write(informe.get('response_stats', ''))
+    with open(os.path.join(ruta, 'resumen.txt'), 'w', encoding='utf-8') as f:
+        f.write('%0.3f s\n%s\n' % (tiempo, resumen))
+    with open(os.path.join(ruta, 'informe.json'), 'w', encoding='utf-8') as f:
+        json.dump(informe, f, indent=4, default=str)
+    print("perfilado en %s" % ruta)
+    print(resumen)
+    informe['perfilado'] = {'directorio': ruta, 'resumen': resumen}
+    return resultado
+
+
+if __name__ == '__main__':
+    print(resumen_llamas(pstats.Stats(sys.argv[1])))
@@ -0,0 +1,139 @@
+#NÚMERO MÍNIMO DE ATCOS (búsqueda en paralelo)
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import myEstimadorCRs # cotas del número de ATCOS (sin solver)
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+from shift_scheduling_sat_revCREF_v20 import (cargar_problema,
+                                              solve_shift_scheduling)
+
+"""
+En lugar de probar en app.py un número de ATCOS tras otro, se resuelven a
+la vez todos los candidatos entre las cotas de myEstimadorCRs:
+    - cota inferior estricta (límites duros): con menos no hay solución
+    - cota superior de la rotación escalonada
+La primera solución de cada candidato cancela (StopSearch) las búsquedas
+con más ATCOS, que ya no pueden dar el mínimo, y cada infactibilidad
+probada cancela las de menos ATCOS. La búsqueda completa tarda lo que la resolución más lenta que no
+se cancela, del orden de una sola resolución.
+"""
+
+SOLUCION = ('OPTIMAL', 'FEASIBLE')
+
+
+def candidatos_plantilla(escenario, lista, traf=[], demanda=None, mC=None):
+    '''
+    Números de ATCOS a probar (entre la cota inferior estricta y la
+    superior) para lista = [aeropuerto, -, turno, bloque, ventana, fecha].
+    Sin cobertura exacta (match_full_demand=0) no hay cota inferior
+    válida: se empieza en 1.
+    Devuelve el mensaje de cargar_problema si no se puede cargar
+    '''
+    if mC is None:
+        mC = myInputConfigCRs.MyConfig(icao=lista[0])
+    cotas = myEstimadorCRs.estimar_atcos_turno(
+        escenario, lista[5].day, lista[2], lista[4], lista[3], traf, mC)
+    if cotas is None:
+        return []
+    inferior, superior = cotas
+    problema = cargar_problema([lista[0], superior] + lista[2:], traf,
+                               escenario, demanda, mC)
+    if type(problema) == str:
+        return problema
+    # la cota de estimar_atcos_turno usa los límites blandos y no es un
+    # mínimo; la estricta (como en solve_shift_scheduling) sólo lo es con
+    # cobertura exacta de la demanda
+    if problema['match_full_demand']:
+        inferior = max(1, myEstimadorCRs.estimar_atcos_problema(problema))
+    else:
+        inferior = 1
+    return list(range(inferior, max(inferior, superior) + 1))
+
+
+def buscar_plantilla_minima(icao, idturno, fecha, block_length=5,
+                            demand_interval_length=5, traf=[],
+                            candidatos=None, max_time_in_seconds=None):
+    '''
+    icao, idturno, fecha: aeropuerto, turno y datetime.date
+    traf: demanda por hora modificada a mano (app.py)
+    candidatos: números de ATCOS a probar (por defecto entre las cotas)
+    Devuelve un diccionario:
+        'num_employees': mínimo número de ATCOS con solución (None si no hay)
+        'resultado': salida de solve_shift_scheduling con ese número (o
+            el mensaje de error si no se ha podido cargar el problema)
+        'candidatos': {num_employees: {'status', 'tiempo'}} con status de
+            CP-SAT o 'CANCELADO' si se ha parado por estar dominado
+        'tiempo_total': segundos
+    '''
+    t0 = time.time()
+    mC = myInputConfigCRs.MyConfig(icao=icao)
+    mE = myInputCRs.MyEscenario(icao=icao, fileTWR=mC.fileTWR,
+                                fileTrafico=mC.fileTrafico)
+    demanda = None
+    if len(mC.hourly_cover_demands) == 0 and len(traf) == 0:
+        demanda = mE.getdemandaDia(
+            fecha.day, ventanaflotante=demand_interval_length,
+            turnos=[idturno])[idturno]
+    lista = [icao, None, idturno, block_length, demand_interval_length, fecha]
+    if candidatos is None:
+        candidatos = candidatos_plantilla(mE, lista, traf, demanda, mC)
+    if type(candidatos) == str or len(candidatos) == 0:
+        # sin demanda o error al cargar el problema (mensaje en resultado)
+        return {'num_employees': None,
+                'resultado': candidatos if type(candidatos) == str else None,
+                'candidatos': {}, 'tiempo_total': time.time() - t0}
+
+    cancelar = {n: threading.Event() for n in candidatos}
+    cerrojo = threading.Lock()
+    hilos = max(1, (os.cpu_count() or 1) // len(candidatos))
+
+    def resolver(n):
+        if cancelar[n].is_set():
+            return {'status': 'CANCELADO', 'tiempo': 0.0, 'resultado': None}
+        informe = {}
+        t = time.time()
+
+        def dominar():
+            # con más ATCOS ya no se mejora el mínimo
+            with cerrojo:
+                if not cancelar[n].is_set():
+                    for m in candidatos:
+                        if m > n:
+                            cancelar[m].set()
+
+        resultado = solve_shift_scheduling(
+            [icao, n] + lista[2:], traf, escenario=mE, demanda=demanda,
+            max_time_in_seconds=max_time_in_seconds,
+            num_search_workers=min(n, hilos), respaldo=False,
+            informe=informe, cancelar=cancelar[n], al_primera_solucion=dominar,
+            config=mC)
+        status = informe.get('status', 'ERROR')
+        with cerrojo:
+            if status == 'INFEASIBLE':
+                # con menos ATCOS tampoco hay solución
+                for m in candidatos:
+                    if m < n:
+                        cancelar[m].set()
+            if cancelar[n].is_set() and informe.get('motivo') == 'cancelado':
+                status = 'CANCELADO'
+        return {'status': status, 'tiempo': time.time() - t,
+                'resultado': resultado}
+
+    with ThreadPoolExecutor(max_workers=len(candidatos)) as executor:
+        resultados = dict(zip(candidatos, executor.map(resolver, candidatos)))
+
+    minimo = None
+    for n in candidatos:
+        if resultados[n]['status'] in SOLUCION:
+            minimo = n
+            break
+    return {
+        'num_employees': minimo,
+        'resultado': None if minimo is None else resultados[minimo]['resultado'],
+        'candidatos': {n: {'status': r['status'], 'tiempo': r['tiempo']}
+                       for n, r in resultados.items()},
+        'tiempo_total': time.time() - t0,
+    }
@@ -0,0 +1,99 @@
+#REPARACIÓN DE UN ESTADILLO EN CURSO (baja de un ATCO, cambio de demanda)
+import copy
+
+import myInputConfigCRs # datos json configuración cálculos OR
+from shift_scheduling_sat_revCREF_v20 import (estadillo_desde_salida,
+                                              solve_shift_scheduling)
+
+"""
+Con el turno ya empezado (ej. a las 10:00 un ATCO se va o sube la demanda)
+reparar_estadillo parte del estadillo publicado:
+    - los bloques anteriores al corte se fijan a la asignación publicada,
+      así las shift_constraints ven la racha de trabajo/descanso con la
+      que cada ATCO llega al corte
+    - el ATCO de baja queda en descanso desde el corte y sin sus
+      restricciones de secuencia y reparto
+    - el resto del turno se reoptimiza con la demanda nueva (traf), el
+      estadillo publicado como hint y un límite de tiempo corto
+Si con cobertura exacta ("match_full_demand") no hay solución se repite
+permitiendo menos posiciones que demanda, penalizando cada posición sin
+cubrir con PENALIZACION_DEFICIT, para tener siempre un estadillo válido
+que publicar.
+"""
+
+# límite de tiempo de cada intento de reparación (segundos)
+MAX_TIME_REPARACION = 3.0
+# penalización por posición y bloque sin cubrir en el segundo intento
+# (por encima de las de descanso, que son de 100 por bloque)
+PENALIZACION_DEFICIT = 1000
+
+
+def bloques_cambiados(previo, nuevo, corte=0):
+    '''
+    Número de asignaciones [empleado][bloque] distintas desde el corte
+    '''
+    return sum(1 for fila_previa, fila in zip(previo, nuevo)
+               for b in range(corte, min(len(fila_previa), len(fila)))
+               if fila_previa[b] != fila[b])
+
+
+def reparar_estadillo(lista, ouput, corte, baja=None, traf=[],
+                      max_time_in_seconds=MAX_TIME_REPARACION, escenario=None,
+                      config=None, informe=None):
+    '''
+    lista: [aeropuerto, num ATCOS, turno, bloque, ventana demanda, fecha]
+        del estadillo publicado
+    ouput: estadillo publicado (primer elemento de la salida de
+        solve_shift_scheduling)
+    corte: primer bloque que se puede cambiar
+    baja: empleado (o lista de empleados) que deja el turno en el corte
+    traf: demanda por hora actualizada (igual que en solve_shift_scheduling)
+    Devuelve lo mismo que solve_shift_scheduling; informe (si no es None)
+    recibe además 'bloques_cambiados' y 'cobertura_exacta'
+    '''
+    if informe is None:
+        informe = {}
+    if config is None:
+        config = myInputConfigCRs.MyConfig(icao=lista[0])
+    estadillo = estadillo_desde_salida(ouput, config.shifts)
+    if len(estadillo) != lista[1]:
+        return "El estadillo no corresponde al número de ATCOS"
+    num_blocks = len(estadillo[0])
+    if not 0 <= corte < num_blocks:
+        return "El bloque de corte está fuera del turno"
+    if baja is None:
+        bajas = {}
+    else:
+        bajas = {e: corte for e in ([baja] if type(baja) == int else baja)}
+
+    fijos = [[e, s, b] for e, fila in enumerate(estadillo)
+             for b, s in enumerate(fila[:corte])]
+    pistas = [list(fila) for fila in estadillo]
+    for e in bajas:
+        pistas[e][corte:] = [0] * (num_blocks - corte)
+
+    configuraciones = [config]
+    if config.match_full_demand:
+        relajada = copy.copy(config)
+        relajada.match_full_demand = False
+        relajada.deficit_cover_penalty = max(config.deficit_cover_penalty,
+                                             PENALIZACION_DEFICIT)
+        configuraciones.append(relajada)
+    for mC in configuraciones:
+        informe.clear()
+        resultado = solve_shift_scheduling(
+            lista, traf, fijos=fijos, pistas=pistas,
+            max_time_in_seconds=max_time_in_seconds, escenario=escenario,
+            respaldo=False, diagnostico=False, carrera=False, config=mC,
+            informe=informe, bajas=bajas)
+        if type(resultado) == list:
+            nuevo = estadillo_desde_salida(resultado[0], config.shifts)
+            informe['bloques_cambiados'] = bloques_cambiados(estadillo, nuevo,
+                                                             corte)
+            informe['cobertura_exacta'] = mC.match_full_demand
+            print("reparación: %i asignaciones cambiadas desde el bloque %i"
+                  % (informe['bloques_cambiados'], corte))
+            return resultado
+        print("reparación sin solución (match_full_demand=%s)"
+              % mC.match_full_demand)
+    return resultado
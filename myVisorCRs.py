@@ -0,0 +1,155 @@
+#VISOR LIGERO DEL ESTADILLO (canvas en el navegador)
+import json
+import time
+
+import numpy as np
+
+"""
+En lugar de convertir la tabla del estadillo a texto y pintarla con un
+Styler de pandas (una celda html con estilo por ATCO y bloque), se envía
+al navegador el estadillo codificado por tramos:
+    - cada ATCO: lista de [bloque inicial, número de bloques] trabajados (T)
+    - POS_DEMAND y TRAFFIC_DEMAND: lista de [bloque inicial, número de
+      bloques, valor] con valor constante
+y un script lo dibuja en un <canvas> (app.py lo muestra con
+streamlit.components.v1.html). Con 30 ATCOS x 96 bloques son unos pocos
+cientos de tramos en lugar de ~3000 celdas con estilo.
+"""
+
+# presupuesto (ms) para codificar y generar el html de 30 ATCOS x 96 bloques
+PRESUPUESTO_MS = 50
+
+ALTO_FILA = 18 # px
+ANCHO_BLOQUE = 10 # px
+ANCHO_NOMBRE = 150 # px, columna con ATCO, horas y porcentaje
+
+COLOR_TRABAJO = '#008000' # mismo verde que el Styler anterior
+COLOR_DESCANSO = '#F2F2F2'
+
+
+def tramos(valores, trabajo='T'):
+    '''
+    [inicio, longitud] de cada tramo de valores == trabajo
+    '''
+    activo = np.concatenate([[0], (np.asarray(valores) == trabajo).astype(np.int8), [0]])
+    cambios = np.flatnonzero(np.diff(activo))
+    return [[int(i), int(f - i)] for i, f in zip(cambios[0::2], cambios[1::2])]
+
+
+def tramos_valor(valores):
+    '''
+    [inicio, longitud, valor] de cada tramo de valores iguales
+    '''
+    valores = np.asarray([int(x) for x in valores], dtype=np.int32)
+    if len(valores) == 0:
+        return []
+    inicios = np.concatenate([[0], np.flatnonzero(np.diff(valores)) + 1])
+    fines = np.concatenate([inicios[1:], [len(valores)]])
+    return [[int(i), int(f - i), int(valores[i])] for i, f in zip(inicios, fines)]
+
+
+def codificar_estadillo(df, horas, block_length=5):
+    '''
+    df: tabla del estadillo de app.py (columnas: nombre, tiempo, porcentaje
+    y un bloque por columna; filas: POS_DEMAND, TRAFFIC_DEMAND y un ATCO por
+    fila)
+    horas: etiquetas 'H Inicio hh:mm' de los bloques
+    Devuelve un diccionario serializable a json
+    '''
+    bloques = df.iloc[:, 3:].values
+    return {
+        'block_length': block_length,
+        'num_blocks': bloques.shape[1],
+        'horas': [h.replace('H Inicio ', '') for h in horas],
+        'posiciones': tramos_valor(bloques[0]),
+        'demanda': tramos_valor(bloques[1]),
+        'atcos': [{'nombre': str(df.iloc[f, 0]).rstrip(':'),
+                   'tiempo': float(df.iloc[f, 1]),
+                   'porcentaje': float(df.iloc[f, 2]),
+                   'tramos': tramos(bloques[f])}
+                  for f in range(2, len(df))],
+    }
+
+
+def alto_estadillo(datos):
+    '''
+    Alto (px) del componente para los datos de codificar_estadillo
+    '''
+    return (len(datos['atcos']) + 3) * ALTO_FILA + 20
+
+
+PLANTILLA = """
+<canvas id="estadillo"></canvas>
+<script>
+const d = %(datos)s;
+const F = %(alto_fila)i, B = %(ancho_bloque)i, N = %(ancho_nombre)i;
+const c = document.getElementById('estadillo');
+c.width = N + d.num_blocks * B;
+c.height = (d.atcos.length + 3) * F;
+const g = c.getContext('2d');
+g.font = '11px sans-serif';
+g.textBaseline = 'middle';
+// horas (una etiqueta por hora)
+const porHora = Math.max(1, Math.round(60 / d.block_length));
+for (let b = 0; b < d.num_blocks; b += porHora) {
+  g.fillStyle = '#000';
+  g.fillText(d.horas[b], N + b * B + 2, F / 2);
+  g.fillStyle = '#999';
+  g.fillRect(N + b * B, 0, 1, c.height);
+}
+// demanda y posiciones (verde -> naranja -> rojo como la hoja excel)
+function colorValor(v, max) {
+  const x = max > 0 ? v / max : 0;
+  const r = Math.round(x < 0.5 ? 0x25 + (0xF0 - 0x25) * 2 * x : 0xF0 + (0xE0 - 0xF0) * (2 * x - 1));
+  const v2 = Math.round(x < 0.5 ? 0xD8 + (0xA2 - 0xD8) * 2 * x : 0xA2 + (0x3C - 0xA2) * (2 * x - 1));
+  const b = Math.round(x < 0.5 ? 0x2B + (0x2A - 0x2B) * 2 * x : 0x2A + (0x18 - 0x2A) * (2 * x - 1));
+  return 'rgb(' + r + ',' + v2 + ',' + b + ')';
+}
+[['POS_DEMAND', d.posiciones, 1], ['TRAFFIC_DEMAND', d.demanda, 2]].forEach(([nombre, tramos, fila]) => {
+  const max = Math.max(0, ...tramos.map(t => t[2]));
+  g.fillStyle = '#000';
+  g.fillText(nombre, 2, fila * F + F / 2);
+  tramos.forEach(([i, n, v]) => {
+    g.fillStyle = colorValor(v, max);
+    g.fillRect(N + i * B, fila * F + 1, n * B - 1, F - 2);
+    g.fillStyle = '#000';
+    g.fillText(v, N + i * B + 2, fila * F + F / 2);
+  });
+});
+// ATCOS
+d.atcos.forEach((a, k) => {
+  const y = (k + 3) * F;
+  g.fillStyle = '%(color_descanso)s';
+  g.fillRect(N, y + 1, d.num_blocks * B, F - 2);
+  g.fillStyle = '%(color_trabajo)s';
+  a.tramos.forEach(([i, n]) => g.fillRect(N + i * B, y + 1, n * B, F - 2));
+  g.fillStyle = '#000';
+  g.fillText(a.nombre + '  ' + a.tiempo.toFixed(2) + ' h  ' + a.porcentaje.toFixed(0) + '%%', 2, y + F / 2);
+});
+</script>
+"""
+
+
+def html_estadillo(datos):
+    '''
+    Html con el canvas y el script que dibuja los datos de
+    codificar_estadillo
+    '''
+    return PLANTILLA % {'datos': json.dumps(datos, separators=(',', ':')),
+                        'alto_fila': ALTO_FILA, 'ancho_bloque': ANCHO_BLOQUE,
+                        'ancho_nombre': ANCHO_NOMBRE,
+                        'color_trabajo': COLOR_TRABAJO,
+                        'color_descanso': COLOR_DESCANSO}
+
+
+def renderizar_estadillo(df, horas, block_length=5):
+    '''
+    (html, alto en px, milisegundos) del estadillo de app.py
+    '''
+    t = time.perf_counter()
+    datos = codificar_estadillo(df, horas, block_length)
+    html = html_estadillo(datos)
+    ms = (time.perf_counter() - t) * 1000
+    if ms > PRESUPUESTO_MS:
+        print("estadillo: %0.1f ms (presupuesto %i ms)" % (ms, PRESUPUESTO_MS))
+    return html, alto_estadillo(datos), ms
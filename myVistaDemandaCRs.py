@@ -0,0 +1,249 @@
+#VISTA MATERIALIZADA DE LA DEMANDA (ICAO x día x turno x ventana)
+#    python myVistaDemandaCRs.py    (crea o refresca vistaDemandaCRs.npz)
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import myInputConfigCRs # datos json configuración cálculos OR
+import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+
+"""
+Las series (listademanda, listaposiciones) de getdfTrafico sólo dependen
+de los ficheros de tráfico y de dependencias, así que se calculan una vez
+para todos los AD de datosDependencias1.csv con tráfico, todos los días,
+todos los turnos de turnoshini y todas las ventanas de VENTANAS, y se
+guardan en un .npz comprimido:
+    - índice: una fila por (ICAO, día, turno, ventana) con el inicio y la
+      longitud de su serie en los arrays planos
+    - demanda y posiciones en int16 (-1 = sin dato)
+    - huella (sha1) de los datos de cada (ICAO, día): al refrescar sólo se
+      recalculan los (ICAO, día) cuya huella ha cambiado
+    - firma (tamaño y fecha) de los ficheros: si no coincide la vista está
+      desactualizada y MyEscenario no la usa
+    - actualizar_vista: tras añadir días con myIngestaCRs sólo se calculan
+      los (ICAO, día) nuevos, sin leer el histórico
+Al resolver, MyEscenario.getdfTrafico lee la serie de la vista (sin
+pandas) si no hay demanda modificada a mano.
+"""
+
+# ventanas (minutos) que dividen la hora, las que getdfTrafico calcula
+VENTANAS = (5, 10, 15, 20, 30, 60)
+
+FICHERO_VISTA = 'vistaDemandaCRs.npz'
+
+SIN_DATO = -1
+
+# vistas ya leídas: {fichero: (fecha de modificación, VistaDemanda)}
+vistas_cargadas = {}
+
+
+def firma_ficheros(fileTWR, fileTrafico):
+    '''
+    Tamaño y fecha de modificación de los ficheros de entrada
+    '''
+    firma = []
+    for fichero in (fileTWR, fileTrafico):
+        st = os.stat(fichero)
+        firma.append('%s:%i:%i' % (os.path.basename(fichero), st.st_size,
+                                   st.st_mtime_ns))
+    return ';'.join(firma)
+
+
+def huellas_dias(dfTWR, dfTrafico, icaos):
+    '''
+    {(icao, diames): sha1} de las filas de tráfico del día y de la fila de
+    dependencias (turnos y capacidades) del AD
+    '''
+    huellas = {}
+    for icao in icaos:
+        fila_twr = dfTWR.loc[dfTWR['ICAO'] == icao,
+                             ['turnoshini', 'capsostenible']].to_csv(index=False)
+        dfad = dfTrafico.loc[dfTrafico['ICAO'] == icao]
+        for diames, dfdia in dfad.groupby('DIAMES'):
+            h = hashlib.sha1(fila_twr.encode())
+            h.update(pd.util.hash_pandas_object(
+                dfdia[['MES_LOCAL', 'HORA_LOCAL', 'TOTALES']],
+                index=False).values.tobytes())
+            huellas[icao, int(diames)] = h.hexdigest()
+    return huellas
+
+
+def a_int16(valores):
+    return np.array([SIN_DATO if pd.isna(x) else int(x) for x in valores],
+                    dtype=np.int16)
+
+
+class VistaDemanda:
+    """Series de demanda y posiciones por (ICAO, día, turno, ventana)."""
+
+    def __init__(self, series=None, huellas=None, firma=''):
+        # series: {(icao, diames, idturno, ventana): (demanda, posiciones)}
+        # como arrays int16
+        self.series = {} if series is None else series
+        self.huellas = {} if huellas is None else huellas
+        self.firma = firma
+
+    def leer(self, icao, diames, idturno, ventana):
+        '''
+        (listademanda, listaposiciones) como getdfTrafico, o None si no
+        está en la vista
+        '''
+        serie = self.series.get((icao, diames, idturno, ventana))
+        if serie is None:
+            return None
+        demanda, posiciones = serie
+        return ([np.nan if x == SIN_DATO else float(x) for x in demanda],
+                [np.nan if x == SIN_DATO else int(x) for x in posiciones])
+
+    def guardar(self, fichero=FICHERO_VISTA):
+        claves = sorted(self.series)
+        longitudes = np.array([len(self.series[c][0]) for c in claves],
+                              dtype=np.int32)
+        inicios = (np.cumsum(longitudes) - longitudes).astype(np.int32)
+        vacio = np.zeros(0, dtype=np.int16)
+        dias = sorted(self.huellas)
+        np.savez_compressed(
+            fichero,
+            icao=np.array([c[0] for c in claves]),
+            diames=np.array([c[1] for c in claves], dtype=np.int8),
+            turno=np.array([c[2] for c in claves], dtype=np.int8),
+            ventana=np.array([c[3] for c in claves], dtype=np.int8),
+            inicio=inicios,
+            longitud=longitudes,
+            demanda=np.concatenate([self.series[c][0] for c in claves] + [vacio]),
+            posiciones=np.concatenate([self.series[c][1] for c in claves] + [vacio]),
+            huella_icao=np.array([d[0] for d in dias]),
+            huella_diames=np.array([d[1] for d in dias], dtype=np.int8),
+            huella=np.array([self.huellas[d] for d in dias]),
+            firma=np.array(self.firma))
+
+    @classmethod
+    def cargar(cls, fichero=FICHERO_VISTA):
+        with np.load(fichero) as datos:
+            demanda = datos['demanda']
+            posiciones = datos['posiciones']
+            series = {}
+            for icao, diames, turno, ventana, inicio, longitud in zip(
+                    datos['icao'].tolist(), datos['diames'].tolist(),
+                    datos['turno'].tolist(), datos['ventana'].tolist(),
+                    datos['inicio'].tolist(), datos['longitud'].tolist()):
+                series[icao, diames, turno, ventana] = (
+                    demanda[inicio:inicio + longitud],
+                    posiciones[inicio:inicio + longitud])
+            huellas = dict(zip(zip(datos['huella_icao'].tolist(),
+                                   datos['huella_diames'].tolist()),
+                               datos['huella'].tolist()))
+            return cls(series, huellas, str(datos['firma']))
+
+
+def vista_actual(fileTWR, fileTrafico, fichero=FICHERO_VISTA):
+    '''
+    Vista de fichero si existe y corresponde a los ficheros de entrada
+    actuales (firma), si no None. Se lee una sola vez por proceso
+    '''
+    if not os.path.exists(fichero):
+        return None
+    mtime = os.stat(fichero).st_mtime_ns
+    if fichero not in vistas_cargadas or vistas_cargadas[fichero][0] != mtime:
+        vistas_cargadas[fichero] = (mtime, VistaDemanda.cargar(fichero))
+    vista = vistas_cargadas[fichero][1]
+    if vista.firma != firma_ficheros(fileTWR, fileTrafico):
+        print("vista de demanda desactualizada: python myVistaDemandaCRs.py")
+        return None
+    return vista
+
+
+def calcular_series(vista, dias, dfTWR, dfTrafico, fileTWR, fileTrafico,
+                    ventanas=VENTANAS, separadorcolumnas=';'):
+    '''
+    Añade a vista las series de los (icao, diames) de dias con el tráfico
+    de dfTrafico (basta con las filas de esos días)
+    '''
+    escenarios = {}
+    for icao, diames in dias:
+        if icao not in escenarios:
+            escenarios[icao] = myInputCRs.MyEscenario(
+                icao=icao, fileTWR=fileTWR, fileTrafico=fileTrafico,
+                separadorcolumnas=separadorcolumnas, dfTWR=dfTWR,
+                dfTrafico=dfTrafico, fileVista=None)
+        mE = escenarios[icao]
+        for ventana in ventanas:
+            demandas = mE.getdemandaDia(diames, ventanaflotante=ventana)
+            for idturno, (listademanda, listaposiciones) in demandas.items():
+                vista.series[icao, diames, idturno, ventana] = (
+                    a_int16(listademanda), a_int16(listaposiciones))
+
+
+def actualizar_vista(dfNuevo, firma_previa, fileTWR, fileTrafico,
+                     fichero=FICHERO_VISTA, ventanas=VENTANAS,
+                     separadorcolumnas=';'):
+    '''
+    Tras añadir a fileTrafico las filas de dfNuevo (días completos, ver
+    myIngestaCRs) recalcula sólo sus (ICAO, día), si la vista correspondía
+    a los ficheros antes de añadir (firma_previa, ver firma_ficheros).
+    Devuelve el número de (ICAO, día) recalculados, o None si no hay vista
+    o no estaba al día (hay que refrescarla entera)
+    '''
+    if not os.path.exists(fichero):
+        return None
+    vista = VistaDemanda.cargar(fichero)
+    if vista.firma != firma_previa:
+        print("vista de demanda desactualizada: python myVistaDemandaCRs.py")
+        return None
+    dfTWR = pd.read_csv(fileTWR, sep=separadorcolumnas)
+    icaos = sorted(set(dfTWR['ICAO']) & set(dfNuevo['ICAO']))
+    huellas = huellas_dias(dfTWR, dfNuevo, icaos)
+    vista.series = {c: v for c, v in vista.series.items()
+                    if (c[0], c[1]) not in huellas}
+    calcular_series(vista, sorted(huellas), dfTWR, dfNuevo, fileTWR,
+                    fileTrafico, ventanas, separadorcolumnas)
+    vista.huellas.update(huellas)
+    vista.firma = firma_ficheros(fileTWR, fileTrafico)
+    vista.guardar(fichero)
+    vistas_cargadas.pop(fichero, None)
+    return len(huellas)
+
+
+def refrescar_vista(fileTWR='datosDependencias1.csv', fileTrafico='datos.csv',
+                    fichero=FICHERO_VISTA, ventanas=VENTANAS,
+                    separadorcolumnas=';', dias=None):
+    '''
+    Crea la vista o recalcula sólo los (ICAO, día) nuevos o con huella
+    distinta y quita los que ya no están.
+    dias: si no es None, {(icao, diames)} que se recalculan aunque no haya
+    cambiado su huella
+    Devuelve (vista, número de (ICAO, día) recalculados)
+    '''
+    dfTWR = pd.read_csv(fileTWR, sep=separadorcolumnas)
+    dfTrafico = pd.read_csv(fileTrafico, sep=separadorcolumnas)
+    icaos = sorted(set(dfTWR['ICAO']) & set(dfTrafico['ICAO']))
+    huellas = huellas_dias(dfTWR, dfTrafico, icaos)
+
+    vista = VistaDemanda()
+    if os.path.exists(fichero):
+        vista = VistaDemanda.cargar(fichero)
+    cambiados = [d for d in huellas if vista.huellas.get(d) != huellas[d] or
+                 (dias is not None and d in dias)]
+    cambiados_set = set(cambiados)
+    vista.series = {c: v for c, v in vista.series.items()
+                    if (c[0], c[1]) in huellas and
+                    (c[0], c[1]) not in cambiados_set}
+    calcular_series(vista, cambiados, dfTWR, dfTrafico, fileTWR, fileTrafico,
+                    ventanas, separadorcolumnas)
+
+    vista.huellas = huellas
+    vista.firma = firma_ficheros(fileTWR, fileTrafico)
+    vista.guardar(fichero)
+    vistas_cargadas.pop(fichero, None)
+    return vista, len(cambiados)
+
+
+if __name__ == '__main__':
+    mC = myInputConfigCRs.MyConfig()
+    t = time.time()
+    vista, recalculados = refrescar_vista(mC.fileTWR, mC.fileTrafico)
+    print("%i series, %i (ICAO, día) recalculados en %0.1f s" % (
+        len(vista.series), recalculados, time.time() - t))
@@ -17,15 +17,28 @@ from __future__ import print_function
 # módulos lectura de datos entrada
 import myInputConfigCRs # datos json configuración cálculos OR
 import myInputCRs # datos csv escenario (turnos, posiciones/capacidad, demanda)
+import myHeuristicaCRs # estadillo heurístico (vista previa, hint y respaldo)
+import myEstimadorCRs # cotas del número de ATCOS (sin solver)
+import myDiagnosticoCRs # restricciones incompatibles (infactibilidad)
+import myParadaCRs # criterio de parada (gap, sin mejora, tiempo determinista)
+import myCarreraCRs # carrera de conjuntos de parámetros de CP-SAT
+import myHistorialCRs # historial de resoluciones (SQLite)
+import myArchivoCRs # archivo de estadillos (bits empaquetados)
+import myPerfiladorCRs # perfilado de una resolución (cProfile, log CP-SAT)
+import myLNSCRs # búsqueda en vecindarios grandes (equipos grandes)
 # import myoutputCRs # escribir resultados en CSV
+import copy
+import json
 import math # ceil, floor
+import threading
+import time
 import pandas as pd
 
 from ortools.sat.python import cp_model
 
 from google.protobuf import text_format
 
-def negated_bounded_span(works, start, length):
+def negated_bounded_span(works, start, length, negated=None):
     """Filters an isolated sub-sequence of variables assined to True.
   Extract the span of Boolean variables [start, start + length), negate them,
   and if there is variables to the left/right of this span, surround the span by
@@ -34,6 +47,7 @@ def negated_bounded_span(works, start, length):
     works: a list of variables to extract the span from.
     start: the start to the span.
     length: the length of the span.
+    negated: optional list with the negation of each variable of works.
   Returns:
     a list of variables which conjunction will be false if the sub-list is
     assigned to True, and correctly bounded by variables assigned to False,
@@ -44,7 +58,10 @@ def negated_bounded_span(works, start, length):
     if start > 0:
         sequence.append(works[start - 1])
     for i in range(length):
-        sequence.append(works[start + i].Not())
+        if negated is None:
+            sequence.append(works[start + i].Not())
+        else:
+            sequence.append(negated[start + i])
     # Right border (end of works or works[start + length])
     if start + length < len(works):
         sequence.append(works[start + length])
@@ -52,7 +69,8 @@ def negated_bounded_span(works, start, length):
 
 
 def add_soft_sequence_constraint(model, works, hard_min, soft_min, min_cost,
-                                 soft_max, hard_max, max_cost, prefix):
+                                 soft_max, hard_max, max_cost, prefix,
+                                 meta=None, longitudes=None):
     """Sequence constraint on true variables with soft and hard bounds.
   This constraint look at every maximal contiguous sequence of variables
   assigned to true. If forbids sequence of length < hard_min or > hard_max.
@@ -72,26 +90,41 @@ def add_soft_sequence_constraint(model, works, hard_min, soft_min, min_cost,
       hard_max.
     max_cost: the coefficient of the linear penalty if the length is more than
       soft_max.
-    prefix: a base name for penalty literals.
+    prefix: a base name for penalty literals (None: unnamed literals).
+    meta: if not None, a (kind, start, length) tuple is appended for each
+      penalty literal.
+    longitudes: optional length in blocks of each variable of works (rejilla
+      comprimida, ver segmentos_rejilla). Lengths and starts are then
+      measured in blocks.
   Returns:
     a tuple (variables_list, coefficient_list) containing the different
     penalties created by the sequence constraint.
   """
+    if longitudes is not None:
+        return add_soft_sequence_constraint_segmentos(
+            model, works, longitudes, hard_min, soft_min, min_cost, soft_max,
+            hard_max, max_cost, prefix, meta)
     cost_literals = []
     cost_coefficients = []
+    negated = [w.Not() for w in works]
 
     # Forbid sequences that are too short.
     for length in range(1, hard_min):
         for start in range(len(works) - length + 1):
-            model.AddBoolOr(negated_bounded_span(works, start, length))
+            model.AddBoolOr(negated_bounded_span(works, start, length, negated))
 
     # Penalize sequences that are below the soft limit.
     if min_cost > 0:
         for length in range(hard_min, soft_min):
             for start in range(len(works) - length + 1):
-                span = negated_bounded_span(works, start, length)
-                name = ': under_span(start=%i, length=%i)' % (start, length)
-                lit = model.NewBoolVar(prefix + name)
+                span = negated_bounded_span(works, start, length, negated)
+                if prefix is None:
+                    lit = model.NewBoolVar('')
+                else:
+                    name = ': under_span(start=%i, length=%i)' % (start, length)
+                    lit = model.NewBoolVar(prefix + name)
+                if meta is not None:
+                    meta.append(('under_span', start, length))
                 span.append(lit)
                 model.AddBoolOr(span)
                 cost_literals.append(lit)
@@ -103,9 +136,14 @@ def add_soft_sequence_constraint(model, works, hard_min, soft_min, min_cost,
     if max_cost > 0:
         for length in range(soft_max + 1, hard_max + 1):
             for start in range(len(works) - length + 1):
-                span = negated_bounded_span(works, start, length)
-                name = ': over_span(start=%i, length=%i)' % (start, length)
-                lit = model.NewBoolVar(prefix + name)
+                span = negated_bounded_span(works, start, length, negated)
+                if prefix is None:
+                    lit = model.NewBoolVar('')
+                else:
+                    name = ': over_span(start=%i, length=%i)' % (start, length)
+                    lit = model.NewBoolVar(prefix + name)
+                if meta is not None:
+                    meta.append(('over_span', start, length))
                 span.append(lit)
                 model.AddBoolOr(span)
                 cost_literals.append(lit)
@@ -114,14 +152,65 @@ def add_soft_sequence_constraint(model, works, hard_min, soft_min, min_cost,
 
     # Just forbid any sequence of true variables with length hard_max + 1
     for start in range(len(works) - hard_max):
-        model.AddBoolOr(
-            [works[i].Not() for i in range(start, start + hard_max + 1)])
+        model.AddBoolOr(negated[start:start + hard_max + 1])
+    return cost_literals, cost_coefficients
+
+
+def add_soft_sequence_constraint_segmentos(model, works, longitudes, hard_min,
+                                           soft_min, min_cost, soft_max,
+                                           hard_max, max_cost, prefix,
+                                           meta=None):
+    """add_soft_sequence_constraint sobre segmentos de longitud variable.
+    Cada tramo works[i:j+1] rodeado de False dura la suma de sus longitudes:
+    se prohíbe si es < hard_min, se penaliza por bloque si está por debajo
+    de soft_min o por encima de soft_max y se prohíbe toda ventana de
+    segmentos que pase de hard_max. Con todas las longitudes 1 equivale a
+    add_soft_sequence_constraint.
+    """
+    cost_literals = []
+    cost_coefficients = []
+    negated = [w.Not() for w in works]
+    inicios = [0]
+    for longitud in longitudes:
+        inicios.append(inicios[-1] + longitud)
+
+    for start in range(len(works)):
+        length = 0
+        for end in range(start, len(works)):
+            length += longitudes[end]
+            if length > hard_max:
+                # ventana mínima que pasa de hard_max
+                model.AddBoolOr(negated[start:end + 1])
+                break
+            span = negated_bounded_span(works, start, end - start + 1, negated)
+            if length < hard_min:
+                model.AddBoolOr(span)
+                continue
+            if length < soft_min and min_cost > 0:
+                kind, cost = 'under_span', min_cost * (soft_min - length)
+            elif length > soft_max and max_cost > 0:
+                kind, cost = 'over_span', max_cost * (length - soft_max)
+            else:
+                continue
+            if prefix is None:
+                lit = model.NewBoolVar('')
+            else:
+                name = ': %s(start=%i, length=%i)' % (kind, inicios[start],
+                                                      length)
+                lit = model.NewBoolVar(prefix + name)
+            if meta is not None:
+                meta.append((kind, inicios[start], length))
+            span.append(lit)
+            model.AddBoolOr(span)
+            cost_literals.append(lit)
+            cost_coefficients.append(cost)
     return cost_literals, cost_coefficients
 
 
 def add_soft_sum_constraint(model, works, hard_min, soft_min, min_cost,
                             soft_max, hard_max, max_cost, prefix,
-                            myParametroControl=7):
+                            myParametroControl=7, meta=None,
+                            longitudes=None, indices=None):
     """Sum constraint with soft and hard bounds.
   This constraint counts the variables assigned to true from works.
   If forbids sum < hard_min or > hard_max.
@@ -141,103 +230,72 @@ def add_soft_sum_constraint(model, works, hard_min, soft_min, min_cost,
       hard_max.
     max_cost: the coefficient of the linear penalty if the sum is more than
       soft_max.
-    prefix: a base name for penalty variables.
+    prefix: a base name for penalty variables (None: unnamed variables).
+    meta: if not None, a (kind,) tuple is appended for each penalty variable.
+    longitudes: optional weight (length in blocks) of each variable of works
+      (rejilla comprimida).
+    indices: if not None, it receives the proto indices of the sum variable
+      ('suma') and of the soft_min/soft_max constraints ('bajo', 'sobre':
+      (constraint, delta variable)) so the bounds can be changed later
+      (actualizar_demanda).
   Returns:
     a tuple (variables_list, coefficient_list) containing the different
     penalties created by the sequence constraint.
   """
     
+    if indices is None:
+        indices = {}
     cost_variables = []
     cost_coefficients = []
     sum_var = model.NewIntVar(hard_min, hard_max, '')
+    indices.update(suma=sum_var.Index(), bajo=None, sobre=None)
     # This adds the hard constraints on the sum.
-    model.Add(sum_var == sum(works))
+    if longitudes is None:
+        model.Add(sum_var == cp_model.LinearExpr.Sum(works))
+        total = len(works)
+    else:
+        model.Add(sum_var == cp_model.LinearExpr.WeightedSum(works, longitudes))
+        total = sum(longitudes)
 
     # Penalize sums below the soft_min target.
     if soft_min > hard_min and min_cost > 0:
-        delta = model.NewIntVar(-len(works), len(works), '')
-        model.Add(delta == soft_min - sum_var)
+        delta = model.NewIntVar(-total, total, '')
+        ct = model.Add(delta == soft_min - sum_var)
+        indices['bajo'] = (ct.Index(), delta.Index())
         # TODO(user): Compare efficiency with only excess >= soft_min-sum_var.
-        excess = model.NewIntVar(0, myParametroControl, prefix + ': under_sum')
+        excess = model.NewIntVar(0, myParametroControl,
+                                 '' if prefix is None else prefix + ': under_sum')
         model.AddMaxEquality(excess, [delta, 0])
+        if meta is not None:
+            meta.append(('under_sum',))
         cost_variables.append(excess)
         cost_coefficients.append(min_cost)
 
     # Penalize sums above the soft_max target.
     if soft_max < hard_max and max_cost > 0:
         delta = model.NewIntVar(-myParametroControl, myParametroControl, '')
-        model.Add(delta == sum_var - soft_max)
-        excess = model.NewIntVar(0, myParametroControl, prefix + ': over_sum')
+        ct = model.Add(delta == sum_var - soft_max)
+        indices['sobre'] = (ct.Index(), delta.Index())
+        excess = model.NewIntVar(0, myParametroControl,
+                                 '' if prefix is None else prefix + ': over_sum')
         model.AddMaxEquality(excess, [delta, 0])
+        if meta is not None:
+            meta.append(('over_sum',))
         cost_variables.append(excess)
         cost_coefficients.append(max_cost)
 
     return cost_variables, cost_coefficients
 
 
-#def solve_shift_scheduling(params, output_proto):
-def solve_shift_scheduling(lista, traf=[]):    
-    """Solves the shift scheduling problem."""
-    
-     #escenario
-    #PENDIENTE:
-    # -seleccionar escenario 
-        #PENDIENTE: poner nombre a turnos
-    mC=myInputConfigCRs.MyConfig() #lee inputconfigCRs.json
-    
-#    myAD='LEMD_DCL'
-#    myturno=0
-#    mydiames=15 #SEGÚN FORMATO FICHERO TRAFICO
-    myAD=lista[0]
-    myturno=lista[2]
-    mydiames=lista[5].day
-    mynummes=lista[5].month
-    myfileTWR=mC.fileTWR
-    myfileTrafico=mC.fileTrafico
-    mE=myInputCRs.MyEscenario(icao=myAD,fileTWR=myfileTWR,
-                 fileTrafico=myfileTrafico) #lee datosDependencias
-    
-    # input Config
-    if mC.num_hours==0:
-        #si 0 lee el turno
-        mC.num_hours=mE.duracionturnos.iloc[myturno]
-    
-    num_employees=lista[1]
-    
-    print(myAD)
-    print("shift:",myturno)
-    if len(mC.hourly_cover_demands)==0:
-        print("day:", mydiames, "/" , mynummes)
-    
-    num_hours=mC.num_hours # 8 hours = duración turno
-    print("num_hours",num_hours)
-        
-    demand_interval_length=lista[4]
-    intervals_per_hour=int(60/demand_interval_length)
-    num_demandintervals=int(num_hours*intervals_per_hour)
-    
-    block_length=lista[3] # 5  minutes
-    blocks_per_hour = int(60/block_length) # equivale a days/week=7
-    blocks_per_interval=int(demand_interval_length/block_length)
-    num_blocks = int(num_hours * blocks_per_hour) # bloques (ej. 15 minutos)
-    
-    #25% 
-    min_daily_sum_offblocks=math.ceil(mC.min_daily_sum_off*num_blocks)
-    print("min_daily_sum_offblocks",min_daily_sum_offblocks)
-    shifts = mC.shifts # ['O', 'F', 'b'] # off, FRQ, Brief
-    
-    if len(mC.label_hours)==blocks_per_hour:
-        label_hours=mC.label_hours
-    else:
-        label_hours = [
-                str(i*block_length) for i in range(blocks_per_hour)
-            ] # '00 15 30 45 '
-        
-    myheader=" ".join(label_hours) + "  "
-    
-    
-    # Demanda posiciones del inputconfigCRs.json (mC.hourly_cover_demands)
-    # o a partir de la demanda de tráfico
+def cargar_demanda(mC, mE, myturno, mydiames, demand_interval_length,
+                   block_length, traf=[]):
+    '''
+    Demanda de posiciones y de tráfico por intervalo del turno.
+    Del inputconfigCRs.json (mC.hourly_cover_demands) o a partir de la 
+    demanda de tráfico (getdfTrafico). traf: demanda por hora modificada
+    a mano en app.py
+    Devuelve (listademanda, listaposiciones) o un mensaje de error (str)
+    '''
     listaposiciones=[]
     listademanda=[]
     if len(mC.hourly_cover_demands)>0:
@@ -250,25 +308,11 @@ def solve_shift_scheduling(lista, traf=[]):
     else:
         # demand_interval_length=15' p.ej
         print('usa getdfTwr()')
-
-        
-
-        if traf != []:
-            (listademanda,listaposiciones) = mE.getdfTrafico(
-                diames=mydiames,
-                idturno=myturno,
-                ventanaflotante=demand_interval_length,
-                TRAF = traf)
-            # listademanda = traf
-            # listaposiciones = listas[1]
-        else:
-            (listademanda,listaposiciones) = mE.getdfTrafico(
-                diames=mydiames,
-                idturno=myturno,
-                ventanaflotante=demand_interval_length,
-                TRAF = [])
-            # listademanda = listas[0] 
-            # listaposiciones = listas[1]           
+        (listademanda,listaposiciones) = mE.getdfTrafico(
+            diames=mydiames,
+            idturno=myturno,
+            ventanaflotante=demand_interval_length,
+            TRAF = traf)
         
         if len(listademanda)==0:
             print("No hay datos de demanda")
@@ -281,46 +325,43 @@ def solve_shift_scheduling(lista, traf=[]):
             msg3 = "No hay datos de posiciones"
             return msg3
         print(mC.shifts,listademanda,listaposiciones)
+    return listademanda,listaposiciones
+
+
+def preparar_problema(mC, num_employees, num_hours, block_length,
+                      demand_interval_length, listademanda, listaposiciones,
+                      capacidad_segun_posiciones, posiciones_segun_movimientos):
+    '''
+    Traduce la configuración (minutos) y la demanda a bloques y calcula
+    el reparto equilibrado (even_shifts) y las daily_sum_constraints.
+    Devuelve un diccionario con todos los datos del problema, o un 
+    mensaje de error (str) si el número de ATCOS es insuficiente.
+    '''
+    print("num_hours",num_hours)
         
+    intervals_per_hour=int(60/demand_interval_length)
+    num_demandintervals=int(num_hours*intervals_per_hour)
+    
+    blocks_per_hour = int(60/block_length) # equivale a days/week=7
+    blocks_per_interval=int(demand_interval_length/block_length)
+    num_blocks = int(num_hours * blocks_per_hour) # bloques (ej. 15 minutos)
+    
+    #25% 
+    min_daily_sum_offblocks=math.ceil(mC.min_daily_sum_off*num_blocks)
+    print("min_daily_sum_offblocks",min_daily_sum_offblocks)
+    shifts = mC.shifts # ['O', 'F', 'b'] # off, FRQ, Brief
+    
     # según demanda posiciones ó tráfico (pasar a int)
-    mC.hourly_cover_demands=[[int(x)] for x in listaposiciones] #[[0],[1],...]
-    mC.hourly_traffic_demands=[[int(x)] for x in listademanda] #[[0],[12],...]  
-        
+    hourly_cover_demands=[[int(x)] for x in listaposiciones] #[[0],[1],...]
+    hourly_traffic_demands=[[int(x)] for x in listademanda] #[[0],[12],...]  
     
     # lista [1,1,1,..,2,...]  id=movtos. self.pos[12]=numpos con cap>=12
-    capacidad_segun_posiciones=mE.cap
-    posiciones_segun_movimientos=mE.pos
     maxcap=len(posiciones_segun_movimientos) #número posiciones por cada valor 
     # de movimientos [1,1,...,10] de x=0 ... 100 (maxcap)   
     
-    # Fixed assignment: [employee, shift, block].
-    # This fixes the first 2 days of the schedule.
-    #[
-    #    [0, 0, 0],
-    #    [1, 0, 0],
-    #    [2, 1, 0],
-    #]
-    fixed_assignments=mC.fixed_assignments
-
-    # Request: [employee, shift, day, weight]
-    # A negative weight indicates that the employee desire this assignment.
-    #[
-        # Employee 2 wants the first Saturday off.
-        # [2, 0, 5, -2]
-    #]
-    requests = mC.requests
-    
-
     # Shift constraints on continuous sequence :
     #     (shift, hard_min, soft_min, min_penalty,
     #             soft_max, hard_max, max_penalty)
-    #        [
-#            # One or two consecutive days of rest (s=0), this is a hard constraint.
-#            (0, 1, 1, 0, 2, 2, 0),
-#           # betweem 2 and 3 consecutive days of night shifts (s=3), 1 and 4 are
-#           # possible but penalized.
-#            (3, 1, 2, 20, 3, 4, 5),
-#        ]
     # hard/soft min/max in minutes => translate to blocks
     shift_constraints=[]
     for x in mC.shift_constraints:
@@ -330,57 +371,17 @@ def solve_shift_scheduling(lista, traf=[]):
                                   math.ceil(x[4]/block_length),
                                   math.ceil(x[5]/block_length),x[6]
                                   ])
-         
-    
 
     # daily sum constraints on shifts days:
     #     (shift, hard_min, soft_min, min_penalty,
     #             soft_max, hard_max, max_penalty)
-    #        # Constraints on rests per week.
-#        
-#    #        (0, 1, 2, 7, 2, 3, 4),
-#            # At least 1 night shift per week (penalized). At most 4 (hard).
-#    #        (3, 0, 1, 3, 4, 4, 0),
-#            # At least 1 freq shift per hour (penalized). At most 17=85' (hard)
-#            (1, 0, 3, 3, 17, 17, 0),
-#        ]
-    daily_sum_constraints = mC.daily_sum_constraints
-#    
-
-    # Penalized transitions:
-    #     (previous_shift, next_shift, penalty (0 means forbidden))
-    #[
-#            # Afternoon to night has a penalty of 4.
-#    #        (2, 3, 4),
-#            # off -> Freq is forbidden.
-#           (0, 1, 0),
-#           #briefing -> off is forbidden.
-#           (2, 0, 0)
-#        ]
-    penalized_transitions=mC.penalized_transitions
-#        
-
-    # daily demands for work shifts (morning, afternon, night) for each day
-    # of the week starting on Monday.
-    #     [        
-#        [1,0],  # Monday
-#        [1,0],  # Wednesday
-#        [1,0],  # Thursday
-#        [1,0],  # Friday
-#    ]
-    # OJO: por intervalo h=1 ...num_demandintervals
-    hourly_cover_demands = mC.hourly_cover_demands
-    hourly_traffic_demands = mC.hourly_traffic_demands 
+    daily_sum_constraints = [list(x) for x in mC.daily_sum_constraints]
+    
     if len(mC.hourly_cover_demands)==0:
         print("TRAFFIC_DEMAND",hourly_traffic_demands)
     # BOOKMARK. 
     # PENDIENTE CONTROLAR pos_demand=max(hourly_cover_demands)>num_employees
     
-    
-    # Penalty for exceeding the cover constraint per shift type.
-    #[5,1]
-    excess_cover_penalties=mC.excess_cover_penalties
-       
     # Penalty for exceeding the evenly daily shifts constraint per shift type.
     #[10,10]
     evenly_penalties=mC.evenly_penalties
@@ -389,56 +390,6 @@ def solve_shift_scheduling(lista, traf=[]):
     
     num_shifts = len(shifts)
     
-    #parámetro ganancia para evaluar opciones
-    myParametroControl=mC.parametroControl #7
-    #time limit in seconds
-    max_time_in_seconds = mC.max_time_in_seconds
-    #True (=1): fuerza que se cubra la demanda, 
-        # aunque se incumpla daily_sum_constraints
-    match_full_demand=mC.match_full_demand
-    if match_full_demand==True:
-        print("match_full_demand")
-        
-    model = cp_model.CpModel()
-    
-    work = {}
-    for e in range(num_employees):
-        for s in range(num_shifts):
-            for b in range(num_blocks):
-                work[e, s, b] = model.NewBoolVar('work%i_%i_%i' % (e, s, b))
-    
-    # Linear terms of the objective in a minimization context.
-    obj_int_vars = []
-    obj_int_coeffs = []
-    obj_bool_vars = []
-    obj_bool_coeffs = []
-
-    # Exactly one shift per day.
-    for e in range(num_employees):
-        for b in range(num_blocks):
-            model.Add(sum(work[e, s, b] for s in range(num_shifts)) == 1)
-
-    # Fixed assignments.
-    for e, s, b in fixed_assignments:
-        model.Add(work[e, s, b] == 1)
-
-    # Employee requests
-    for e, s, b, h in requests:
-        obj_bool_vars.append(work[e, s, b])
-        obj_bool_coeffs.append(h)
-
-    # Shift constraints
-    for ct in shift_constraints:
-        shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
-        for e in range(num_employees):
-            works = [work[e, shift, b] for b in range(num_blocks)]
-            variables, coeffs = add_soft_sequence_constraint(
-                model, works, hard_min, soft_min, min_cost, soft_max, hard_max,
-                max_cost, 'shift_constraint(employee %i, shift %i)' % (e,
-                                                                       shift))
-            obj_bool_vars.extend(variables)
-            obj_bool_coeffs.extend(coeffs)
-
     # daily sum constraints
     #including Assign shifts evenly: se añade como dailysumconstraint
     
@@ -505,23 +456,249 @@ def solve_shift_scheduling(lista, traf=[]):
     
     #FIN PRUEBA
     
-    for ct in daily_sum_constraints:
+    #True (=1): fuerza que se cubra la demanda, 
+        # aunque se incumpla daily_sum_constraints
+    match_full_demand=mC.match_full_demand
+    if match_full_demand==True:
+        print("match_full_demand")
+
+    return {
+        'num_employees': num_employees,
+        'num_hours': num_hours,
+        'block_length': block_length,
+        'demand_interval_length': demand_interval_length,
+        'num_demandintervals': num_demandintervals,
+        'blocks_per_interval': blocks_per_interval,
+        'num_blocks': num_blocks,
+        'min_daily_sum_offblocks': min_daily_sum_offblocks,
+        'min_daily_sum_off': mC.min_daily_sum_off,
+        'shifts': shifts,
+        'num_shifts': num_shifts,
+        'listademanda': listademanda,
+        'listaposiciones': listaposiciones,
+        'hourly_cover_demands': hourly_cover_demands,
+        'hourly_traffic_demands': hourly_traffic_demands,
+        'capacidad_segun_posiciones': capacidad_segun_posiciones,
+        'maxcap': maxcap,
+        # Fixed assignment: [employee, shift, block].
+        'fixed_assignments': [list(x) for x in mC.fixed_assignments],
+        # Request: [employee, shift, block, weight]
+        # A negative weight indicates that the employee desire this assignment.
+        'requests': mC.requests,
+        'shift_constraints': shift_constraints,
+        'daily_sum_constraints': daily_sum_constraints,
+        # Penalized transitions:
+        #     (previous_shift, next_shift, penalty (0 means forbidden))
+        'penalized_transitions': mC.penalized_transitions,
+        # Penalty for exceeding the cover constraint per shift type.
+        'excess_cover_penalties': mC.excess_cover_penalties,
+        #parámetro ganancia para evaluar opciones
+        'myParametroControl': mC.parametroControl, #7
+        #time limit in seconds
+        'max_time_in_seconds': mC.max_time_in_seconds,
+        # criterio de parada: gaps, tiempo sin mejora, tiempo determinista
+        'parada': myParadaCRs.politica_parada(mC),
+        'match_full_demand': match_full_demand,
+        # penalización por posición sin cubrir con match_full_demand=0
+        'deficit_cover_penalty': mC.deficit_cover_penalty,
+        # sin nombres de variables (producción)
+        'modelo_ligero': mC.modelo_ligero,
+        # diagnóstico de infactibilidad antes de resolver (myDiagnosticoCRs)
+        'diagnostico': mC.diagnostico,
+        'max_time_diagnostico': mC.max_time_diagnostico,
+        # diagnóstico también con los límites blandos como duros
+        'diagnostico_blandos': mC.diagnostico_blandos,
+        # carrera de conjuntos de parámetros de CP-SAT (myCarreraCRs)
+        'carrera': mC.carrera,
+        # búsqueda en vecindarios grandes en lugar de CP-SAT (myLNSCRs)
+        'lns': mC.lns,
+        # parámetros de CP-SAT en texto (inputconfigCRs.json o perfil del AD)
+        'parametros_solver': mC.parametros_solver,
+        # registrar la resolución en historialCRs.sqlite (myHistorialCRs)
+        'historial': mC.historial,
+        # guardar el estadillo en archivoCRs.bin (myArchivoCRs)
+        'archivo': mC.archivo,
+        # rejilla comprimida (segmentos_rejilla), longitud máxima en bloques
+        'rejilla_comprimida': mC.rejilla_comprimida,
+        'segmento_maximo': max(1, int(mC.segmento_maximo // block_length)),
+    }
+
+
+def nombre_penalizacion(info):
+    '''
+    Nombre legible de un término de la función objetivo a partir de sus
+    metadatos (obj_bool_info/obj_int_info de construir_modelo):
+    (tipo, empleado, turno, detalle)
+    '''
+    tipo, e, s, detalle = info
+    if tipo in ('shift_constraint', 'daily_sum_constraint'):
+        nombre = '%s(employee %i, shift %i): %s' % (tipo, e, s, detalle[0])
+        if len(detalle) > 1:
+            nombre += '(start=%i, length=%i)' % detalle[1:]
+        return nombre
+    if tipo == 'transition':
+        return 'transition (employee=%i, block=%i)' % (e, detalle[0])
+    if tipo in ('excess_pos_demand', 'deficit_pos_demand'):
+        return '%s(shift=%i, block=%i)' % (tipo, s, detalle[0])
+    return 'request(employee=%i, shift=%i, block=%i)' % (e, s, detalle[0])
+
+
+def segmentos_rejilla(problema):
+    '''
+    Rejilla del modelo: [(bloque inicial, longitud en bloques), ...].
+    Sin problema['rejilla_comprimida'] un segmento por bloque. Con ella cada
+    tramo de bloques consecutivos con la misma demanda de posiciones
+    (hourly_cover_demands) se parte en su primer bloque, segmentos de hasta
+    problema['segmento_maximo'] bloques y su último bloque (los bordes
+    sueltos permiten ajustar las sumas y los cambios de demanda). Los
+    bloques con asignación fija o petición quedan aislados para que sigan
+    siendo exactas.
+    '''
+    num_blocks=problema['num_blocks']
+    if not problema.get('rejilla_comprimida', False):
+        return [(b, 1) for b in range(num_blocks)]
+    blocks_per_interval=problema['blocks_per_interval']
+    hourly_cover_demands=problema['hourly_cover_demands']
+    maximo=max(1, problema.get('segmento_maximo', 1))
+    cortes=set()
+    for x in problema['fixed_assignments'] + list(problema['requests']):
+        cortes.update((x[2], x[2] + 1))
+    cortes.update((problema.get('bajas') or {}).values())
+
+    def demanda(b):
+        return hourly_cover_demands[min(b // blocks_per_interval,
+                                        len(hourly_cover_demands) - 1)]
+
+    # tramos de demanda constante
+    tramos=[]
+    inicio=0
+    for b in range(1, num_blocks + 1):
+        if b == num_blocks or b in cortes or demanda(b) != demanda(inicio):
+            tramos.append((inicio, b))
+            inicio=b
+
+    segmentos=[]
+    for inicio, fin in tramos:
+        if fin - inicio > 2:
+            segmentos.append((inicio, 1))
+            for b in range(inicio + 1, fin - 1, maximo):
+                segmentos.append((b, min(maximo, fin - 1 - b)))
+            segmentos.append((fin - 1, 1))
+        else:
+            segmentos.extend((b, 1) for b in range(inicio, fin))
+    return segmentos
+
+
+def construir_base(problema):
+    '''
+    Parte del modelo de construir_modelo que no depende de la demanda ni
+    del reparto equilibrado: variables work, un turno por bloque,
+    asignaciones fijas, peticiones, bajas, estado inicial,
+    shift_constraints y transiciones (ver CLAVES_BASE). Devuelve un
+    diccionario con el modelo, work, los segmentos y los términos
+    booleanos de la función objetivo
+    '''
+    ligero=problema.get('modelo_ligero', False)
+    num_employees=problema['num_employees']
+    num_shifts=problema['num_shifts']
+    num_blocks=problema['num_blocks']
+
+    segmentos=segmentos_rejilla(problema)
+    # longitudes solo si la rejilla no es uniforme
+    longitudes=None
+    if len(segmentos) < num_blocks:
+        longitudes=[longitud for inicio, longitud in segmentos]
+    
+    model = cp_model.CpModel()
+    
+    work = {}
+    for e in range(num_employees):
+        for s in range(num_shifts):
+            for inicio, longitud in segmentos:
+                if ligero:
+                    var = model.NewBoolVar('')
+                else:
+                    var = model.NewBoolVar('work%i_%i_%i' % (e, s, inicio))
+                for b in range(inicio, inicio + longitud):
+                    work[e, s, b] = var
+    
+    # Linear terms of the objective in a minimization context.
+    # *_info: metadatos (tipo, empleado, turno, detalle) de cada término
+    obj_bool_vars = []
+    obj_bool_coeffs = []
+    obj_bool_info = []
+
+    # Exactly one shift per day.
+    for e in range(num_employees):
+        for b, longitud in segmentos:
+            model.AddExactlyOne([work[e, s, b] for s in range(num_shifts)])
+
+    # Fixed assignments.
+    for e, s, b in problema['fixed_assignments']:
+        model.Add(work[e, s, b] == 1)
+
+    # Employee requests
+    for e, s, b, h in problema['requests']:
+        obj_bool_vars.append(work[e, s, b])
+        obj_bool_coeffs.append(h)
+        obj_bool_info.append(('request', e, s, (b,)))
+
+    # Bajas {empleado: primer bloque fuera} (myReparacionCRs): desde ese
+    # bloque el empleado está en descanso y no se le aplican las shift ni
+    # las daily_sum constraints
+    bajas=problema.get('bajas') or {}
+    for e, corte in bajas.items():
+        for b in range(corte, num_blocks):
+            model.Add(work[e, 0, b] == 1)
+
+    # Estado inicial (horizonte rodante): la secuencia con la que termina
+    # cada empleado la ventana anterior se antepone como constantes,
+    # así las shift_constraints tienen en cuenta lo ya trabajado/descansado
+    estado_inicial=problema.get('estado_inicial')
+    prefijo={}
+    if estado_inicial is not None:
+        for e, (shift_previo, racha) in enumerate(estado_inicial[:num_employees]):
+            for s in range(num_shifts):
+                prefijo[e, s]=[model.NewConstant(int(s == shift_previo))]*racha
+
+    # Shift constraints
+    for ct in problema['shift_constraints']:
         shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
         for e in range(num_employees):
-                works = [work[e, shift, b] 
-                            for b in range(num_blocks)]
-                variables, coeffs = add_soft_sum_constraint(
-                    model, works, hard_min, soft_min, min_cost, soft_max,
-                    hard_max, max_cost,
-                    'daily_sum_constraint(employee %i, shift %i)' %
-                    (e, shift),myParametroControl)
-                obj_int_vars.extend(variables)
-                obj_int_coeffs.extend(coeffs)
+            if e in bajas:
+                continue
+            works = [work[e, shift, b] for b, longitud in segmentos]
+            works = prefijo.get((e, shift), []) + works
+            if longitudes is not None:
+                longitudes_e = [1] * (len(works) - len(segmentos)) + longitudes
+            else:
+                longitudes_e = None
+            meta = []
+            variables, coeffs = add_soft_sequence_constraint(
+                model, works, hard_min, soft_min, min_cost, soft_max, hard_max,
+                max_cost, None if ligero else
+                'shift_constraint(employee %i, shift %i)' % (e, shift), meta,
+                longitudes_e)
+            obj_bool_vars.extend(variables)
+            obj_bool_coeffs.extend(coeffs)
+            obj_bool_info.extend(('shift_constraint', e, shift, m) for m in meta)
 
     # Penalized transitions
-    for previous_shift, next_shift, cost in penalized_transitions:
+    for previous_shift, next_shift, cost in problema['penalized_transitions']:
         for e in range(num_employees):
-            for b in range(num_blocks - 1):
+            if longitudes is not None and previous_shift == next_shift:
+                # transiciones dentro de un segmento (longitud - 1)
+                for inicio, longitud in segmentos:
+                    if longitud == 1:
+                        continue
+                    if cost == 0:
+                        model.Add(work[e, previous_shift, inicio] == 0)
+                    else:
+                        obj_bool_vars.append(work[e, previous_shift, inicio])
+                        obj_bool_coeffs.append(cost * (longitud - 1))
+                        obj_bool_info.append(('transition', e, None, (inicio,)))
+            for inicio, longitud in segmentos[1:]:
+                b = inicio - 1 # último bloque del segmento anterior
                 transition = [
                     work[e, previous_shift, b].Not(),
                     work[e, next_shift, b + 1].Not()
@@ -529,182 +706,881 @@ def solve_shift_scheduling(lista, traf=[]):
                 if cost == 0:
                     model.AddBoolOr(transition)
                 else:
-                    trans_var = model.NewBoolVar(
-                        'transition (employee=%i, block=%i)' % (e, b))
+                    if ligero:
+                        trans_var = model.NewBoolVar('')
+                    else:
+                        trans_var = model.NewBoolVar(
+                            'transition (employee=%i, block=%i)' % (e, b))
                     transition.append(trans_var)
                     model.AddBoolOr(transition)
                     obj_bool_vars.append(trans_var)
                     obj_bool_coeffs.append(cost)
+                    obj_bool_info.append(('transition', e, None, (b,)))
 
-    # Cover constraints
-    # PRUEBA
-    # PRUEBA
-    # capacidad disponible
-    mycap_pos=[model.NewConstant(0)] 
-    for x in capacidad_segun_posiciones:        # [12,20,34]
-        mycap_pos.append(model.NewConstant(x))  # [0,12,20,34] 0pos=0Cap
-    print("mycap_pos",mycap_pos)
-    #
-    #PRUEBA
-    valorCero=model.NewConstant(0) #auxiliar cte=0
+    return {
+        'model': model,
+        'work': work,
+        'segmentos': segmentos,
+        'longitudes': longitudes,
+        'obj_bool_vars': obj_bool_vars,
+        'obj_bool_coeffs': obj_bool_coeffs,
+        'obj_bool_info': obj_bool_info,
+    }
+
+
+# claves del problema de las que depende construir_base (además de los
+# segmentos de la rejilla)
+CLAVES_BASE = ('num_employees', 'num_shifts', 'num_blocks', 'block_length',
+               'fixed_assignments', 'requests', 'shift_constraints',
+               'penalized_transitions', 'estado_inicial', 'bajas',
+               'modelo_ligero')
+
+cerrojo_bases = threading.Lock()
+
+
+def clave_base(problema):
+    '''
+    Texto que identifica la base del modelo de problema (CLAVES_BASE y
+    segmentos de la rejilla)
+    '''
+    datos = {clave: problema.get(clave) for clave in CLAVES_BASE}
+    datos['segmentos'] = segmentos_rejilla(problema)
+    return json.dumps(datos, sort_keys=True, default=str)
+
+
+def copiar_base(base):
+    '''
+    Copia de una base de construir_base con sus variables en el modelo
+    nuevo (la base no se modifica y puede compartirse entre hilos)
+    '''
+    model = cp_model.CpModel()
+    model.CopyFrom(base['model'])
+    variables = {}
+
+    def variable(var):
+        if var.Index() not in variables:
+            variables[var.Index()] = model.GetBoolVarFromProtoIndex(
+                var.Index())
+        return variables[var.Index()]
+
+    return {
+        'model': model,
+        'work': {clave: variable(var) for clave, var in base['work'].items()},
+        'segmentos': base['segmentos'],
+        'longitudes': base['longitudes'],
+        'obj_bool_vars': [variable(var) for var in base['obj_bool_vars']],
+        'obj_bool_coeffs': list(base['obj_bool_coeffs']),
+        'obj_bool_info': list(base['obj_bool_info']),
+    }
+
+
+def construir_modelo(problema, pistas=None, bases=None):
+    '''
+    Crea el modelo CP-SAT del problema (ver preparar_problema).
+    pistas: estadillo [empleado][bloque] = turno que se pasa como hint
+    Si problema['modelo_ligero'] las variables no llevan nombre (más rápido
+    y menos memoria); los metadatos de las penalizaciones se guardan
+    siempre en obj_bool_info/obj_int_info (ver nombre_penalizacion).
+    Con problema['rejilla_comprimida'] hay una variable por segmento de
+    segmentos_rejilla y las restricciones de secuencia, suma y cobertura
+    se escriben con la longitud de cada segmento; work[e, s, b] sigue
+    existiendo para cada bloque (la variable de su segmento).
+    bases: diccionario {clave_base: construir_base} compartido entre
+    resoluciones del mismo escenario (myBarridoCRs): la base se construye
+    una vez y cada resolución añade a una copia sólo las sumas, la
+    cobertura y la función objetivo.
+    Devuelve un diccionario con el modelo, las variables work[e, s, b], 
+    los términos de la función objetivo y dónde está la demanda en el 
+    proto ('cobertura', 'sumas'; ver actualizar_demanda).
+    '''
+    ligero=problema.get('modelo_ligero', False)
+    num_employees=problema['num_employees']
+    num_shifts=problema['num_shifts']
+    num_blocks=problema['num_blocks']
+    num_demandintervals=problema['num_demandintervals']
+    blocks_per_interval=problema['blocks_per_interval']
+    hourly_cover_demands=problema['hourly_cover_demands']
+    excess_cover_penalties=problema['excess_cover_penalties']
+    match_full_demand=problema['match_full_demand']
+    myParametroControl=problema['myParametroControl']
+    deficit_cover_penalty=problema.get('deficit_cover_penalty', 0)
+    
+    if bases is None:
+        base=construir_base(problema)
+    else:
+        clave=clave_base(problema)
+        with cerrojo_bases:
+            if clave not in bases:
+                bases[clave]=construir_base(problema)
+        base=copiar_base(bases[clave])
+    model=base['model']
+    work=base['work']
+    segmentos=base['segmentos']
+    longitudes=base['longitudes']
+    bajas=problema.get('bajas') or {}
     
+    # Linear terms of the objective in a minimization context.
+    # *_info: metadatos (tipo, empleado, turno, detalle) de cada término
+    obj_int_vars = []
+    obj_int_coeffs = []
+    obj_int_info = []
+    obj_bool_vars = base['obj_bool_vars']
+    obj_bool_coeffs = base['obj_bool_coeffs']
+    obj_bool_info = base['obj_bool_info']
+
+    # sumas: (posición en daily_sum_constraints, índices en el proto)
+    sumas=[]
+    for i, ct in enumerate(problema['daily_sum_constraints']):
+        shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
+        for e in range(num_employees):
+                if e in bajas:
+                    continue
+                works = [work[e, shift, b] 
+                            for b, longitud in segmentos]
+                meta = []
+                indices = {}
+                variables, coeffs = add_soft_sum_constraint(
+                    model, works, hard_min, soft_min, min_cost, soft_max,
+                    hard_max, max_cost, None if ligero else
+                    'daily_sum_constraint(employee %i, shift %i)' %
+                    (e, shift),myParametroControl, meta, longitudes,
+                    indices)
+                sumas.append((i, indices))
+                obj_int_vars.extend(variables)
+                obj_int_coeffs.extend(coeffs)
+                obj_int_info.extend(('daily_sum_constraint', e, shift, m)
+                                    for m in meta)
+
+    # Cover constraints
+    # cobertura: índices en el proto de cada (turno, bloque) (worked, 
+    # excess y su igualdad, deficit)
+    cobertura=[]
     for s in range(1, num_shifts): # Ignore Off shift.
-        demoras=[]
-        for h in range(num_demandintervals):
-            for b in range(blocks_per_interval):
-                
-                timeblock=h * blocks_per_interval + b
-                works = [work[e, s, timeblock] 
-                            for e in range(num_employees)]
-                #prueba 
-                pos_demand = hourly_cover_demands[h][s - 1] #demanda por hora
-                if len(hourly_traffic_demands)>0:
-                    traffic_demand = hourly_traffic_demands[h][s - 1]
-                
-                #limitado entre 0 y pos_demand
-                worked = model.NewIntVar(0,pos_demand, '')
-                model.Add(worked == sum(works))
-                over_penalty = excess_cover_penalties[s - 1]
-                
-                if over_penalty > 0:
-                    #PRUEBA: demanda posiciones
+        for timeblock, longitud in segmentos:
+            h = timeblock // blocks_per_interval
+            works = [work[e, s, timeblock] 
+                        for e in range(num_employees)]
+            pos_demand = hourly_cover_demands[h][s - 1] #demanda por hora
+            
+            #limitado entre 0 y pos_demand
+            worked = model.NewIntVar(0,pos_demand, '')
+            model.Add(worked == cp_model.LinearExpr.Sum(works))
+            over_penalty = excess_cover_penalties[s - 1]
+            indices = {'turno': s, 'bloque': timeblock,
+                       'worked': worked.Index(), 'excess': None,
+                       'igualdad': None, 'deficit': None}
+            cobertura.append(indices)
+            
+            if over_penalty > 0:
+                #PRUEBA: demanda posiciones
+                if ligero:
+                    name = ''
+                else:
                     name = 'excess_pos_demand(shift=%i, block=%i)' % (
                             s, timeblock)
-                    
-                    if match_full_demand:
-                        # ajusta exactamente a la demanda (sin importar descanso)
-                        param_mindemand=0
-                    else:
-                        # permite menos posiciones que demanda
-                        param_mindemand=-pos_demand
                 
-                    # BOOKMARK. PENDIENTE CONTROLAR pos_demand>num_employees
-                    excess = model.NewIntVar(
-                            param_mindemand, 
-                            num_employees - pos_demand,
-                            name)
-                    
-                    model.Add(excess == worked - pos_demand)
-                    obj_int_vars.append(excess)
-                    obj_int_coeffs.append(over_penalty)
-                    
-#                    PRUEBA: demanda tráfico
-                    if len(hourly_traffic_demands)>0:
-                        capacity=model.NewIntVar(0,maxcap,'')
-#                        #worked=num posiciones
-#                        #capacity=mycap_pos[worked]
-                        model.AddElement(worked, mycap_pos, capacity) 
-                        name = 'excess_traf_demand(shift=%i, block=%i)' % (
-                            s, timeblock)
+                if match_full_demand:
+                    # ajusta exactamente a la demanda (sin importar descanso)
+                    param_mindemand=0
+                else:
+                    # permite menos posiciones que demanda
+                    param_mindemand=-pos_demand
+            
+                # BOOKMARK. PENDIENTE CONTROLAR pos_demand>num_employees
+                excess = model.NewIntVar(
+                        param_mindemand, 
+                        num_employees - pos_demand,
+                        name)
+                
+                igualdad = model.Add(excess == worked - pos_demand)
+                indices['excess'] = excess.Index()
+                indices['igualdad'] = igualdad.Index()
+                obj_int_vars.append(excess)
+                # el exceso se paga en cada bloque del segmento
+                obj_int_coeffs.append(over_penalty * longitud)
+                obj_int_info.append(('excess_pos_demand', None, s,
+                                     (timeblock,)))
+
+                if deficit_cover_penalty > 0 and not match_full_demand:
+                    # posiciones sin cubrir (el exceso negativo resta)
+                    if ligero:
+                        name = ''
+                    else:
+                        name = 'deficit_pos_demand(shift=%i, block=%i)' % (
+                                s, timeblock)
+                    deficit = model.NewIntVar(0, pos_demand, name)
+                    model.Add(deficit >= -excess)
+                    indices['deficit'] = deficit.Index()
+                    obj_int_vars.append(deficit)
+                    obj_int_coeffs.append(deficit_cover_penalty * longitud)
+                    obj_int_info.append(('deficit_pos_demand', None, s,
+                                         (timeblock,)))
     # Objective
-    model.Minimize(
-        sum(obj_bool_vars[i] * obj_bool_coeffs[i]
-            for i in range(len(obj_bool_vars)))
-        + sum(obj_int_vars[i] * obj_int_coeffs[i]
-              for i in range(len(obj_int_vars))))
-
-    # Solve the model.
-    solver = cp_model.CpSolver()
-    # Sets a time limit of XX seconds.
-    solver.parameters.max_time_in_seconds = max_time_in_seconds
-    # Specify the number of parallel workers to use during search.
-    solver.parameters.num_search_workers = num_employees 
+    model.Minimize(cp_model.LinearExpr.WeightedSum(
+        obj_bool_vars + obj_int_vars, obj_bool_coeffs + obj_int_coeffs))
+
+    modelo = {
+        'model': model,
+        'work': work,
+        'segmentos': segmentos,
+        'obj_int_vars': obj_int_vars,
+        'obj_int_coeffs': obj_int_coeffs,
+        'obj_int_info': obj_int_info,
+        'obj_bool_vars': obj_bool_vars,
+        'obj_bool_coeffs': obj_bool_coeffs,
+        'obj_bool_info': obj_bool_info,
+        'cobertura': cobertura,
+        'sumas': sumas,
+    }
+    poner_pistas(problema, modelo, pistas)
+    return modelo
+
+
+def poner_pistas(problema, modelo, pistas):
+    '''
+    Sustituye el hint del modelo por el estadillo pistas [empleado][bloque]
+    = turno (None = sin hint)
+    '''
+    model=modelo['model']
+    work=modelo['work']
+    model.ClearHints()
+    if pistas is None:
+        return
+    for e in range(min(problema['num_employees'], len(pistas))):
+        for b, longitud in modelo['segmentos']:
+            if b >= len(pistas[e]):
+                break
+            for s in range(problema['num_shifts']):
+                model.AddHint(work[e, s, b], int(pistas[e][b] == s))
+
+
+def poner_supuestos(modelo, supuestos):
+    '''
+    Sustituye los supuestos (assumptions) del modelo por las asignaciones
+    [empleado, turno, bloque] de supuestos (None = sin supuestos)
+    '''
+    model=modelo['model']
+    model.ClearAssumptions()
+    if supuestos:
+        # con rejilla comprimida varios bloques comparten variable
+        literales = {}
+        for e, s, b in supuestos:
+            var = modelo['work'][e, s, b]
+            literales[var.Index()] = var
+        model.AddAssumptions([literales[i] for i in sorted(literales)])
+
+
+# claves del problema que no cambian el modelo (sólo cómo se resuelve) y
+# las que dependen de la demanda (las cambia actualizar_demanda)
+CLAVES_RESOLUCION = ('max_time_in_seconds', 'parada', 'diagnostico',
+                     'max_time_diagnostico', 'diagnostico_blandos',
+                     'carrera', 'lns',
+                     'parametros_solver', 'historial', 'archivo')
+CLAVES_DEMANDA = ('listademanda', 'listaposiciones', 'hourly_cover_demands',
+                  'hourly_traffic_demands', 'daily_sum_constraints')
+
+
+def fijar_dominio(proto, variable, minimo, maximo):
+    del proto.variables[variable].domain[:]
+    proto.variables[variable].domain.extend([minimo, maximo])
+
+
+def fijar_constante(proto, restriccion, variable, signo, valor):
+    '''
+    Cambia la constante de la restricción lineal creada como
+    variable == expresión + signo * valor
+    '''
+    lineal = proto.constraints[restriccion].linear
+    coeficiente = lineal.coeffs[list(lineal.vars).index(variable)]
+    del lineal.domain[:]
+    lineal.domain.extend([coeficiente * signo * valor] * 2)
+
+
+def misma_estructura(previo, problema, segmentos):
+    '''
+    True si el modelo de previo (problema) sirve para problema cambiando
+    sólo la demanda: mismos datos salvo CLAVES_DEMANDA y CLAVES_RESOLUCION,
+    mismos segmentos y mismas penalizaciones en las daily_sum_constraints
+    '''
+    for clave in set(previo) | set(problema):
+        if clave in CLAVES_DEMANDA or clave in CLAVES_RESOLUCION:
+            continue
+        if previo.get(clave) != problema.get(clave):
+            return False
+    if segmentos_rejilla(problema) != segmentos:
+        return False
+    sumas_previas = previo['daily_sum_constraints']
+    sumas = problema['daily_sum_constraints']
+    if len(sumas_previas) != len(sumas):
+        return False
+    for ct_previa, ct in zip(sumas_previas, sumas):
+        shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
+        if (ct_previa[0] != shift or ct_previa[3] != min_cost or
+                ct_previa[6] != max_cost or
+                (ct_previa[2] > ct_previa[1]) != (soft_min > hard_min) or
+                (ct_previa[4] < ct_previa[5]) != (soft_max < hard_max)):
+            return False
+    return True
+
+
+def actualizar_demanda(modelo, previo, problema):
+    '''
+    Cambia en el proto de modelo (construido con el problema previo) la
+    demanda de problema: cobertura por bloque y límites de las 
+    daily_sum_constraints (reparto equilibrado). Así el modelo se reutiliza
+    sin reconstruirlo (myIncrementalCRs).
+    Devuelve False (sin cambiar nada) si la estructura del problema es
+    distinta y hay que construir otro modelo
+    '''
+    if not misma_estructura(previo, problema, modelo['segmentos']):
+        return False
+    proto = modelo['model'].Proto()
+    num_employees = problema['num_employees']
+    blocks_per_interval = problema['blocks_per_interval']
+    for c in modelo['cobertura']:
+        h = c['bloque'] // blocks_per_interval
+        pos_demand = problema['hourly_cover_demands'][h][c['turno'] - 1]
+        fijar_dominio(proto, c['worked'], 0, pos_demand)
+        if c['excess'] is not None:
+            fijar_dominio(proto, c['excess'],
+                          0 if problema['match_full_demand'] else -pos_demand,
+                          num_employees - pos_demand)
+            fijar_constante(proto, c['igualdad'], c['excess'], -1, pos_demand)
+        if c['deficit'] is not None:
+            fijar_dominio(proto, c['deficit'], 0, pos_demand)
+    for i, indices in modelo['sumas']:
+        ct = problema['daily_sum_constraints'][i]
+        shift, hard_min, soft_min, min_cost, soft_max, hard_max, max_cost = ct
+        fijar_dominio(proto, indices['suma'], hard_min, hard_max)
+        if indices['bajo'] is not None:
+            fijar_constante(proto, indices['bajo'][0], indices['bajo'][1], 1,
+                            soft_min)
+        if indices['sobre'] is not None:
+            fijar_constante(proto, indices['sobre'][0], indices['sobre'][1],
+                            -1, soft_max)
+    return True
+
+
+def formatear_estadillo(problema, estadillo):
+    '''
+    Estadillo en formato texto (una fila por línea, separada por comas):
+    POS_DEMAND, TRAFFIC_DEMAND y una fila 'worker%i' por empleado.
+    estadillo: [empleado][bloque] = turno (índice en shifts)
+    '''
+    num_blocks=problema['num_blocks']
+    shifts=problema['shifts']
+    listaposiciones=list(problema['listaposiciones'])
+    listademanda=list(problema['listademanda'])
+
+    # myOutput=myoutputCRs.MyOutput(myAD + ".csv")
+    # print()
+    # header = ' '
+    # for h in range(num_hours):
+    #     header += myheader
+    # print(header)
+    # myOutput=myoutputCRs.MyOutput(myAD + "_all.csv") #csv de salida
+    
+    ouput = []
+    while len(listaposiciones)<= num_blocks: 
+        listaposiciones.append(' ')
+        listademanda.append(' ')
     
+    straux=",".join([str(int(x)) if x != ' ' else x for x in listaposiciones])
+    
+    #print('POS_DEMAND: ', strposdemanda)
+    # myOutput.añadirResultados('POS_DEMAND:,' + straux + ',') # añade a la cadena
+    ouput.append('POS_DEMAND:,' + straux)
+
+    straux=",".join([str(int(x)) if x != ' ' else x for x in listademanda])
+    #print('POS_DEMAND: ', strposdemanda)
+    # myOutput.añadirResultados('TRAFFIC_DEMAND:,' + straux+ ',') # añade cadena
+    ouput.append('TRAFFIC_DEMAND:,' + straux)
+
+    for e, fila_turnos in enumerate(estadillo):
+        schedule = ''
+        for b in range(num_blocks):
+            schedule += shifts[fila_turnos[b]] + ','
+        fila='worker%i:,%s' % (e, schedule)
+        print(fila)
+        # myOutput.añadirResultados(fila) # añade a la cadena
+        ouput.append(fila)
+    return ouput
+
 
-    solution_printer = cp_model.ObjectiveSolutionPrinter()
-    status = solver.SolveWithSolutionCallback(model, solution_printer)
+def estadillo_desde_salida(ouput, shifts):
+    '''
+    Estadillo [empleado][bloque] = turno (índice en shifts) a partir de las
+    filas 'worker%i:,D,T,...' de solve_shift_scheduling
+    '''
+    estadillo = []
+    for fila in ouput:
+        if fila.startswith('worker'):
+            valores = [x for x in fila.split(',')[1:] if x != '']
+            estadillo.append([shifts.index(x) for x in valores])
+    return estadillo
+
+
+def estado_final(estadillo, maximo):
+    '''
+    Secuencia con la que termina cada empleado: [(turno, longitud), ...]
+    (longitud en bloques, como mucho maximo). Es el estado_inicial de la
+    ventana siguiente.
+    '''
+    estado = []
+    for fila in estadillo:
+        racha = 0
+        for s in reversed(fila):
+            if s != fila[-1] or racha >= maximo:
+                break
+            racha += 1
+        estado.append((fila[-1], racha))
+    return estado
+
+
+def penalizaciones_solucion(modelo, solver):
+    '''
+    Coste de la solución por tipo de penalización (shift_constraint,
+    daily_sum_constraint, transition, excess_pos_demand, request)
+    '''
+    penalizaciones = {}
+    for variables, coeffs, info in (
+            (modelo['obj_bool_vars'], modelo['obj_bool_coeffs'],
+             modelo['obj_bool_info']),
+            (modelo['obj_int_vars'], modelo['obj_int_coeffs'],
+             modelo['obj_int_info'])):
+        for var, coeff, meta in zip(variables, coeffs, info):
+            coste = coeff * solver.Value(var)
+            if coste != 0:
+                penalizaciones[meta[0]] = penalizaciones.get(meta[0], 0) + coste
+    return penalizaciones
+
+
+def extraer_solucion(problema, modelo, solver):
+    '''
+    Estadillo en formato texto (ver formatear_estadillo) y mensajes del 
+    asistente para evaluar la solución.
+    Devuelve [ouput, msg_list]
+    '''
+    num_employees=problema['num_employees']
+    num_blocks=problema['num_blocks']
+    num_shifts=problema['num_shifts']
+    work=modelo['work']
+    obj_bool_vars=modelo['obj_bool_vars']
+    obj_bool_coeffs=modelo['obj_bool_coeffs']
+    obj_int_vars=modelo['obj_int_vars']
+    obj_int_coeffs=modelo['obj_int_coeffs']
+    obj_bool_info=modelo['obj_bool_info']
+    obj_int_info=modelo['obj_int_info']
+
+    estadillo = []
+    for e in range(num_employees):
+        estadillo.append([s for b in range(num_blocks)
+                          for s in range(num_shifts)
+                          if solver.BooleanValue(work[e, s, b])])
+    ouput = formatear_estadillo(problema, estadillo)
+    
+    # mensaje del asistente para evuluar soluciones
+    msg_list = []
+
+    tipAssessor=""
+    incumplebloque_descansominimo=False
+    print()
+    print('Penalties:')
+    for i, var in enumerate(obj_bool_vars):
+        if solver.BooleanValue(var):
+            penalty = obj_bool_coeffs[i]
+            if penalty > 0:
+                # controla incumplimiento descanso 35'
+                if (obj_bool_info[i][0] == "shift_constraint" and
+                    obj_bool_info[i][2] == 0):
+                        incumplebloque_descansominimo=True
+                        # msg7 = "No se cumplen las condiciones de tiempos de descanso y trabajo"
+                        # return msg7
+                        print('  %s violated, penalty=%i' % (
+                            nombre_penalizacion(obj_bool_info[i]), penalty))
+            else:
+                print('  %s fulfilled, gain=%i' % (
+                    nombre_penalizacion(obj_bool_info[i]), -penalty))
+    
+    if incumplebloque_descansominimo:
+        tipAssessor="continuous off shift_constraint violated (Se sobrepasan las restricciones duras en varios momentos aunque el algoritmo encuentra solución al problema)."
+        if problema['match_full_demand']:
+            #primero probar quitando condición match_demand
+            tipAssessor=tipAssessor + "\n Consider [match_full_demand]=0"
+            tipAssessor=tipAssessor + "\n Or check [num_employees]"
+            msg4 = "Asistente para evaluar soluciones (OPTIMAL or FEASIBLE):  "+tipAssessor
+            msg_list.append(msg4)
+        else:
+            #después probar suavizar condición even_shift
+            tipAssessor=tipAssessor + "\n Consider increase [even_shift_tolerance]"
+            msg5 = "Asistente para evaluar soluciones (OPTIMAL or FEASIBLE):  " + tipAssessor
+            msg_list.append(msg5)
+    for i, var in enumerate(obj_int_vars):
+        if solver.Value(var) > 0:
+            print('  %s violated by %i, linear penalty=%i' %
+                  (nombre_penalizacion(obj_int_info[i]), solver.Value(var),
+                   obj_int_coeffs[i]))
+    print()
+    print(tipAssessor)
+
+    # myOutput.añadirResultados(tipAssessor)
+    # myOutput.volcarResultados(overwrite=True) # sobreescribe archivo
+    return [ouput, msg_list]
+
+
+def cargar_problema(lista, traf=[], escenario=None, demanda=None,
+                    config=None):
+    '''
+    Lee inputconfigCRs.json y el escenario (datosDependencias y tráfico) y
+    prepara el problema (ver preparar_problema).
+    lista, traf, escenario, demanda, config: ver solve_shift_scheduling
+    Devuelve el diccionario del problema o un mensaje de error (str)
+    '''
+     #escenario
+    #PENDIENTE:
+    # -seleccionar escenario 
+        #PENDIENTE: poner nombre a turnos
+    myAD=lista[0]
+    if config is None:
+        #lee inputconfigCRs.json y el perfil del AD (perfilesCRs.json)
+        mC=myInputConfigCRs.MyConfig(icao=myAD)
+    else:
+        mC=config
+    
+#    myAD='LEMD_DCL'
+#    myturno=0
+#    mydiames=15 #SEGÚN FORMATO FICHERO TRAFICO
+    myturno=lista[2]
+    mydiames=lista[5].day
+    mynummes=lista[5].month
+    myfileTWR=mC.fileTWR
+    myfileTrafico=mC.fileTrafico
+    if escenario is None:
+        mE=myInputCRs.MyEscenario(icao=myAD,fileTWR=myfileTWR,
+                     fileTrafico=myfileTrafico) #lee datosDependencias
+    else:
+        mE=escenario
+    
+    # input Config
+    num_hours=mC.num_hours # 8 hours = duración turno
+    if num_hours==0:
+        #si 0 lee el turno
+        num_hours=mE.getduracionturno(myturno)
+    
+    num_employees=lista[1]
+    
+    print(myAD)
+    print("shift:",myturno)
+    if len(mC.hourly_cover_demands)==0:
+        print("day:", mydiames, "/" , mynummes)
+    
+    demand_interval_length=lista[4]
+    block_length=lista[3] # 5  minutes
+    
+    if demanda is None or len(mC.hourly_cover_demands)>0:
+        demanda = cargar_demanda(mC, mE, myturno, mydiames,
+                                 demand_interval_length, block_length, traf)
+    if type(demanda) == str:
+        return demanda
+    (listademanda,listaposiciones) = demanda
+    
+    problema = preparar_problema(mC, num_employees, num_hours, block_length,
+                                 demand_interval_length, 
+                                 listademanda, listaposiciones,
+                                 mE.cap, mE.pos)
+    if type(problema) != str:
+        # hora de inicio del turno (mensajes del diagnóstico)
+        problema['hora_inicio'] = mE.getlimitesturno(myturno)[0]
+    return problema
+
+
+def solve_heuristic_scheduling(lista, traf=[], escenario=None, demanda=None):
+    '''
+    Estadillo aproximado en milisegundos (myHeuristicaCRs, sin CP-SAT).
+    Mismos argumentos y salida que solve_shift_scheduling.
+    '''
+    problema = cargar_problema(lista, traf, escenario, demanda)
+    if type(problema) == str:
+        return problema
+    estadillo = myHeuristicaCRs.construir_estadillo(problema)
+    return resultado_heuristico(problema, estadillo,
+                                "Vista previa (heurística, sin optimizar)")
+
+
+def resultado_heuristico(problema, estadillo, titulo):
+    '''
+    [ouput, msg_list] del estadillo heurístico, avisando de las 
+    restricciones que no cumple
+    '''
+    ouput = formatear_estadillo(problema, estadillo)
+    incumplimientos = myHeuristicaCRs.validar_estadillo(problema, estadillo)
+    msg = titulo + ": "
+    if len(incumplimientos) == 0:
+        msg = msg + "cumple cobertura y tiempos de trabajo y descanso."
+    else:
+        msg = msg + "%i incumplimientos, p.ej. %s" % (
+            len(incumplimientos), "; ".join(incumplimientos[:3]))
+    print(msg)
+    return [ouput, [msg]]
+
+
+#def solve_shift_scheduling(params, output_proto):
+def solve_shift_scheduling(lista, traf=[], fijos=None, pistas=None,
+                           max_time_in_seconds=None, escenario=None,
+                           demanda=None, num_search_workers=None,
+                           respaldo=True, estado_inicial=None,
+                           diagnostico=None, parada=None, informe=None,
+                           cancelar=None, al_primera_solucion=None,
+                           config=None, carrera=None, perfilado=None,
+                           registro_solver=None, bajas=None, lns=None,
+                           sesion=None, supuestos=None, bases=None):    
+    """Solves the shift scheduling problem.
+    lista: [aeropuerto, num ATCOS, turno, bloque, ventana demanda, fecha]
+    traf: demanda por hora modificada a mano (app.py)
+    fijos: asignaciones fijas adicionales [empleado, turno, bloque]
+    pistas: estadillo previo [empleado][bloque] = turno (hint). Si es None
+        se usa el estadillo heurístico (myHeuristicaCRs)
+    max_time_in_seconds: si no es None, sustituye al del inputconfigCRs.json
+    escenario: MyEscenario ya cargado (si None se leen los csv)
+    demanda: (listademanda, listaposiciones) ya calculada (getdemandaDia)
+    num_search_workers: hilos del solver (por defecto num ATCOS)
+    respaldo: si no hay solución devuelve el estadillo heurístico
+    estado_inicial: [(turno, longitud en bloques), ...] secuencia con la
+        que cada empleado termina la ventana anterior (ver estado_final)
+    diagnostico: si es True (por defecto "diagnostico" del
+        inputconfigCRs.json) antes de resolver se busca en pocos segundos
+        un conjunto mínimo de restricciones incompatibles (myDiagnosticoCRs)
+        y, si lo hay, se devuelve como mensaje. Con "diagnostico_blandos"
+        si las reglas duras son compatibles se repite con los límites
+        blandos como duros; su conflicto sólo se avisa (informe
+        'conflicto_blandos') y se resuelve igualmente
+    parada: diccionario que sustituye valores del criterio de parada del
+        inputconfigCRs.json (myParadaCRs.CLAVES_PARADA)
+    informe: diccionario que se rellena con el resultado del solver
+        (status, objective, best_bound, tiempos, tamaño del modelo, motivo)
+        que también se guarda en el historial (myHistorialCRs)
+    cancelar: threading.Event; si se activa se para la búsqueda (StopSearch)
+    al_primera_solucion: función sin argumentos que se llama al encontrar
+        CP-SAT la primera solución
+    config: MyConfig ya cargado (si None se lee inputconfigCRs.json), p.ej.
+        con valores cambiados (myBarridoCRs)
+    carrera: si es True (por defecto "carrera" del inputconfigCRs.json)
+        se resuelve con varios conjuntos de parámetros a la vez y se
+        registra el ganador (myCarreraCRs)
+    perfilado: si es True (por defecto variable de entorno PERFILADO_CRS o
+        "perfilado" del inputconfigCRs.json) la resolución se perfila y se
+        guarda en perfiladoCRs/ (myPerfiladorCRs)
+    registro_solver: función que recibe cada línea del log de búsqueda de
+        CP-SAT (si no es None se activa el log)
+    bajas: {empleado: bloque} empleados que dejan el turno en ese bloque
+        (descanso hasta el final, sin sus restricciones; myReparacionCRs)
+    lns: si es True (por defecto "lns" del inputconfigCRs.json) se busca
+        con vecindarios grandes sobre el mismo modelo (myLNSCRs)
+    sesion: diccionario con el 'problema' y el 'modelo' de la resolución
+        anterior (myIncrementalCRs). Si sólo cambia la demanda el modelo
+        se reutiliza (actualizar_demanda); al terminar se guardan los de
+        esta resolución
+    supuestos: asignaciones [empleado, turno, bloque] que se fijan como
+        supuestos (assumptions) de CP-SAT, no como restricciones; si con
+        ellas no hay solución el status es INFEASIBLE
+    bases: diccionario compartido entre resoluciones del mismo escenario
+        con las partes del modelo que no dependen de la demanda ni del
+        parámetro de control (construir_modelo, myBarridoCRs)
+    """
+    if informe is None:
+        informe = {}
+    if config is None:
+        config = myInputConfigCRs.MyConfig(icao=lista[0])
+    if perfilado is None:
+        perfilado = myPerfiladorCRs.perfilado_activo(config)
+    if perfilado:
+        return myPerfiladorCRs.perfilar_resolucion(solve_shift_scheduling, lista, dict(
+            traf=traf, fijos=fijos, pistas=pistas,
+            max_time_in_seconds=max_time_in_seconds, escenario=escenario,
+            demanda=demanda, num_search_workers=num_search_workers,
+            respaldo=respaldo, estado_inicial=estado_inicial,
+            diagnostico=diagnostico, parada=parada, informe=informe,
+            cancelar=cancelar, al_primera_solucion=al_primera_solucion,
+            config=config, carrera=carrera, perfilado=False,
+            registro_solver=registro_solver, bajas=bajas, lns=lns,
+            sesion=sesion, supuestos=supuestos, bases=bases))
+    t0 = time.time()
+    problema = cargar_problema(lista, traf, escenario, demanda, config)
+    if type(problema) == str:
+        informe['status'] = 'ERROR'
+        return problema
+    num_employees = problema['num_employees']
+
+    # con cobertura exacta y menos ATCOS que la cota inferior no hay solución
+    if problema['match_full_demand']:
+        cota_inferior = myEstimadorCRs.estimar_atcos_problema(problema)
+        if num_employees < cota_inferior:
+            print("num_employees < lower bound", cota_inferior)
+            msg1 = "Número de ATCOS insuficiente (mínimo estimado: %i)" % cota_inferior
+            informe['status'] = 'INFEASIBLE'
+            informe['motivo'] = 'cota_inferior'
+            return msg1
+    if fijos is not None:
+        problema['fixed_assignments'].extend(fijos)
+    if max_time_in_seconds is not None:
+        problema['max_time_in_seconds'] = max_time_in_seconds
+    problema['parada'] = myParadaCRs.sustituir_parada(problema['parada'],
+                                                      parada)
+    problema['estado_inicial'] = estado_inicial
+    problema['bajas'] = bajas
+    if diagnostico is None:
+        diagnostico = problema['diagnostico']
+    if carrera is None:
+        carrera = problema['carrera']
+    if lns is None:
+        lns = problema['lns']
+
+    # Specify the number of parallel workers to use during search.
+    if num_search_workers is None:
+        num_search_workers = num_employees
+
+    if diagnostico:
+        t_diagnostico = min(problema['max_time_diagnostico'],
+                            problema['max_time_in_seconds'])
+        detalle = {}
+        conflicto = myDiagnosticoCRs.diagnosticar_infactibilidad(
+            problema, max_time_in_seconds=t_diagnostico,
+            num_search_workers=num_search_workers, informe=detalle)
+        if conflicto:
+            msg8 = myDiagnosticoCRs.mensaje_diagnostico(
+                conflicto, detalle['minimo'])
+            print(msg8)
+            informe['status'] = 'INFEASIBLE'
+            informe['motivo'] = 'diagnostico'
+            return msg8
+        restante = t_diagnostico - (time.time() - t0)
+        if (conflicto is not None and problema['diagnostico_blandos'] and
+                restante > 0):
+            # qué límites blandos no se pueden cumplir a la vez
+            detalle = {}
+            conflicto = myDiagnosticoCRs.diagnosticar_infactibilidad(
+                problema, blandos=True, max_time_in_seconds=restante,
+                num_search_workers=num_search_workers, informe=detalle)
+            if conflicto:
+                msg9 = myDiagnosticoCRs.mensaje_diagnostico(
+                    conflicto, detalle['minimo'])
+                print("límites blandos:", msg9)
+                informe['conflicto_blandos'] = msg9
+
+    # estadillo heurístico: hint para CP-SAT y respuesta si no hay solución
+    estadillo_heuristico = myHeuristicaCRs.construir_estadillo(problema)
+    if pistas is None:
+        pistas = estadillo_heuristico
+        
+    if (sesion is not None and 'modelo' in sesion and
+            actualizar_demanda(sesion['modelo'], sesion['problema'],
+                               problema)):
+        print("se reutiliza el modelo anterior con la demanda nueva")
+        modelo = sesion['modelo']
+        poner_pistas(problema, modelo, pistas)
+    else:
+        modelo = construir_modelo(problema, pistas, bases)
+    if sesion is not None:
+        sesion['problema'] = problema
+        sesion['modelo'] = modelo
+    poner_supuestos(modelo, supuestos)
+    model = modelo['model']
+
+    if carrera:
+        # varios conjuntos de parámetros a la vez sobre el mismo modelo
+        ganador, resultados = myCarreraCRs.carrera_parametros(
+            model, problema, num_search_workers, cancelar=cancelar,
+            al_primera_solucion=al_primera_solucion)
+        myCarreraCRs.registrar_carrera(lista, traf, problema, ganador,
+                                       resultados)
+        solver = ganador['solver']
+        status = ganador['status']
+        solution_printer = ganador['callback']
+        informe['carrera'] = ganador['nombre']
+    elif lns:
+        # vecindarios grandes en paralelo sobre el mismo modelo
+        solver, status, solution_printer = myLNSCRs.resolver_lns(
+            problema, modelo, num_search_workers, cancelar,
+            al_primera_solucion)
+    else:
+        # Solve the model.
+        solver = cp_model.CpSolver()
+        # Sets a time limit of XX seconds.
+        solver.parameters.max_time_in_seconds = problema['max_time_in_seconds']
+        solver.parameters.num_search_workers = num_search_workers 
+        text_format.Merge(problema['parametros_solver'], solver.parameters)
+        if registro_solver is not None:
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = registro_solver
+
+        # para también por gap, tiempo sin mejora o tiempo determinista
+        status, solution_printer = myParadaCRs.resolver_con_parada(
+            solver, model, problema['parada'], cancelar, al_primera_solucion)
+    if solution_printer.motivo == 'sin_mejora':
+        print("sin mejora en %0.1f s" % problema['parada']['tiempo_sin_mejora'])
+    restante = problema['max_time_in_seconds'] - (time.time() - t0)
+    if (status in (cp_model.INFEASIBLE, cp_model.UNKNOWN) and
+            not supuestos and solution_printer.motivo != 'cancelado' and
+            restante > 0 and
+            len(modelo['segmentos']) < problema['num_blocks']):
+        # la rejilla comprimida solo cambia de turno en los bordes de los
+        # segmentos: puede no tener solución (o no encontrarla a tiempo)
+        # aunque la haya por bloques. Se resuelve por bloques con el
+        # tiempo que queda y sin repetir el diagnóstico
+        print("rejilla comprimida sin solución, se resuelve por bloques")
+        config = copy.copy(config)
+        config.rejilla_comprimida = False
+        return solve_shift_scheduling(
+            lista, traf, fijos, pistas, restante, escenario,
+            demanda, num_search_workers, respaldo, estado_inicial,
+            False, parada, informe, cancelar, al_primera_solucion,
+            config, carrera, False, registro_solver, bajas, lns, sesion,
+            supuestos, bases)
+    proto = model.Proto()
+    informe.update({
+        'status': solver.StatusName(status),
+        'objective': (solver.ObjectiveValue() if status in
+                      (cp_model.OPTIMAL, cp_model.FEASIBLE) else None),
+        'best_bound': solver.BestObjectiveBound(),
+        'wall_time': solver.WallTime(),
+        'tiempo_primera_solucion': solution_printer.primera_solucion,
+        'num_variables': len(proto.variables),
+        'num_restricciones': len(proto.constraints),
+        'num_segmentos': len(modelo['segmentos']),
+        'motivo': solution_printer.motivo,
+        'tiempo_total': time.time() - t0,
+        'response_stats': solver.ResponseStats(),
+    })
+    if lns:
+        # el solver es el del último vecindario: la cota es la del modelo
+        # completo y los tiempos y estadísticas los totales de la búsqueda
+        informe['best_bound'] = solution_printer.cota
+        informe['wall_time'] = time.time() - solution_printer.inicio
+        informe['response_stats'] = solution_printer.resumen()
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        informe['penalizaciones'] = penalizaciones_solucion(modelo, solver)
+    if problema['historial']:
+        myHistorialCRs.registrar_resolucion(lista, problema, informe)
                
     # Print solution.
     #PENDIENTE: PASAR A SOLUTION CALLBACK
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        # myOutput=myoutputCRs.MyOutput(myAD + ".csv")
-        # print()
-        # header = ' '
-        # for h in range(num_hours):
-        #     header += myheader
-        # print(header)
-        # myOutput=myoutputCRs.MyOutput(myAD + "_all.csv") #csv de salida
-        
-        ouput = []
-        while len(listaposiciones)<= num_blocks: 
-            listaposiciones.append(' ')
-            listademanda.append(' ')
-        
-        straux=",".join([str(int(x)) if x != ' ' else x for x in listaposiciones])
-        
-        #print('POS_DEMAND: ', strposdemanda)
-        # myOutput.añadirResultados('POS_DEMAND:,' + straux + ',') # añade a la cadena
-        ouput.append('POS_DEMAND:,' + straux)
-
-        straux=",".join([str(int(x)) if x != ' ' else x for x in listademanda])
-        #print('POS_DEMAND: ', strposdemanda)
-        # myOutput.añadirResultados('TRAFFIC_DEMAND:,' + straux+ ',') # añade cadena
-        ouput.append('TRAFFIC_DEMAND:,' + straux)
-
-        for e in range(num_employees):
-            schedule = ''
-            for b in range(num_blocks):
-                for s in range(num_shifts):
-                    if solver.BooleanValue(work[e, s, b]):
-                        schedule += shifts[s] + ','
-            fila='worker%i:,%s' % (e, schedule)
-            print(fila)
-            # myOutput.añadirResultados(fila) # añade a la cadena
-            ouput.append(fila)
-        
-        
-        # mensaje del asistente para evuluar soluciones
-        msg_list = []
-
-        tipAssessor=""
-        incumplebloque_descansominimo=False
-        print()
-        print('Penalties:')
-        for i, var in enumerate(obj_bool_vars):
-            if solver.BooleanValue(var):
-                penalty = obj_bool_coeffs[i]
-                if penalty > 0:
-                    # controla incumplimiento descanso 35'
-                    if ("shift_constraint" in var.Name() and
-                        "shift 0" in var.Name()):
-                            incumplebloque_descansominimo=True
-                            # msg7 = "No se cumplen las condiciones de tiempos de descanso y trabajo"
-                            # return msg7
-                            print('  %s violated, penalty=%i' % (var.Name(), penalty))
-                else:
-                    print('  %s fulfilled, gain=%i' % (var.Name(), -penalty))
-        
-        if incumplebloque_descansominimo:
-            tipAssessor="continuous off shift_constraint violated (Se sobrepasan las restricciones duras en varios momentos aunque el algoritmo encuentra solución al problema)."
-            if match_full_demand:
-                #primero probar quitando condición match_demand
-                tipAssessor=tipAssessor + "\n Consider [match_full_demand]=0"
-                tipAssessor=tipAssessor + "\n Or check [num_employees]"
-                msg4 = "Asistente para evaluar soluciones (OPTIMAL or FEASIBLE):  "+tipAssessor
-                msg_list.append(msg4)
-            else:
-                #después probar suavizar condición even_shift
-                tipAssessor=tipAssessor + "\n Consider increase [even_shift_tolerance]"
-                msg5 = "Asistente para evaluar soluciones (OPTIMAL or FEASIBLE):  " + tipAssessor
-                msg_list.append(msg5)
-        for i, var in enumerate(obj_int_vars):
-            if solver.Value(var) > 0:
-                print('  %s violated by %i, linear penalty=%i' %
-                      (var.Name(), solver.Value(var), obj_int_coeffs[i]))
-        print()
-        print(tipAssessor)
-
-        # myOutput.añadirResultados(tipAssessor)
-        # myOutput.volcarResultados(overwrite=True) # sobreescribe archivo
+        resultado = extraer_solucion(problema, modelo, solver)
+        if problema['archivo']:
+            myArchivoCRs.archivar_resultado(lista, problema, resultado[0])
 
     elif status == cp_model.INFEASIBLE or status == cp_model.UNKNOWN:
         msg6 = "Con la combinación de variables introducidas no es posible optimizar una programación para la jornada actual"
-        return msg6    
+        print(msg6)
+        if not respaldo:
+            return msg6
+        # se devuelve el estadillo heurístico avisando de lo que no cumple
+        return resultado_heuristico(problema, estadillo_heuristico, msg6)
 
 
     print()
-    print(solver.ResponseStats())
+    print(informe['response_stats'])
 
     
-    return [ouput, msg_list]
-
+    return resultado